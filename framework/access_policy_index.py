@@ -0,0 +1,385 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import yaml
+
+# Access levels from least to most restrictive; when rules disagree the most restrictive wins
+ACCESS_LEVELS = ('FULL', 'CONDITIONAL', 'MASKED', 'NONE')
+_RESTRICTIVENESS = {level: rank for rank, level in enumerate(ACCESS_LEVELS)}
+DEFAULT_MASKING_TYPE = 'HASH'
+_READ_PERMISSIONS = {'ALL', 'SELECT', 'READ', 'WRITE'}
+ANY_DATABASE = '*'
+# Index keys for the access of a role to columns and tables without a rule of their own
+ANY_TABLE = '*'
+ANY_COLUMN = '*'
+
+INDEX_FORMAT_VERSION = 2
+
+# Where a masking type comes from decides which one applies when several rules
+# mask a column: a dedicated column masking policy beats masking/column-filter
+# rules, which beat the generic "masking" field of a column definition
+_COLUMN_DEFAULT, _MASKING_RULE, _MASKING_POLICY = range(3)
+
+@dataclass(frozen=True)
+class ColumnAccess:
+    """Effective access of one role to one column"""
+    access_level: str
+    masking_type: Optional[str] = None
+    row_filters: Tuple[str, ...] = ()
+
+    @property
+    def visible(self) -> bool:
+        return self.access_level != 'NONE'
+
+DENIED = ColumnAccess('NONE')
+
+def role_key(role: str) -> str:
+    """Normalize role names so "DataSteward", "data_steward" and "data-steward" match"""
+    return role.replace('_', '').replace('-', '').lower()
+
+def _load(path: str) -> Dict:
+    with open(path, 'r') as f:
+        return json.load(f) if path.endswith('.json') else yaml.safe_load(f)
+
+def sources_fingerprint(paths: Iterable[str]) -> str:
+    """Hash of the policy source files, used to invalidate a cached index"""
+    digest = hashlib.sha256(f"v{INDEX_FORMAT_VERSION}".encode('utf-8'))
+    for path in paths:
+        digest.update(path.encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+class _PolicyCompiler:
+    """Collects rules from every policy source before they are flattened"""
+
+    def __init__(self, default_database: str):
+        self.default_database = default_database
+        self.roles: Set[str] = set()
+        self.aliases: Dict[str, str] = {}
+        self.readable: Dict[str, Set[str]] = defaultdict(set)
+        self.columns: Set[Tuple[str, str, str]] = set()
+        # Rules are (access level, masking type, priority)
+        self.column_rules: Dict[Tuple, List[Tuple[str, Optional[str], int]]] = defaultdict(list)
+        # Rules on a column name in every table, keyed by (role, column)
+        self.global_rules: Dict[Tuple[str, str], List[Tuple[str, Optional[str], int]]] = defaultdict(list)
+        self.table_filters: Dict[Tuple[str, str, str], Set[str]] = defaultdict(set)
+        self.global_filters: Dict[str, Set[str]] = defaultdict(set)
+        self.row_filters: Dict[str, str] = {}
+        self.filter_tables: Dict[str, List[str]] = {}
+        self.column_filters: Dict[str, Dict] = {}
+
+    def role(self, name: str) -> str:
+        key = role_key(name)
+        key = self.aliases.get(key, key)
+        self.roles.add(key)
+        return key
+
+    def column_rule(self, role: str, database: str, table: str, column: str,
+                    level: str, masking_type: Optional[str] = None, priority: int = _COLUMN_DEFAULT):
+        self.columns.add((database, table, column))
+        self.column_rules[(self.role(role), database, table, column)].append((level, masking_type, priority))
+
+    def add_access_policies(self, policies: Dict):
+        for role in policies.get('roles', []):
+            self.role(role['name'])
+
+        for database in policies.get('databases', []):
+            for permission in database.get('permissions', []):
+                if set(permission['access'].split(',')) & _READ_PERMISSIONS:
+                    self.readable[self.role(permission['role'])].add(database['name'])
+
+        for table in policies.get('tables', []):
+            database = table.get('database', self.default_database)
+            for column in table.get('columns', []):
+                masking = column.get('masking')
+                masking = None if masking in (None, 'NONE') else masking
+                for access in column.get('access', []):
+                    level = access['level']
+                    self.column_rule(access['role'], database, table['name'], column['name'],
+                                     level, masking if level != 'FULL' else None)
+
+        for tag in policies.get('tags', []):
+            for table in tag.get('tables', []):
+                for column in tag.get('columns', []):
+                    for access in tag.get('access', []):
+                        self.column_rule(access['role'], self.default_database, table, column, access['level'])
+
+        for row_filter in policies.get('row_filters', []):
+            self.row_filters[row_filter['name']] = row_filter['filter_expression'].strip()
+            self.filter_tables[row_filter['name']] = row_filter.get('tables', [])
+            for role in row_filter.get('roles', []):
+                self.add_role_filter(role, row_filter['name'])
+
+        for column_filter in policies.get('column_filters', []):
+            self.column_filters[column_filter['name']] = column_filter
+            for role in column_filter.get('roles', []):
+                self.add_role_column_filter(role, column_filter['name'])
+
+    def add_role_filter(self, role: str, name: str):
+        tables = self.filter_tables.get(name)
+        if tables:
+            for table in tables:
+                self.table_filters[(self.role(role), self.default_database, table)].add(name)
+        else:
+            self.global_filters[self.role(role)].add(name)
+
+    def add_role_column_filter(self, role: str, name: str):
+        column_filter = self.column_filters[name]
+        for column in column_filter['columns']:
+            self.global_rules[(self.role(role), column)].append(
+                ('MASKED', column_filter.get('masking_function', DEFAULT_MASKING_TYPE), _MASKING_RULE)
+            )
+
+    def add_higher_ed_config(self, config: Dict):
+        access_control = config.get('access_control', {})
+        for role in access_control.get('roles', []):
+            key = self.role(role['name'])
+            if set(role.get('permissions', [])) & _READ_PERMISSIONS:
+                self.readable[key].add(ANY_DATABASE)
+
+        for row_filter in access_control.get('row_filters', []):
+            self.row_filters[row_filter['name']] = row_filter['filter_expression'].strip()
+            for role in row_filter.get('roles', []):
+                self.global_filters[self.role(role)].add(row_filter['name'])
+
+        for rule in config.get('masking_rules', []):
+            for role in rule.get('roles', []):
+                self.global_rules[(self.role(role), rule['field'])].append(
+                    ('MASKED', rule['masking_type'], _MASKING_RULE)
+                )
+
+    def add_masking_policy(self, policy: Dict):
+        target = policy['target']
+        default_type = policy.get('masking_function', {}).get('type', DEFAULT_MASKING_TYPE)
+        for rule in policy.get('masking_rules', []):
+            level = rule['access_level']
+            masking_type = rule.get('masking_type', default_type) if level != 'FULL' else None
+            self.column_rule(rule['role'], target['database'], target['table'], target['column'],
+                             level, masking_type, _MASKING_POLICY)
+        for rule in policy.get('access_control', []):
+            if set(rule.get('permissions', [])) & _READ_PERMISSIONS:
+                self.readable[self.role(rule['role'])].add(target['database'])
+
+    def add_role_matrix(self, matrix: Dict):
+        for name, definition in matrix.get('roles', {}).items():
+            key = self.role(name)
+            # Department roles (e.g. math_faculty) share their parent role's access
+            for department_role in definition.get('iam_roles', {}):
+                self.aliases[role_key(department_role)] = key
+
+            column_permissions = set(definition.get('lake_formation_permissions', {}).get('column', []))
+            if column_permissions & _READ_PERMISSIONS:
+                self.readable[key].add(ANY_DATABASE)
+            for filter_name in definition.get('row_filters', []):
+                self.add_role_filter(name, filter_name)
+            for filter_name in definition.get('column_filters', []):
+                if filter_name in self.column_filters:
+                    self.add_role_column_filter(name, filter_name)
+            for column in definition.get('conditional_access', {}):
+                self.global_rules[(key, column)].append(('CONDITIONAL', None, _COLUMN_DEFAULT))
+
+    def _resolve(self, role: str, database: str, table: str, column: str) -> ColumnAccess:
+        rules = self.column_rules.get((role, database, table, column), []) + self.global_rules.get((role, column), [])
+        if rules:
+            level = max((rule[0] for rule in rules), key=_RESTRICTIVENESS.__getitem__)
+            candidates = [(priority, masking) for rule_level, masking, priority in rules if rule_level == level and masking]
+            # max() keeps the first of equal priorities, so earlier sources win ties
+            masking_type = max(candidates, key=lambda candidate: candidate[0])[1] if candidates else None
+            if level == 'MASKED' and masking_type is None:
+                masking_type = DEFAULT_MASKING_TYPE
+        else:
+            readable = self.readable.get(role, set())
+            level = 'FULL' if database in readable or ANY_DATABASE in readable else 'NONE'
+            masking_type = None
+        if level == 'NONE':
+            return DENIED
+
+        row_filters = self.table_filters.get((role, database, table), set()) | self.global_filters.get(role, set())
+        return ColumnAccess(level, masking_type if level != 'FULL' else None, tuple(sorted(row_filters)))
+
+    def compile(self, fingerprint: str = '') -> 'AccessPolicyIndex':
+        tables = {(database, table) for database, table, _ in self.columns}
+        tables.update((database, table) for _, database, table in self.table_filters)
+        databases = {database for database, _ in tables} | {self.default_database}
+        databases.update(database for readable in self.readable.values() for database in readable
+                         if database != ANY_DATABASE)
+        role_columns: Dict[str, Set[str]] = defaultdict(set)
+        for role, column in self.global_rules:
+            role_columns[role].add(column)
+
+        interned: Dict[ColumnAccess, ColumnAccess] = {}
+        entries = {}
+        for role in self.roles:
+            # Columns with a rule, then the wildcard keys AccessPolicyIndex.lookup falls back to:
+            # every column of a table, columns ruled by name in any table, a whole database, any database
+            keys = set(self.columns)
+            keys.update((database, table, column) for database, table in tables for column in role_columns[role])
+            keys.update((database, table, ANY_COLUMN) for database, table in tables)
+            keys.update((ANY_DATABASE, ANY_TABLE, column) for column in role_columns[role])
+            keys.update((database, ANY_TABLE, ANY_COLUMN) for database in databases)
+            keys.add((ANY_DATABASE, ANY_TABLE, ANY_COLUMN))
+            for database, table, column in keys:
+                access = self._resolve(role, database, table, column)
+                entries[(role, database, table, column)] = interned.setdefault(access, access)
+        return AccessPolicyIndex(entries, self.row_filters, dict(self.aliases), fingerprint)
+
+class AccessPolicyIndex:
+    """
+    Flat effective-access index keyed by (role, database, table, column).
+
+    Compiled once from the policy YAML/JSON sources; every lookup is a
+    single dict access. Roles are matched case-insensitively, ignoring
+    "_" and "-", and department roles resolve to their parent role.
+    """
+
+    def __init__(self, entries: Dict[Tuple[str, str, str, str], ColumnAccess],
+                 row_filters: Dict[str, str], aliases: Optional[Dict[str, str]] = None,
+                 fingerprint: str = ''):
+        self.entries = entries
+        self.row_filters = row_filters
+        self.aliases = aliases or {}
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup(self, role: str, database: str, table: str, column: str) -> ColumnAccess:
+        """
+        Effective access of a role to a column.
+
+        A column without a rule of its own gets the role's access to its
+        table, a rule on its name in every table, or the role's access to its
+        database or to any database, in that order; unknown roles are denied.
+        """
+        key = role_key(role)
+        key = self.aliases.get(key, key)
+        for candidate in ((database, table, column), (database, table, ANY_COLUMN),
+                          (ANY_DATABASE, ANY_TABLE, column), (database, ANY_TABLE, ANY_COLUMN),
+                          (ANY_DATABASE, ANY_TABLE, ANY_COLUMN)):
+            access = self.entries.get((key, *candidate))
+            if access is not None:
+                return access
+        return DENIED
+
+    def can_see(self, role: str, database: str, table: str, column: str) -> bool:
+        return self.lookup(role, database, table, column).visible
+
+    def filter_expressions(self, access: ColumnAccess) -> List[str]:
+        """Row filter expressions of a lookup result"""
+        return [self.row_filters[name] for name in access.row_filters]
+
+    @classmethod
+    def compile(cls, access_policies_path: str,
+                higher_ed_config_path: Optional[str] = None,
+                masking_policy_paths: Iterable[str] = (),
+                role_matrix_path: Optional[str] = None) -> 'AccessPolicyIndex':
+        """
+        Compile policy sources into an index.
+
+        Args:
+            access_policies_path (str): framework/access_policies.yaml
+            higher_ed_config_path (str): Optional configs/higher_ed_config.yaml
+            masking_policy_paths (list): Column masking policies such as gpa_masking_policy.yaml
+            role_matrix_path (str): Optional role_matrix.json
+
+        Returns:
+            AccessPolicyIndex: The compiled index
+        """
+        masking_policy_paths = list(masking_policy_paths)
+        paths = [access_policies_path, higher_ed_config_path, *masking_policy_paths, role_matrix_path]
+        access_policies = _load(access_policies_path)
+        compiler = _PolicyCompiler(access_policies['settings']['default_database'])
+        compiler.add_access_policies(access_policies)
+        if higher_ed_config_path:
+            compiler.add_higher_ed_config(_load(higher_ed_config_path))
+        for path in masking_policy_paths:
+            compiler.add_masking_policy(_load(path))
+        if role_matrix_path:
+            compiler.add_role_matrix(_load(role_matrix_path))
+        return compiler.compile(sources_fingerprint(path for path in paths if path))
+
+    def save(self, path: str):
+        """Write the index as JSON, storing each distinct ColumnAccess once"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        values: Dict[ColumnAccess, int] = {}
+        entries = [[*key, values.setdefault(access, len(values))] for key, access in self.entries.items()]
+        document = {
+            'version': INDEX_FORMAT_VERSION,
+            'fingerprint': self.fingerprint,
+            'row_filters': self.row_filters,
+            'aliases': self.aliases,
+            'values': [[access.access_level, access.masking_type, list(access.row_filters)] for access in values],
+            'entries': entries
+        }
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'w') as f:
+            json.dump(document, f, separators=(',', ':'))
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'AccessPolicyIndex':
+        with open(path, 'r') as f:
+            document = json.load(f)
+        if document.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported access index version in {path}")
+        values = [ColumnAccess(level, masking, tuple(filters)) for level, masking, filters in document['values']]
+        entries = {
+            (role, database, table, column): values[value]
+            for role, database, table, column, value in document['entries']
+        }
+        return cls(entries, document['row_filters'], document['aliases'], document['fingerprint'])
+
+def load_access_index(access_policies_path: str,
+                      higher_ed_config_path: Optional[str] = None,
+                      masking_policy_paths: Iterable[str] = (),
+                      role_matrix_path: Optional[str] = None,
+                      cache_path: str = os.path.join('.access_index', 'access_index.json')) -> AccessPolicyIndex:
+    """Load the compiled index from cache_path, recompiling it when any source has changed"""
+    masking_policy_paths = list(masking_policy_paths)
+    paths = [access_policies_path, higher_ed_config_path, *masking_policy_paths, role_matrix_path]
+    fingerprint = sources_fingerprint(path for path in paths if path)
+    if os.path.exists(cache_path):
+        try:
+            index = AccessPolicyIndex.load(cache_path)
+            if index.fingerprint == fingerprint:
+                return index
+        except (ValueError, KeyError) as e:
+            print(f"Ignoring unreadable access index cache {cache_path}: {str(e)}")
+
+    index = AccessPolicyIndex.compile(access_policies_path, higher_ed_config_path,
+                                      masking_policy_paths, role_matrix_path)
+    index.save(cache_path)
+    return index
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description='Query the effective access of a role to a column')
+    parser.add_argument('--access-policies', default=os.path.join(root, 'framework', 'access_policies.yaml'))
+    parser.add_argument('--config', default=os.path.join(root, 'configs', 'higher_ed_config.yaml'))
+    parser.add_argument('--masking-policy', nargs='*',
+                        default=[os.path.join(root, 'examples', 'higher_ed', 'gpa_masking_policy.yaml')])
+    parser.add_argument('--role-matrix', default=os.path.join(root, 'examples', 'higher_ed', 'role_matrix.json'))
+    parser.add_argument('--cache', default=os.path.join('.access_index', 'access_index.json'))
+    parser.add_argument('--role', required=True)
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--table', required=True)
+    parser.add_argument('--column', required=True)
+    args = parser.parse_args()
+
+    index = load_access_index(args.access_policies, args.config, args.masking_policy, args.role_matrix, args.cache)
+    access = index.lookup(args.role, args.database, args.table, args.column)
+    print(json.dumps({
+        'access_level': access.access_level,
+        'masking_type': access.masking_type,
+        'row_filters': {name: index.row_filters[name] for name in access.row_filters}
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+import boto3
+import pandas as pd
+from metadata_classification import MetadataClassifier
+from subject_index import SUBJECT_COLUMN, SubjectLocation, SubjectLocationIndex, index_salt_from_secret
+
+_worker_classifier: Optional[MetadataClassifier] = None
+_worker_s3 = None
+
+def _init_worker(config_path: str):
+    global _worker_classifier, _worker_s3
+    _worker_classifier = MetadataClassifier(config_path)
+    _worker_s3 = boto3.client('s3')
+
+def _classify_table(table_ref: Tuple[str, str], samples: Dict[str, List[str]]):
+    """Process-pool task: classify every sampled column of one table"""
+    frame = pd.DataFrame({column: pd.Series(values, dtype=object) for column, values in samples.items()})
+    return table_ref, list(_worker_classifier.classify_frame(frame).values())
+
+def _sample_and_classify_table(table_ref: Tuple[str, str], table: Dict, sample_size: int, max_rows_scanned: int):
+    """Process-pool task: sample one table from S3 and classify its columns"""
+    return _classify_table(table_ref, _sample_table(_worker_s3, table, sample_size, max_rows_scanned))
+
+def _iter_data_objects(s3_client, location: str) -> Iterator[Tuple[str, Dict]]:
+    """(bucket, listed object) of every non-empty data file under an S3 location"""
+    bucket, _, prefix = location.replace('s3://', '', 1).partition('/')
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    while True:
+        response = s3_client.list_objects_v2(**params)
+        for obj in response.get('Contents', []):
+            name = obj['Key'].rsplit('/', 1)[-1]
+            if obj['Size'] > 0 and not name.startswith(('_', '.')):
+                yield bucket, obj
+        if not response.get('IsTruncated'):
+            return
+        params['ContinuationToken'] = response['NextContinuationToken']
+
+def _sample_table(s3_client, table: Dict, sample_size: int, max_rows_scanned: int) -> Dict[str, List[str]]:
+    """Reservoir-sample every column of a table from its S3 location"""
+    descriptor = table.get('StorageDescriptor', {})
+    columns = [column['Name'] for column in descriptor.get('Columns', [])]
+    reservoir = ColumnReservoir(columns, sample_size)
+    if not descriptor.get('Location') or not columns:
+        return reservoir.samples
+
+    scanned = 0
+    for bucket, obj in _iter_data_objects(s3_client, descriptor['Location']):
+        for row in _iter_object_rows(s3_client, bucket, obj['Key'], columns):
+            for column in columns:
+                reservoir.add(column, row.get(column))
+            scanned += 1
+            if scanned >= max_rows_scanned:
+                return reservoir.samples
+    return reservoir.samples
+
+def _iter_object_rows(s3_client, bucket: str, key: str, columns: List[str]) -> Iterator[Dict]:
+    """Stream rows of a CSV, JSON-lines or Parquet object as dicts"""
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+    if key.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        yield from pq.read_table(io.BytesIO(body.read())).to_pylist()
+    elif key.endswith(('.json', '.jsonl', '.ndjson')):
+        for line in body.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+    else:
+        lines = (line.decode('utf-8') for line in body.iter_lines())
+        for values in csv.reader(lines):
+            if values == columns:
+                continue
+            yield dict(zip(columns, values))
+
+def _file_subjects(bucket: str, key: str, columns: List[str]) -> List[str]:
+    """Process-pool task: distinct subject ids of one data file"""
+    if key.endswith('.parquet'):
+        # Only the subject column is decoded
+        import pyarrow.parquet as pq
+        body = _worker_s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        subjects = pq.read_table(io.BytesIO(body), columns=[SUBJECT_COLUMN])[SUBJECT_COLUMN].to_pylist()
+    else:
+        subjects = (row.get(SUBJECT_COLUMN) for row in _iter_object_rows(_worker_s3, bucket, key, columns))
+    return sorted({str(subject) for subject in subjects if subject not in (None, '')})
+
+def _shift_timestamp(timestamp: str, minutes: int) -> str:
+    return (datetime.fromisoformat(timestamp) + timedelta(minutes=minutes)).isoformat()
+
+class ColumnReservoir:
+    """Fixed-size uniform sample of non-empty values per column (Algorithm R)"""
+
+    def __init__(self, columns: List[str], size: int, seed: int = 0):
+        self.size = size
+        self.random = random.Random(seed)
+        self.seen = {column: 0 for column in columns}
+        self.samples: Dict[str, List[str]] = {column: [] for column in columns}
+
+    def add(self, column: str, value):
+        if value is None or value == '':
+            return
+        self.seen[column] += 1
+        sample = self.samples[column]
+        if len(sample) < self.size:
+            sample.append(str(value))
+        else:
+            slot = self.random.randrange(self.seen[column])
+            if slot < self.size:
+                sample[slot] = str(value)
+
+class ClassificationCrawler:
+    """Crawl the Glue catalog, sample each table from S3 and write classifications back.
+
+    Tables whose schema hash or UpdateTime is unchanged since the last crawl
+    (recorded in a local JSON state file) are skipped. With a subject index,
+    the files of every table holding student_id that are new since the last
+    crawl are read in the worker pool and their subjects indexed; the state
+    file keeps a per-table watermark of S3 modification times for this.
+    """
+
+    def __init__(self,
+                 config_path: str,
+                 state_path: str = os.path.join('.classification', 'crawl_state.json'),
+                 sample_size: int = 1000,
+                 max_rows_scanned: int = 100000,
+                 max_workers: Optional[int] = None,
+                 batch_size: int = 25,
+                 subject_index: Optional[SubjectLocationIndex] = None,
+                 settle_minutes: int = 60):
+        """
+        Args:
+            config_path: Classifier configuration passed to every worker process
+            state_path: Local file recording the last crawled version of each table
+            sample_size: Reservoir size per column
+            max_rows_scanned: Rows read per table before sampling stops
+            max_workers: Classification processes (defaults to the CPU count)
+            batch_size: Tables classified and written back per batch
+            subject_index: Index that every new file of a table holding student_id is added to
+            settle_minutes: Files modified this close to the newest indexed file are checked again on the
+                next crawl, so uploads that become visible late are not passed by the watermark
+        """
+        self.config_path = config_path
+        self.state_path = state_path
+        self.sample_size = sample_size
+        self.max_rows_scanned = max_rows_scanned
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.subject_index = subject_index
+        self.settle_minutes = settle_minutes
+        self.classifier = MetadataClassifier(config_path)
+        self.glue_client = self.classifier.glue_client
+        self.s3_client = boto3.client('s3')
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r') as f:
+            return json.load(f)
+
+    def _save_state(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _schema_hash(table: Dict) -> str:
+        """Hash the parts of a table definition that affect classification"""
+        descriptor = table.get('StorageDescriptor', {})
+        fingerprint = {
+            'columns': descriptor.get('Columns', []),
+            'partition_keys': table.get('PartitionKeys', []),
+            'location': descriptor.get('Location'),
+            # Ignore the parameters written back by the crawler itself
+            'parameters': {
+                key: value for key, value in table.get('Parameters', {}).items()
+                if not key.startswith('classification_')
+            }
+        }
+        return hashlib.sha1(json.dumps(fingerprint, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _iter_tables(self) -> Iterator[Tuple[str, Dict]]:
+        """Page through every database and table in the catalog"""
+        params = {}
+        while True:
+            response = self.glue_client.get_databases(**params)
+            for database in response['DatabaseList']:
+                table_params = {'DatabaseName': database['Name']}
+                while True:
+                    tables = self.glue_client.get_tables(**table_params)
+                    for table in tables['TableList']:
+                        yield database['Name'], table
+                    if not tables.get('NextToken'):
+                        break
+                    table_params['NextToken'] = tables['NextToken']
+            if not response.get('NextToken'):
+                return
+            params['NextToken'] = response['NextToken']
+
+    def _iter_data_objects(self, location: str) -> Iterator[Tuple[str, Dict]]:
+        return _iter_data_objects(self.s3_client, location)
+
+    def sample_table(self, table: Dict) -> Dict[str, List[str]]:
+        """Reservoir-sample every column of a table from its S3 location"""
+        return _sample_table(self.s3_client, table, self.sample_size, self.max_rows_scanned)
+
+    def _new_subject_files(self, state_key: str, table: Dict) -> List[Tuple[str, str, str]]:
+        """(bucket, key, modified) of a table's files not indexed by an earlier crawl"""
+        descriptor = table.get('StorageDescriptor', {})
+        columns = [column['Name'] for column in descriptor.get('Columns', [])]
+        if not descriptor.get('Location') or SUBJECT_COLUMN not in columns:
+            return []
+        previous = self.state.get(state_key, {})
+        watermark = previous.get('subjects_watermark')
+        boundary = {tuple(entry) for entry in previous.get('subjects_boundary_files', [])}
+        files = []
+        for bucket, obj in self._iter_data_objects(descriptor['Location']):
+            modified = obj['LastModified'].astimezone(timezone.utc).isoformat()
+            path = f"s3://{bucket}/{obj['Key']}"
+            if (watermark is None or modified >= watermark) and (path, modified) not in boundary:
+                files.append((bucket, obj['Key'], modified))
+        return files
+
+    def _advance_subject_watermark(self, state_key: str, files: List[Tuple[str, str, str]]):
+        """Move a table's watermark to settle_minutes before its newest indexed file"""
+        entry = self.state.setdefault(state_key, {})
+        indexed = {tuple(item) for item in entry.get('subjects_boundary_files', [])}
+        indexed.update((f"s3://{bucket}/{key}", modified) for bucket, key, modified in files)
+        latest = max(modified for _, modified in indexed)
+        settled = _shift_timestamp(latest, -self.settle_minutes)
+        watermark = max(filter(None, [entry.get('subjects_watermark'), settled]))
+        entry['subjects_watermark'] = watermark
+        entry['subjects_boundary_files'] = sorted(
+            [path, modified] for path, modified in indexed if modified >= watermark
+        )
+
+    def _submit_subject_files(self, executor: ProcessPoolExecutor, state_key: str, table: Dict) -> List:
+        """Queue every new file of a table for subject indexing in the pool"""
+        descriptor = table.get('StorageDescriptor', {})
+        columns = [column['Name'] for column in descriptor.get('Columns', [])]
+        return [
+            (state_key, descriptor['Location'], (bucket, key, modified),
+             executor.submit(_file_subjects, bucket, key, columns))
+            for bucket, key, modified in self._new_subject_files(state_key, table)
+        ]
+
+    def _index_subject_files(self, queued: List) -> int:
+        """Add the subjects read by the pool to the index, flush it, then advance the watermarks"""
+        indexed: Dict[str, List[Tuple[str, str, str]]] = {}
+        for state_key, location, (bucket, key, modified), future in queued:
+            file_location = SubjectLocation(location, file=f"s3://{bucket}/{key}")
+            for subject in future.result():
+                self.subject_index.add(subject, file_location)
+            indexed.setdefault(state_key, []).append((bucket, key, modified))
+        self.subject_index.flush()
+        for state_key, files in indexed.items():
+            self._advance_subject_watermark(state_key, files)
+        self._save_state()
+        return len(queued)
+
+    def _write_back(self, results, tables: Dict[Tuple[str, str], Dict]):
+        for (database, name), classifications in results:
+            table = tables[(database, name)]
+            self.classifier.apply_classification_to_glue_table(database, name, classifications, table)
+            self.state.setdefault(f"{database}.{name}", {}).update({
+                'schema_hash': self._schema_hash(table),
+                'update_time': str(table.get('UpdateTime'))
+            })
+        self._save_state()
+
+    def crawl(self) -> Dict[str, int]:
+        """Classify every new or changed table in the catalog"""
+        try:
+            stats = {'classified': 0, 'skipped': 0, 'subject_files': 0}
+            pending: Dict[Tuple[str, str], Dict] = {}
+            queued_files = []
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(self.config_path,)) as executor:
+                for database, table in self._iter_tables():
+                    state_key = f"{database}.{table['Name']}"
+                    if self.subject_index is not None:
+                        # New files do not change the catalog entry, so unchanged tables are checked too
+                        queued_files.extend(self._submit_subject_files(executor, state_key, table))
+
+                    previous = self.state.get(state_key)
+                    if previous and 'update_time' in previous and (
+                            previous['update_time'] == str(table.get('UpdateTime')) or
+                            previous['schema_hash'] == self._schema_hash(table)):
+                        stats['skipped'] += 1
+                        continue
+
+                    pending[(database, table['Name'])] = table
+                    if len(pending) >= self.batch_size:
+                        stats['classified'] += self._run_batch(executor, pending)
+                        pending = {}
+
+                if pending:
+                    stats['classified'] += self._run_batch(executor, pending)
+
+                if self.subject_index is not None:
+                    stats['subject_files'] = self._index_subject_files(queued_files)
+
+            print(f"Classified {stats['classified']} tables, skipped {stats['skipped']} unchanged tables")
+            return stats
+
+        except Exception as e:
+            print(f"Error crawling catalog: {str(e)}")
+            raise
+
+    def _run_batch(self, executor: ProcessPoolExecutor, tables: Dict[Tuple[str, str], Dict]) -> int:
+        """Sample and classify a batch of tables in the pool, then write back"""
+        # Sampling reads S3, so it runs in the workers alongside classification
+        futures = [
+            executor.submit(_sample_and_classify_table, table_ref, table, self.sample_size, self.max_rows_scanned)
+            for table_ref, table in tables.items()
+        ]
+        self._write_back([future.result() for future in futures], tables)
+        return len(tables)
+
+def main():
+    parser = argparse.ArgumentParser(description='Classify every table in the Glue catalog')
+    parser.add_argument('--config', default='configs/higher_ed_config.yaml', help='Classifier configuration')
+    parser.add_argument('--state', default=os.path.join('.classification', 'crawl_state.json'),
+                        help='Incremental crawl state file')
+    parser.add_argument('--sample-size', type=int, default=1000, help='Reservoir size per column')
+    parser.add_argument('--workers', type=int, default=None, help='Classification processes')
+    parser.add_argument('--subject-index', help='Also add the subjects of crawled tables to this subject location index')
+    parser.add_argument('--salt-secret', help='Secrets Manager secret holding the subject index salt '
+                                              '(default: the SUBJECT_INDEX_SALT environment variable)')
+    args = parser.parse_args()
+
+    subject_index = None
+    if args.subject_index:
+        salt = index_salt_from_secret(args.salt_secret) if args.salt_secret else None
+        subject_index = SubjectLocationIndex(args.subject_index, salt=salt)
+    crawler = ClassificationCrawler(args.config, state_path=args.state,
+                                    sample_size=args.sample_size, max_workers=args.workers,
+                                    subject_index=subject_index)
+    crawler.crawl()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import argparse
+import math
+import os
+import shutil
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import boto3
+
+DEFAULT_PARTITION_KEYS = ['department', 'enrollment_status']
+DEFAULT_SORT_KEY = 'student_id'
+DEFAULT_TARGET_FILE_SIZE_MB = 256
+# Compressed Parquet size of a curated student record, used when no files exist to measure
+DEFAULT_BYTES_PER_ROW = 200
+# A partition needs compaction when its files average under this fraction of the target
+SMALL_FILE_FRACTION = 0.5
+
+_FILE_COUNT_COLUMN = '__file_count'
+_FILE_BUCKET_COLUMN = '__file_bucket'
+
+PartitionValues = Tuple[Optional[str], ...]
+
+def target_rows_per_file(target_file_size_mb: int = DEFAULT_TARGET_FILE_SIZE_MB,
+                         bytes_per_row: float = DEFAULT_BYTES_PER_ROW) -> int:
+    """Rows that make a file of about target_file_size_mb"""
+    if target_file_size_mb <= 0 or bytes_per_row <= 0:
+        raise ValueError("target_file_size_mb and bytes_per_row must be positive")
+    return max(1, int(target_file_size_mb * 1024 * 1024 / bytes_per_row))
+
+def files_per_partition(partition_row_counts: Dict[PartitionValues, int], rows_per_file: int) -> Dict[PartitionValues, int]:
+    """Number of output files for each partition"""
+    return {
+        partition: max(1, math.ceil(rows / rows_per_file))
+        for partition, rows in partition_row_counts.items()
+    }
+
+def write_sized_partitions(df,
+                           path: str,
+                           partition_keys: Sequence[str] = DEFAULT_PARTITION_KEYS,
+                           sort_key: str = DEFAULT_SORT_KEY,
+                           target_file_size_mb: int = DEFAULT_TARGET_FILE_SIZE_MB,
+                           bytes_per_row: float = DEFAULT_BYTES_PER_ROW,
+                           partition_row_counts: Optional[Dict[PartitionValues, int]] = None,
+                           mode: str = 'overwrite'):
+    """
+    Write df as Parquet partitioned by partition_keys, in files of about the target size.
+
+    Each partition is split into ceil(rows / target rows) buckets on a hash
+    of sort_key and the data is repartitioned by (partition keys, bucket),
+    so every write task produces one file for one partition instead of one
+    file per partition it happens to hold. Rows are sorted by sort_key
+    within each file, which keeps Parquet min/max statistics tight enough
+    for row-group skipping on student_id lookups.
+
+    Args:
+        df: DataFrame to write
+        path (str): Table location
+        partition_keys (list): Partition columns
+        sort_key (str): Column to sort each file by
+        target_file_size_mb (int): Target output file size
+        bytes_per_row (float): Compressed Parquet bytes per row
+        partition_row_counts (dict): Rows per partition (tuple of key values), counted when omitted
+        mode (str): Save mode; with dynamic partitionOverwriteMode, 'overwrite' replaces only written partitions
+    """
+    from pyspark.sql import functions as F
+
+    partition_keys = list(partition_keys)
+    rows_per_file = target_rows_per_file(target_file_size_mb, bytes_per_row)
+    if partition_row_counts is None:
+        partition_row_counts = {
+            tuple(row[key] for key in partition_keys): row['count']
+            for row in df.groupBy(*partition_keys).count().collect()
+        }
+    file_counts = files_per_partition(partition_row_counts, rows_per_file)
+    total_files = max(1, sum(file_counts.values()))
+
+    # Partitions small enough for one file need no bucket lookup
+    split = {partition: count for partition, count in file_counts.items() if count > 1}
+    if split:
+        spark = df.sparkSession
+        counts_df = spark.createDataFrame(
+            [tuple(partition) + (count,) for partition, count in split.items()],
+            [f"{key}__p" for key in partition_keys] + [_FILE_COUNT_COLUMN]
+        )
+        condition = [df[key].eqNullSafe(counts_df[f"{key}__p"]) for key in partition_keys]
+        df = df.join(F.broadcast(counts_df), condition, 'left') \
+            .drop(*[f"{key}__p" for key in partition_keys]) \
+            .withColumn(_FILE_BUCKET_COLUMN,
+                        F.pmod(F.xxhash64(sort_key), F.coalesce(F.col(_FILE_COUNT_COLUMN), F.lit(1)))) \
+            .drop(_FILE_COUNT_COLUMN)
+    else:
+        df = df.withColumn(_FILE_BUCKET_COLUMN, F.lit(0))
+
+    df.repartition(total_files, *partition_keys, _FILE_BUCKET_COLUMN) \
+        .sortWithinPartitions(*partition_keys, sort_key) \
+        .drop(_FILE_BUCKET_COLUMN) \
+        .write.mode(mode) \
+        .option("maxRecordsPerFile", rows_per_file) \
+        .partitionBy(*partition_keys) \
+        .parquet(path)
+
+@dataclass
+class PartitionFiles:
+    """Data files of one partition directory"""
+    path: str
+    values: PartitionValues
+    files: List[str] = field(default_factory=list)
+    sizes: List[int] = field(default_factory=list)
+    # Latest modification time of any file, as epoch seconds
+    modified: float = 0.0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.sizes)
+
+    def is_fragmented(self, target_bytes: int) -> bool:
+        """More files than the partition's size calls for, averaging well under the target"""
+        ideal_files = max(1, math.ceil(self.total_bytes / target_bytes))
+        return len(self.sizes) > ideal_files and \
+            self.total_bytes / len(self.sizes) < target_bytes * SMALL_FILE_FRACTION
+
+def _is_data_file(name: str) -> bool:
+    return not name.startswith(('_', '.')) and not name.endswith('_$folder$')
+
+def list_partition_files(path: str, partition_keys: Sequence[str], s3_client=None) -> List[PartitionFiles]:
+    """Data files under a partitioned table location, grouped by partition"""
+    partition_keys = list(partition_keys)
+    partitions: Dict[str, PartitionFiles] = {}
+    root = path.rstrip('/') + '/'
+
+    def add(relative_path: str, size: int, modified: float):
+        parts = relative_path.split('/')
+        directories, name = parts[:-1], parts[-1]
+        if len(directories) != len(partition_keys) or not _is_data_file(name):
+            return
+        values = dict(part.partition('=')[::2] for part in directories)
+        if list(values) != partition_keys:
+            return
+        partition_path = root + '/'.join(directories)
+        if partition_path not in partitions:
+            partitions[partition_path] = PartitionFiles(
+                partition_path,
+                tuple(None if values[key] == '__HIVE_DEFAULT_PARTITION__' else values[key] for key in partition_keys)
+            )
+        partition = partitions[partition_path]
+        partition.files.append(root + relative_path)
+        partition.sizes.append(size)
+        partition.modified = max(partition.modified, modified)
+
+    if root.startswith('s3://'):
+        s3_client = s3_client or boto3.client('s3')
+        bucket, _, prefix = root[len('s3://'):].partition('/')
+        for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                add(obj['Key'][len(prefix):], obj['Size'], obj['LastModified'].timestamp())
+    else:
+        for directory, _, names in os.walk(root):
+            for name in names:
+                full_path = os.path.join(directory, name)
+                add(os.path.relpath(full_path, root).replace(os.sep, '/'),
+                    os.path.getsize(full_path), os.path.getmtime(full_path))
+    return sorted(partitions.values(), key=lambda partition: partition.path)
+
+def existing_partitions(path: str, specs: Iterable[str], s3_client=None) -> List[str]:
+    """The partition directories (relative specs such as 'department=Math/enrollment_status=ACTIVE') holding data files"""
+    root = path.rstrip('/') + '/'
+    existing = []
+    for spec in sorted(set(specs)):
+        if root.startswith('s3://'):
+            s3_client = s3_client or boto3.client('s3')
+            bucket, _, prefix = root[len('s3://'):].partition('/')
+            pages = s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f"{prefix}{spec}/")
+            found = any(_is_data_file(obj['Key'].rsplit('/', 1)[-1]) for page in pages for obj in page.get('Contents', []))
+        else:
+            directory = os.path.join(root, spec)
+            found = os.path.isdir(directory) and any(_is_data_file(name) for name in os.listdir(directory))
+        if found:
+            existing.append(spec)
+    return existing
+
+def delete_partitions(path: str, specs: Iterable[str], s3_client=None) -> int:
+    """
+    Delete every object under the given partition directories of a table.
+
+    A dynamic partition overwrite only replaces partitions present in the
+    written data, so a partition whose rows all moved elsewhere has to be
+    removed explicitly. Returns the objects deleted.
+    """
+    root = path.rstrip('/') + '/'
+    deleted = 0
+    for spec in sorted(set(specs)):
+        if not spec:
+            raise ValueError("Refusing to delete a whole table location")
+        if root.startswith('s3://'):
+            s3_client = s3_client or boto3.client('s3')
+            bucket, _, prefix = root[len('s3://'):].partition('/')
+            for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f"{prefix}{spec}/"):
+                keys = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+                if keys:
+                    s3_client.delete_objects(Bucket=bucket, Delete={'Objects': keys, 'Quiet': True})
+                    deleted += len(keys)
+        else:
+            directory = os.path.join(root, spec)
+            if os.path.isdir(directory):
+                deleted += sum(len(names) for _, _, names in os.walk(directory))
+                shutil.rmtree(directory)
+    return deleted
+
+def find_fragmented_partitions(path: str,
+                               partition_keys: Sequence[str] = DEFAULT_PARTITION_KEYS,
+                               target_file_size_mb: int = DEFAULT_TARGET_FILE_SIZE_MB,
+                               s3_client=None) -> List[PartitionFiles]:
+    """Partitions whose files are too small and too many for their size"""
+    target_bytes = target_file_size_mb * 1024 * 1024
+    return [
+        partition for partition in list_partition_files(path, partition_keys, s3_client)
+        if partition.is_fragmented(target_bytes)
+    ]
+
+def compact_partitions(spark,
+                       path: str,
+                       partition_keys: Sequence[str] = DEFAULT_PARTITION_KEYS,
+                       sort_key: str = DEFAULT_SORT_KEY,
+                       target_file_size_mb: int = DEFAULT_TARGET_FILE_SIZE_MB,
+                       dry_run: bool = False,
+                       s3_client=None) -> Dict:
+    """
+    Rewrite the fragmented partitions of a table in place.
+
+    Only partitions found by find_fragmented_partitions are read; they are
+    rewritten together, at target file size and sorted by sort_key, with a
+    dynamic partition overwrite so no other partition is touched.
+
+    Returns:
+        dict: Partitions, files and bytes before compaction, and files written
+    """
+    fragmented = find_fragmented_partitions(path, partition_keys, target_file_size_mb, s3_client)
+    summary = {
+        'partitions': [partition.path for partition in fragmented],
+        'files_before': sum(len(partition.sizes) for partition in fragmented),
+        'bytes': sum(partition.total_bytes for partition in fragmented),
+        'files_after': 0
+    }
+    if not fragmented:
+        return summary
+
+    target_bytes = target_file_size_mb * 1024 * 1024
+    summary['files_after'] = sum(max(1, math.ceil(partition.total_bytes / target_bytes)) for partition in fragmented)
+    if dry_run:
+        return summary
+
+    df = spark.read.option("basePath", path).parquet(*[partition.path for partition in fragmented])
+    # Parquet counts come from file footers, so this reads no data pages
+    rows = defaultdict(int)
+    for row in df.groupBy(*partition_keys).count().collect():
+        rows[tuple(row[key] for key in partition_keys)] = row['count']
+    total_rows = sum(rows.values())
+    # Materialized so the overwrite does not read the files it is replacing
+    df = df.localCheckpoint(eager=True)
+    spark.conf.set("spark.sql.sources.partitionOverwriteMode", "dynamic")
+    write_sized_partitions(
+        df, path, partition_keys, sort_key, target_file_size_mb,
+        bytes_per_row=summary['bytes'] / total_rows if total_rows else DEFAULT_BYTES_PER_ROW,
+        partition_row_counts=dict(rows)
+    )
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact small-file partitions of a partitioned Parquet table')
+    parser.add_argument('path', help='Table location (s3:// or local)')
+    parser.add_argument('--partition-keys', nargs='+', default=DEFAULT_PARTITION_KEYS)
+    parser.add_argument('--sort-key', default=DEFAULT_SORT_KEY)
+    parser.add_argument('--target-file-size-mb', type=int, default=DEFAULT_TARGET_FILE_SIZE_MB)
+    parser.add_argument('--dry-run', action='store_true', help='Only report the partitions to compact')
+    args = parser.parse_args()
+
+    spark = None
+    if not args.dry_run:
+        from pyspark.sql import SparkSession
+        spark = SparkSession.builder.appName('compact_curated_partitions').getOrCreate()
+    summary = compact_partitions(
+        spark, args.path, args.partition_keys, args.sort_key, args.target_file_size_mb, args.dry_run
+    )
+    action = 'Would compact' if args.dry_run else 'Compacted'
+    print(f"{action} {len(summary['partitions'])} partitions: "
+          f"{summary['files_before']} files ({summary['bytes']} bytes) into {summary['files_after']}")
+    for partition in summary['partitions']:
+        print(f"  {partition}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import argparse
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+import yaml
+from access_policy_index import role_key
+
+MASK_ALL_VALUE = '********'
+# Columns the Glue job reads as DoubleType; Spark hashes their Java string form
+SPARK_DOUBLE_COLUMNS = ('gpa',)
+
+_ENV_PLACEHOLDER = re.compile(r'^\$\{ENV:([A-Za-z_][A-Za-z0-9_]*)\}$')
+_DIGEST_COLUMN = '__masking_digest'
+
+@dataclass(frozen=True)
+class MaskingSpec:
+    """How one column is masked"""
+    masking_type: str
+    salt: str = ''
+    preserve_format: bool = False
+    preserve_length: bool = False
+
+def _resolve_env(value: str) -> str:
+    """Expand a '${ENV:NAME}' placeholder from the environment"""
+    match = _ENV_PLACEHOLDER.match(value or '')
+    if not match:
+        return value or ''
+    if match.group(1) not in os.environ:
+        raise ValueError(f"Environment variable {match.group(1)} is not set")
+    return os.environ[match.group(1)]
+
+def java_double_string(value: float) -> str:
+    """
+    Format a double like Java's Double.toString, which Spark uses to cast doubles to strings.
+
+    Digits are the shortest round-trip representation (Python's repr), as
+    printed by Java for all but a few edge-case values.
+    """
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return 'Infinity' if value > 0 else '-Infinity'
+    if value == 0:
+        return '-0.0' if str(value).startswith('-') else '0.0'
+    if 1e-3 <= abs(value) < 1e7:
+        text = repr(value)
+        return text if '.' in text else f"{text}.0"
+
+    sign, digits, exponent = Decimal(repr(value)).normalize().as_tuple()
+    digits = ''.join(map(str, digits))
+    mantissa = f"{digits[0]}.{digits[1:] or '0'}"
+    return f"{'-' if sign else ''}{mantissa}E{exponent + len(digits) - 1}"
+
+def spark_string(value) -> str:
+    """String form of a value as produced by Spark's CAST(... AS STRING)"""
+    if isinstance(value, bool) or type(value).__name__ == 'bool_':
+        return 'true' if value else 'false'
+    if isinstance(value, float) or type(value).__name__ in ('float64', 'float32'):
+        return java_double_string(float(value))
+    return str(value)
+
+def _shape(digest: str, value: str, spec: MaskingSpec) -> str:
+    if spec.preserve_format:
+        # Each character keeps its class; digits and letters are drawn from
+        # successive digest bytes, cycling after 32 characters
+        masked = []
+        for i, char in enumerate(value):
+            byte = int(digest[(i % 32) * 2:(i % 32) * 2 + 2], 16)
+            if '0' <= char <= '9':
+                masked.append(str(byte % 10))
+            elif 'A' <= char <= 'Z':
+                masked.append(chr(65 + byte % 26))
+            elif 'a' <= char <= 'z':
+                masked.append(chr(97 + byte % 26))
+            else:
+                masked.append(char)
+        return ''.join(masked)
+    if spec.preserve_length:
+        return (digest * (len(value) // 64 + 1))[:len(value)]
+    return digest
+
+def hash_strings(values: List[str], spec: MaskingSpec) -> List[str]:
+    """Salted SHA-256 of a batch of strings, shaped by the spec"""
+    salted = hashlib.sha256(spec.salt.encode('utf-8'))
+    hashed = []
+    for value in values:
+        digest = salted.copy()
+        digest.update(value.encode('utf-8'))
+        hashed.append(_shape(digest.hexdigest(), value, spec))
+    return hashed
+
+def mask_series(values, spec: MaskingSpec):
+    """
+    Mask a pandas Series.
+
+    Values are factorized first, so each distinct value is hashed once;
+    nulls stay null for HASH and become the mask for MASK_ALL, as in Spark.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if spec.masking_type == 'MASK_ALL':
+        return pd.Series(MASK_ALL_VALUE, index=values.index, dtype=object)
+    if spec.masking_type != 'HASH':
+        raise ValueError(f"Unsupported masking type: {spec.masking_type}")
+
+    codes, uniques = pd.factorize(values)
+    hashed = hash_strings([spark_string(value) for value in uniques], spec)
+    # Code -1 (null) picks the trailing None
+    lookup = np.array(hashed + [None], dtype=object)
+    return pd.Series(lookup[codes], index=values.index, dtype=object)
+
+def mask_frame(df, specs: Dict[str, MaskingSpec]):
+    """Return a copy of a DataFrame with every column in specs masked"""
+    df = df.copy()
+    for field, spec in specs.items():
+        if field in df.columns:
+            df[field] = mask_series(df[field], spec)
+    return df
+
+def mask_arrow_table(table, specs: Dict[str, MaskingSpec]):
+    """Mask an Arrow table, hashing the dictionary of each column rather than every row"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    for field, spec in specs.items():
+        index = table.schema.get_field_index(field)
+        if index < 0:
+            continue
+        if spec.masking_type == 'MASK_ALL':
+            masked = pa.array([MASK_ALL_VALUE] * table.num_rows, pa.string())
+        elif spec.masking_type == 'HASH':
+            encoded = pc.dictionary_encode(table.column(index).combine_chunks())
+            hashed = hash_strings([spark_string(value) for value in encoded.dictionary.to_pylist()], spec)
+            masked = pc.take(pa.array(hashed, pa.string()), encoded.indices)
+        else:
+            raise ValueError(f"Unsupported masking type: {spec.masking_type}")
+        table = table.set_column(index, pa.field(field, pa.string()), masked)
+    return table
+
+def spark_mask_frame(df, specs: Dict[str, MaskingSpec]):
+    """Apply the same masking to a Spark DataFrame"""
+    from pyspark.sql import functions as F
+
+    for field, spec in specs.items():
+        if field not in df.columns:
+            continue
+        if spec.masking_type == 'MASK_ALL':
+            df = df.withColumn(field, F.lit(MASK_ALL_VALUE))
+            continue
+        if spec.masking_type != 'HASH':
+            raise ValueError(f"Unsupported masking type: {spec.masking_type}")
+
+        value = F.col(field).cast('string')
+        digest = F.sha2(F.concat(F.lit(spec.salt), value), 256)
+        if not (spec.preserve_format or spec.preserve_length):
+            df = df.withColumn(field, digest)
+            continue
+
+        value_sql = f"CAST(`{field}` AS STRING)"
+        if spec.preserve_format:
+            byte_sql = f"CAST(conv(substr({_DIGEST_COLUMN}, ((i - 1) % 32) * 2 + 1, 2), 16, 10) AS INT)"
+            char_sql = f"substr({value_sql}, i, 1)"
+            shaped = (
+                f"CASE WHEN length({value_sql}) = 0 THEN '' ELSE concat_ws('', transform(sequence(1, length({value_sql})), i -> "
+                f"CASE WHEN {char_sql} BETWEEN '0' AND '9' THEN CAST({byte_sql} % 10 AS STRING) "
+                f"WHEN {char_sql} BETWEEN 'A' AND 'Z' THEN chr(65 + {byte_sql} % 26) "
+                f"WHEN {char_sql} BETWEEN 'a' AND 'z' THEN chr(97 + {byte_sql} % 26) "
+                f"ELSE {char_sql} END)) END"
+            )
+        else:
+            shaped = (
+                f"substring(repeat({_DIGEST_COLUMN}, CAST(length({value_sql}) DIV 64 AS INT) + 1), "
+                f"1, length({value_sql}))"
+            )
+        df = df.withColumn(_DIGEST_COLUMN, digest) \
+            .withColumn(field, F.when(value.isNotNull(), F.expr(shaped))) \
+            .drop(_DIGEST_COLUMN)
+    return df
+
+class DataMasker:
+    """
+    Resolves masking_rules and column masking policies into per-role MaskingSpecs.
+
+    masking_rules come from a configuration such as higher_ed_config.yaml
+    (field, masking_type, roles); masking policies such as
+    gpa_masking_policy.yaml add salted, format-preserving hashing for their
+    target column and take precedence over masking_rules. Without a role,
+    every rule applies, as in the Glue job.
+    """
+
+    def __init__(self, masking_rules: Iterable[Dict] = (), masking_policies: Iterable[Dict] = ()):
+        self.masking_rules = list(masking_rules)
+        self.masking_policies = list(masking_policies)
+        self._specs: Dict[Optional[str], Dict[str, MaskingSpec]] = {}
+
+    @classmethod
+    def from_config(cls, config_path: str, masking_policy_paths: Iterable[str] = ()) -> 'DataMasker':
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f)
+        policies = []
+        for path in masking_policy_paths:
+            with open(path, 'r') as f:
+                policies.append(yaml.safe_load(f))
+        return cls(config.get('masking_rules', []), policies)
+
+    def specs_for_role(self, role: Optional[str] = None) -> Dict[str, MaskingSpec]:
+        """Column to MaskingSpec for a role, or for every rule when role is None"""
+        key = role_key(role) if role else None
+        if key in self._specs:
+            return self._specs[key]
+
+        specs = {}
+        for rule in self.masking_rules:
+            if key is None or key in {role_key(name) for name in rule.get('roles', [])}:
+                specs[rule['field']] = MaskingSpec(rule['masking_type'])
+
+        for policy in self.masking_policies:
+            column = policy['target']['column']
+            function = policy.get('masking_function', {})
+            if function.get('algorithm', 'SHA-256') != 'SHA-256':
+                raise ValueError(f"Unsupported masking algorithm: {function['algorithm']}")
+            for rule in policy.get('masking_rules', []):
+                if key is not None and role_key(rule['role']) != key:
+                    continue
+                if rule['access_level'] == 'FULL':
+                    if key is not None:
+                        specs.pop(column, None)
+                    continue
+                specs[column] = MaskingSpec(
+                    rule.get('masking_type', function.get('type', 'HASH')),
+                    salt=_resolve_env(function.get('salt', '')),
+                    preserve_format=bool(function.get('preserve_format', False)),
+                    preserve_length=bool(function.get('preserve_length', False))
+                )
+
+        self._specs[key] = specs
+        return specs
+
+    def mask_frame(self, df, role: Optional[str] = None):
+        return mask_frame(df, self.specs_for_role(role))
+
+    def mask_arrow_table(self, table, role: Optional[str] = None):
+        return mask_arrow_table(table, self.specs_for_role(role))
+
+    def mask_file(self, input_path: str, output_path: str, role: Optional[str] = None,
+                  chunksize: int = 100000, double_columns: Iterable[str] = SPARK_DOUBLE_COLUMNS) -> int:
+        """
+        Stream a CSV or Parquet file through the masking rules of a role.
+
+        CSV columns are read as strings except double_columns, which are
+        parsed as numbers so their hashes match the Glue job's DoubleType
+        columns. Returns the number of rows written.
+        """
+        specs = self.specs_for_role(role)
+        rows = 0
+        if input_path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+
+            writer = None
+            try:
+                for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunksize):
+                    import pyarrow as pa
+
+                    table = mask_arrow_table(pa.Table.from_batches([batch]), specs)
+                    if writer is None:
+                        writer = pq.ParquetWriter(output_path, table.schema)
+                    writer.write_table(table)
+                    rows += table.num_rows
+            finally:
+                if writer is not None:
+                    writer.close()
+            return rows
+
+        import pandas as pd
+
+        double_columns = set(double_columns)
+        header = True
+        for chunk in pd.read_csv(input_path, chunksize=chunksize, dtype=str, keep_default_na=False,
+                                 na_values=['']):
+            for column in double_columns & set(chunk.columns):
+                chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+            masked = mask_frame(chunk, specs)
+            masked.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+            header = False
+            rows += len(masked)
+        return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a masked extract of a CSV or Parquet file')
+    parser.add_argument('input', help='CSV or Parquet file')
+    parser.add_argument('output', help='Masked output file')
+    parser.add_argument('--config', required=True, help='Configuration with masking_rules')
+    parser.add_argument('--masking-policy', nargs='*', default=[], help='Column masking policies')
+    parser.add_argument('--role', help='Role whose masking applies; all rules when omitted')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Rows per chunk')
+    args = parser.parse_args()
+
+    masker = DataMasker.from_config(args.config, args.masking_policy)
+    rows = masker.mask_file(args.input, args.output, args.role, args.chunksize)
+    print(f"Masked {rows} rows into {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import glob
+import logging
+import os
+from urllib.parse import unquote
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from streaming_validation import StreamingValidator
+from validation_cache import ValidationCache
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE_SUFFIXES = ('.csv', '.parquet')
+
+def resolve_dataset_files(dataset_path: str) -> List[Tuple[str, str]]:
+    """
+    Resolve a file, directory or glob into (partition, file) pairs.
+
+    The partition is the file's directory relative to the dataset root, so
+    for curated/student_records/department=Math/enrollment_status=ACTIVE/part-0.parquet
+    it is "department=Math/enrollment_status=ACTIVE". Files and directories
+    starting with "_" or "." (e.g. _SUCCESS) are skipped.
+    """
+    if glob.has_magic(dataset_path):
+        root_parts = []
+        for component in dataset_path.split(os.sep):
+            if glob.has_magic(component):
+                break
+            root_parts.append(component)
+        root = os.sep.join(root_parts) or '.'
+        paths = glob.glob(dataset_path, recursive=True)
+    elif os.path.isdir(dataset_path):
+        root = dataset_path
+        paths = []
+        for directory, subdirectories, files in os.walk(dataset_path):
+            subdirectories[:] = sorted(d for d in subdirectories if not d.startswith(('_', '.')))
+            paths.extend(os.path.join(directory, name) for name in files)
+    else:
+        root = os.path.dirname(dataset_path)
+        paths = [dataset_path]
+
+    resolved = []
+    for path in sorted(paths):
+        if not path.endswith(DATA_FILE_SUFFIXES) or os.path.basename(path).startswith(('_', '.')):
+            continue
+        partition = os.path.relpath(os.path.dirname(path), root)
+        resolved.append(('' if partition == '.' else partition, path))
+    return resolved
+
+def partition_values(partition: str) -> Dict[str, str]:
+    """Parse Hive-style key=value path components, undoing their URL escaping"""
+    values = {}
+    for component in partition.split(os.sep):
+        key, sep, value = component.partition('=')
+        if sep:
+            values[unquote(key)] = unquote(value)
+    return values
+
+_worker_caches: Dict[str, ValidationCache] = {}
+
+def _validate_file(task: Tuple[str, str, Optional[List[Dict]], int, object, Optional[str]]) -> Tuple[str, str, Dict]:
+    """Process-pool task: validate one file of a partition"""
+    partition, path, expectations, chunksize, plan, cache_path = task
+    cache = None
+    if cache_path:
+        # SQLite connections cannot be pickled, so each worker opens its own
+        cache = _worker_caches.get(cache_path)
+        if cache is None:
+            cache = _worker_caches[cache_path] = ValidationCache(cache_path)
+    validator = StreamingValidator(expectations, chunksize=chunksize, plan=plan, cache=cache)
+    return partition, path, validator.validate(path, partition_values(partition))
+
+def validate_dataset(dataset_path: str,
+                     expectations: Optional[List[Dict]] = None,
+                     plan=None,
+                     chunksize: int = 100000,
+                     max_workers: Optional[int] = None,
+                     cache_path: Optional[str] = None) -> Dict:
+    """
+    Validate every file of a dataset in parallel and aggregate the results.
+
+    Args:
+        dataset_path (str): File, directory, glob or partitioned layout to validate
+        expectations (list): Expectation specs, defaults to STUDENT_RECORD_EXPECTATIONS
+        plan (QualityPlan): Optional compiled quality_rules to evaluate as well
+        chunksize (int): Rows read per chunk
+        max_workers (int): Worker processes, defaults to the CPU count
+        cache_path (str): Optional ValidationCache database; unchanged files reuse cached results
+
+    Returns:
+        dict: {"success", "partitions", "failed_partitions", "statistics"} where
+        partitions maps each partition to its success flag and per-file results
+    """
+    files = resolve_dataset_files(dataset_path)
+    if not files:
+        raise ValueError(f"No data files found at {dataset_path}")
+
+    if cache_path:
+        # Create the schema once before workers open the database concurrently
+        ValidationCache(cache_path)
+    tasks = [(partition, path, expectations, chunksize, plan, cache_path) for partition, path in files]
+    partitions: Dict[str, Dict] = {}
+    statistics = {
+        "evaluated_files": 0,
+        "successful_files": 0,
+        "evaluated_expectations": 0,
+        "successful_expectations": 0
+    }
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for partition, path, result in executor.map(_validate_file, tasks, chunksize=4):
+            entry = partitions.setdefault(partition, {"success": True, "files": {}})
+            entry["files"][path] = result
+            entry["success"] = entry["success"] and result["success"]
+
+            statistics["evaluated_files"] += 1
+            statistics["successful_files"] += int(result["success"])
+            statistics["evaluated_expectations"] += result["statistics"]["evaluated_expectations"]
+            statistics["successful_expectations"] += result["statistics"]["successful_expectations"]
+
+    failed_partitions = sorted(partition for partition, entry in partitions.items() if not entry["success"])
+    statistics["unsuccessful_expectations"] = (
+        statistics["evaluated_expectations"] - statistics["successful_expectations"]
+    )
+    statistics["success_percent"] = (
+        100.0 * statistics["successful_expectations"] / statistics["evaluated_expectations"]
+        if statistics["evaluated_expectations"] else None
+    )
+
+    if failed_partitions:
+        logger.warning(f"{len(failed_partitions)} of {len(partitions)} partitions failed validation:")
+        for partition in failed_partitions:
+            logger.warning(f"Failed partition: {partition or '<root>'}")
+    else:
+        logger.info(f"All {len(partitions)} partitions passed validation")
+
+    return {
+        "success": not failed_partitions,
+        "partitions": partitions,
+        "failed_partitions": failed_partitions,
+        "statistics": statistics
+    }
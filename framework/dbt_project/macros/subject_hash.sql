@@ -0,0 +1,8 @@
+{#
+    Salted hash of a subject id, equal to subject_index.subject_hash() in the framework:
+    the first 16 hex digits of sha256(salt || id). The salt is the subject index salt,
+    read from the SUBJECT_INDEX_SALT environment variable.
+#}
+{% macro subject_hash(column) %}
+    lower(substr(to_hex(sha256(to_utf8(concat('{{ env_var("SUBJECT_INDEX_SALT") | replace("'", "''") }}', cast({{ column }} as varchar))))), 1, 16))
+{% endmacro %}
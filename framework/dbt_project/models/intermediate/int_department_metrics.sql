@@ -1,19 +1,136 @@
+{{
+    config(
+        unique_key='department'
+    )
+}}
+
+{% if is_incremental() %}
+
+with changed_students as (
+    select
+        department,
+        gpa,
+        enrollment_status,
+        previous_department,
+        previous_gpa,
+        previous_enrollment_status,
+        is_deleted
+    from {{ ref('stg_student_records') }}
+    where dbt_updated_at > (select max(dbt_updated_at) from {{ this }})
+),
+
+-- Each change adds the new values and retracts the ones it replaced;
+-- erased and archived students (tombstones) are only retracted
+signed_changes as (
+    select department, gpa, enrollment_status, 1 as sign
+    from changed_students
+    where not is_deleted
+    union all
+    select previous_department, previous_gpa, previous_enrollment_status, -1 as sign
+    from changed_students
+    where previous_department is not null
+),
+
+delta as (
+    select
+        department,
+        sum(sign) as total_students,
+        sum(case when gpa is not null then sign * gpa else 0 end) as gpa_sum,
+        sum(case when gpa is not null then sign else 0 end) as gpa_count,
+        sum(case when enrollment_status = 'ACTIVE' then sign else 0 end) as active_students,
+        sum(case when enrollment_status = 'GRADUATED' then sign else 0 end) as graduated_students,
+        min(case when sign = 1 then gpa end) as added_min_gpa,
+        max(case when sign = 1 then gpa end) as added_max_gpa,
+        min(case when sign = -1 then gpa end) as removed_min_gpa,
+        max(case when sign = -1 then gpa end) as removed_max_gpa
+    from signed_changes
+    group by department
+),
+
+-- Min and max cannot be retracted: departments that lost their extreme value rescan
+rescanned as (
+    select
+        department,
+        min(gpa) as min_gpa,
+        max(gpa) as max_gpa
+    from {{ ref('stg_student_records') }}
+    where not is_deleted
+        and department in (
+            select d.department
+            from delta d
+            join {{ this }} t
+                on d.department = t.department
+            where d.removed_min_gpa <= t.min_gpa
+                or d.removed_max_gpa >= t.max_gpa
+        )
+    group by department
+),
+
+merged as (
+    select
+        d.department,
+        coalesce(t.total_students, 0) + d.total_students as total_students,
+        coalesce(t.gpa_sum, 0) + d.gpa_sum as gpa_sum,
+        coalesce(t.gpa_count, 0) + d.gpa_count as gpa_count,
+        case
+            when r.department is not null then r.min_gpa
+            else coalesce(least(t.min_gpa, d.added_min_gpa), t.min_gpa, d.added_min_gpa)
+        end as min_gpa,
+        case
+            when r.department is not null then r.max_gpa
+            else coalesce(greatest(t.max_gpa, d.added_max_gpa), t.max_gpa, d.added_max_gpa)
+        end as max_gpa,
+        coalesce(t.active_students, 0) + d.active_students as active_students,
+        coalesce(t.graduated_students, 0) + d.graduated_students as graduated_students
+    from delta d
+    left join {{ this }} t
+        on d.department = t.department
+    left join rescanned r
+        on d.department = r.department
+),
+
+{% else %}
+
 with student_records as (
-    select * from {{ ref('stg_student_records') }}
+    select
+        student_id,
+        department,
+        gpa,
+        enrollment_status
+    from {{ ref('stg_student_records') }}
+    where not is_deleted
 ),
 
-department_metrics as (
+merged as (
     select
         department,
         count(distinct student_id) as total_students,
-        avg(gpa) as avg_gpa,
+        coalesce(sum(gpa), 0) as gpa_sum,
+        count(gpa) as gpa_count,
         min(gpa) as min_gpa,
         max(gpa) as max_gpa,
         count(case when enrollment_status = 'ACTIVE' then 1 end) as active_students,
-        count(case when enrollment_status = 'GRADUATED' then 1 end) as graduated_students,
-        current_timestamp as dbt_updated_at
+        count(case when enrollment_status = 'GRADUATED' then 1 end) as graduated_students
     from student_records
     group by department
+),
+
+{% endif %}
+
+department_metrics as (
+    select
+        department,
+        total_students,
+        gpa_sum,
+        gpa_count,
+        -- Recomputed from the kept sum and count
+        cast(gpa_sum as double) / nullif(gpa_count, 0) as avg_gpa,
+        min_gpa,
+        max_gpa,
+        active_students,
+        graduated_students,
+        current_timestamp as dbt_updated_at
+    from merged
 )
 
-select * from department_metrics 
\ No newline at end of file
+select * from department_metrics
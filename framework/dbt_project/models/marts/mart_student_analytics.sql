@@ -1,9 +1,38 @@
+{# Tombstones of erased and archived students delete their rows in the merge; the post-hook then
+   purges them from staging once int_department_metrics has retracted them #}
+{{
+    config(
+        unique_key='student_id',
+        delete_condition='src.is_deleted',
+        post_hook=[
+            "delete from {{ ref('stg_student_records') }} where is_deleted and dbt_updated_at <= (select max(dbt_updated_at) from {{ ref('int_department_metrics') }})"
+        ]
+    )
+}}
+
 with student_records as (
-    select * from {{ ref('stg_student_records') }}
+    select
+        student_id,
+        first_name,
+        last_name,
+        department,
+        major,
+        gpa,
+        enrollment_status,
+        is_deleted,
+        dbt_updated_at
+    from {{ ref('stg_student_records') }}
 ),
 
 department_metrics as (
-    select * from {{ ref('int_department_metrics') }}
+    select
+        department,
+        avg_gpa,
+        total_students,
+        active_students,
+        graduated_students,
+        dbt_updated_at
+    from {{ ref('int_department_metrics') }}
 ),
 
 student_analytics as (
@@ -23,10 +52,21 @@ student_analytics as (
             when s.gpa >= d.avg_gpa then 'Above Average'
             else 'Below Average'
         end as gpa_performance,
+        -- Tombstones of erased and archived students, deleted by the merge
+        s.is_deleted,
         current_timestamp as dbt_updated_at
     from student_records s
     left join department_metrics d
         on s.department = d.department
+    {% if is_incremental() %}
+    -- Changed students, and students whose department metrics changed
+    where (s.dbt_updated_at > (select max(dbt_updated_at) from {{ this }})
+            or d.dbt_updated_at > (select max(dbt_updated_at) from {{ this }}))
+        -- Tombstones only matter for students the mart holds
+        and (not s.is_deleted or s.student_id in (select student_id from {{ this }}))
+    {% else %}
+    where not s.is_deleted
+    {% endif %}
 )
 
-select * from student_analytics 
\ No newline at end of file
+select * from student_analytics
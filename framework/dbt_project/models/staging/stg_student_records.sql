@@ -1,24 +1,131 @@
-with source as (
-    select * from {{ source('higher_ed_data', 'student_records') }}
+{{
+    config(
+        unique_key='student_id'
+    )
+}}
+
+-- Latest erasure or archival of each subject, by salted subject_hash
+with deletions as (
+    select
+        subject_hash,
+        max(deleted_at) as deleted_at
+    from {{ source('higher_ed_data', 'subject_deletions') }}
+    group by subject_hash
 ),
 
-renamed as (
+changed_records as (
+    select
+        s.student_id,
+        s.first_name,
+        s.last_name,
+        s.email,
+        s.gpa,
+        s.enrollment_status,
+        s.department,
+        s.major,
+        s.enrollment_date,
+        s.graduation_date,
+        s.updated_at,
+        -- A student written several times since the last run keeps only the latest record
+        row_number() over (partition by s.student_id order by s.updated_at desc) as record_rank
+    from {{ source('higher_ed_data', 'student_records') }} s
+    left join deletions d
+        on {{ subject_hash('s.student_id') }} = d.subject_hash
+    -- Rows written after a deletion (e.g. a re-enrolled student) are kept
+    where (d.subject_hash is null or s.updated_at > d.deleted_at)
+    {% if is_incremental() %}
+    -- Only records the Glue job wrote since the last run
+        and s.updated_at > (select max(updated_at) from {{ this }})
+    {% endif %}
+),
+
+source as (
     select
         student_id,
         first_name,
         last_name,
         email,
-        date_of_birth,
-        ssn,
         gpa,
         enrollment_status,
         department,
         major,
         enrollment_date,
         graduation_date,
-        -- Add any additional transformations here
+        updated_at
+    from changed_records
+    where record_rank = 1
+),
+
+renamed as (
+    select
+        source.student_id,
+        source.first_name,
+        source.last_name,
+        source.email,
+        source.gpa,
+        source.enrollment_status,
+        source.department,
+        source.major,
+        source.enrollment_date,
+        source.graduation_date,
+        source.updated_at,
+        -- Values being replaced, so downstream aggregates can retract them
+        {% if is_incremental() %}
+        existing.department as previous_department,
+        existing.gpa as previous_gpa,
+        existing.enrollment_status as previous_enrollment_status,
+        {% else %}
+        cast(null as varchar) as previous_department,
+        cast(null as double) as previous_gpa,
+        cast(null as varchar) as previous_enrollment_status,
+        {% endif %}
+        false as is_deleted,
         current_timestamp as dbt_updated_at
     from source
+    {% if is_incremental() %}
+    left join {{ this }} existing
+        on source.student_id = existing.student_id
+    {% endif %}
 )
 
-select * from renamed 
\ No newline at end of file
+{% if is_incremental() %}
+,
+
+-- Erased or archived students become tombstones: personal columns are cleared and the
+-- previous_* values let int_department_metrics retract them. The mart deletes their rows
+-- and then purges the tombstones from this table.
+tombstones as (
+    select
+        existing.student_id,
+        cast(null as varchar) as first_name,
+        cast(null as varchar) as last_name,
+        cast(null as varchar) as email,
+        cast(null as double) as gpa,
+        cast(null as varchar) as enrollment_status,
+        cast(null as varchar) as department,
+        cast(null as varchar) as major,
+        cast(null as varchar) as enrollment_date,
+        cast(null as varchar) as graduation_date,
+        existing.updated_at,
+        existing.department as previous_department,
+        existing.gpa as previous_gpa,
+        existing.enrollment_status as previous_enrollment_status,
+        true as is_deleted,
+        current_timestamp as dbt_updated_at
+    from {{ this }} existing
+    join deletions d
+        on {{ subject_hash('existing.student_id') }} = d.subject_hash
+    where not existing.is_deleted
+        and d.deleted_at >= existing.updated_at
+        and existing.student_id not in (select student_id from source)
+)
+
+select * from renamed
+union all
+select * from tombstones
+
+{% else %}
+
+select * from renamed
+
+{% endif %}
@@ -0,0 +1,109 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import boto3
+
+def _split_s3_path(path: str) -> Tuple[str, str]:
+    bucket, _, key = path[len('s3://'):].partition('/')
+    return bucket, key
+
+class IncrementalManifest:
+    """
+    Watermark of processed input files, for runs without Glue job bookmarks.
+
+    The manifest (JSON, on S3 or local disk) records a watermark that trails
+    the newest modification time processed by settle_minutes, and every
+    processed file modified since the watermark. A file that becomes visible
+    late with an older modification time (e.g. a slow multipart upload, whose
+    LastModified is its start) is still picked up if it lands within the
+    window, and a file processed inside it is not processed twice. new_files()
+    stages the next watermark; commit() persists it once the run's output is written.
+    """
+
+    def __init__(self, manifest_path: str, s3_client=None, settle_minutes: int = 60):
+        self.manifest_path = manifest_path
+        self.settle_minutes = settle_minutes
+        self.s3_client = s3_client or (boto3.client('s3') if manifest_path.startswith('s3://') else None)
+        self.state = self._load()
+        self._pending: Optional[Dict] = None
+
+    def _load(self) -> Dict:
+        empty = {'watermark': None, 'boundary_files': []}
+        if self.manifest_path.startswith('s3://'):
+            bucket, key = _split_s3_path(self.manifest_path)
+            try:
+                return json.loads(self.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())
+            except self.s3_client.exceptions.NoSuchKey:
+                return empty
+        if not os.path.exists(self.manifest_path):
+            return empty
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def _list_files(self, input_path: str) -> List[Tuple[str, float]]:
+        """(path, modification time as epoch seconds) of every data file under input_path"""
+        files = []
+        if input_path.startswith('s3://'):
+            bucket, prefix = _split_s3_path(input_path)
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    name = os.path.basename(obj['Key'])
+                    if obj['Key'].endswith('/') or name.startswith(('_', '.')):
+                        continue
+                    files.append((f"s3://{bucket}/{obj['Key']}", obj['LastModified'].timestamp()))
+        else:
+            for directory, subdirectories, names in os.walk(input_path):
+                subdirectories[:] = [d for d in subdirectories if not d.startswith(('_', '.'))]
+                for name in names:
+                    if not name.startswith(('_', '.')):
+                        path = os.path.join(directory, name)
+                        files.append((path, os.path.getmtime(path)))
+        return files
+
+    def new_files(self, input_path: str) -> List[str]:
+        """Files under input_path not processed by a committed run, oldest first"""
+        if self.s3_client is None and input_path.startswith('s3://'):
+            self.s3_client = boto3.client('s3')
+        watermark = self.state.get('watermark')
+        # Manifests written before the settle window list bare paths at the watermark
+        boundary = {
+            (entry, watermark) if isinstance(entry, str) else tuple(entry)
+            for entry in self.state.get('boundary_files', [])
+        }
+        new = sorted(
+            ((path, modified) for path, modified in self._list_files(input_path)
+             if (watermark is None or modified >= watermark) and (path, modified) not in boundary),
+            key=lambda item: (item[1], item[0])
+        )
+
+        if new:
+            processed = boundary | set(new)
+            settled = max(modified for _, modified in processed) - self.settle_minutes * 60
+            next_watermark = settled if watermark is None else max(watermark, settled)
+            self._pending = {
+                'watermark': next_watermark,
+                'boundary_files': sorted([path, modified] for path, modified in processed if modified >= next_watermark)
+            }
+        return [path for path, _ in new]
+
+    def commit(self):
+        """Persist the watermark staged by new_files()"""
+        if self._pending is None:
+            return
+        state = dict(self._pending, updated_at=datetime.now(timezone.utc).isoformat())
+        body = json.dumps(state, indent=2)
+        if self.manifest_path.startswith('s3://'):
+            bucket, key = _split_s3_path(self.manifest_path)
+            self.s3_client.put_object(Bucket=bucket, Key=key, Body=body.encode('utf-8'))
+        else:
+            directory = os.path.dirname(self.manifest_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(body)
+            os.replace(tmp_path, self.manifest_path)
+        self.state = state
+        self._pending = None
@@ -0,0 +1,142 @@
+import argparse
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+from lineage_tracking_stub import LineageTracker, MANIFEST_KEY, SEGMENT_PREFIX
+
+class LineageCompactor:
+    """Merge small lineage event files into date-partitioned NDJSON segments.
+
+    Segments are sorted by timestamp and deduplicated, and the manifest
+    records each segment's date and node ids together with a watermark: the
+    last raw key that has been compacted. Every chunk of files commits the
+    manifest, so an interrupted run resumes from the watermark.
+    """
+
+    def __init__(self,
+                 tracker: LineageTracker,
+                 settle_minutes: int = 60,
+                 max_files_per_chunk: int = 10000,
+                 delete_source: bool = False):
+        """
+        Args:
+            tracker: Tracker whose lineage bucket is compacted
+            settle_minutes: Skip files younger than this so late writers are not passed by the watermark
+            max_files_per_chunk: Raw files merged before the manifest is committed
+            delete_source: Delete raw files once their chunk is committed
+        """
+        self.tracker = tracker
+        self.s3_client = tracker.s3_client
+        self.bucket = tracker.lineage_bucket
+        self.settle_minutes = settle_minutes
+        self.max_files_per_chunk = max_files_per_chunk
+        self.delete_source = delete_source
+
+    @staticmethod
+    def _event_digest(event: Dict) -> str:
+        return hashlib.sha1(json.dumps(event, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _event_nodes(event: Dict) -> set:
+        nodes = {node['id'] for node in event['nodes']}
+        for edge in event['edges']:
+            nodes.update((edge['source_id'], edge['target_id']))
+        return nodes
+
+    def _pending_keys(self, watermark: str) -> List[str]:
+        """Raw keys after the watermark that are old enough to compact"""
+        cutoff = datetime.utcnow() - timedelta(minutes=self.settle_minutes)
+        cutoff_key = f"lineage/{cutoff.strftime('%Y%m%d_%H%M%S')}"
+        return sorted(
+            key for key in self.tracker._list_lineage_keys(start_after=watermark)
+            if key < cutoff_key
+        )
+
+    def _write_segment(self, date: str, events: List[Dict]) -> Dict:
+        key = f"{SEGMENT_PREFIX}date={date}/part-{uuid.uuid4().hex[:12]}.ndjson"
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body='\n'.join(json.dumps(event, separators=(',', ':')) for event in events)
+        )
+        nodes = set()
+        for event in events:
+            nodes.update(self._event_nodes(event))
+        return {'key': key, 'date': date, 'events': len(events), 'nodes': sorted(nodes)}
+
+    def _delete_keys(self, keys: List[str]):
+        for start in range(0, len(keys), 1000):
+            self.s3_client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in keys[start:start + 1000]], 'Quiet': True}
+            )
+
+    def _compact_chunk(self, manifest: Dict, keys: List[str]) -> Dict:
+        """Merge one chunk of raw files into the manifest's segments and commit it"""
+        new_events: Dict[str, List[Dict]] = {}
+        for key in keys:
+            for event in self.tracker._load_lineage_file(key):
+                new_events.setdefault(event['timestamp'][:10], []).append(event)
+
+        replaced = []
+        segments = [segment for segment in manifest['segments'] if segment['date'] not in new_events]
+        for date, events in sorted(new_events.items()):
+            for segment in manifest['segments']:
+                if segment['date'] == date:
+                    events = self.tracker._load_lineage_file(segment['key']) + events
+                    replaced.append(segment['key'])
+
+            unique = {}
+            for event in events:
+                unique.setdefault(self._event_digest(event), event)
+            merged = sorted(unique.items(), key=lambda item: (item[1]['timestamp'], item[0]))
+            segments.append(self._write_segment(date, [event for _, event in merged]))
+
+        manifest = {
+            'watermark': keys[-1],
+            'updated_at': datetime.utcnow().isoformat(),
+            'segments': sorted(segments, key=lambda segment: segment['date'])
+        }
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=MANIFEST_KEY,
+            Body=json.dumps(manifest, separators=(',', ':'))
+        )
+
+        # Only remove objects once the manifest no longer references them
+        self._delete_keys(replaced + (keys if self.delete_source else []))
+        return manifest
+
+    def compact(self) -> Dict:
+        """Compact every settled file newer than the manifest watermark"""
+        try:
+            manifest = self.tracker._load_manifest()
+            keys = self._pending_keys(manifest['watermark'])
+            for start in range(0, len(keys), self.max_files_per_chunk):
+                manifest = self._compact_chunk(manifest, keys[start:start + self.max_files_per_chunk])
+            print(f"Compacted {len(keys)} lineage files into {len(manifest['segments'])} segments")
+            return manifest
+
+        except Exception as e:
+            print(f"Error compacting lineage data: {str(e)}")
+            raise
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact lineage event files into segments')
+    parser.add_argument('--settle-minutes', type=int, default=60, help='Minimum age of files to compact')
+    parser.add_argument('--max-files-per-chunk', type=int, default=10000, help='Files merged per manifest commit')
+    parser.add_argument('--delete-source', action='store_true', help='Delete raw files after compaction')
+    args = parser.parse_args()
+
+    compactor = LineageCompactor(
+        LineageTracker(),
+        settle_minutes=args.settle_minutes,
+        max_files_per_chunk=args.max_files_per_chunk,
+        delete_source=args.delete_source
+    )
+    compactor.compact()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+def _field(item, name: str):
+    """Read a field from a lineage dataclass or its dict form"""
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+class LineageGraph:
+    """Immutable lineage graph with integer-indexed CSR adjacency arrays"""
+
+    def __init__(self, nodes: Iterable = (), edges: Iterable = ()):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.nodes: Dict[str, object] = {}
+
+        for node in nodes:
+            node_id = _field(node, 'id')
+            self._intern(node_id)
+            self.nodes[node_id] = node
+
+        pairs = set()
+        for edge in edges:
+            pairs.add((self._intern(_field(edge, 'source_id')), self._intern(_field(edge, 'target_id'))))
+
+        self._down_offsets, self._down_targets = self._build_csr(pairs)
+        self._up_offsets, self._up_targets = self._build_csr((dst, src) for src, dst in pairs)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict]) -> 'LineageGraph':
+        """Build a graph from saved lineage events ({'nodes', 'edges', 'timestamp'})"""
+        nodes, edges = [], []
+        for event in events:
+            nodes.extend(event['nodes'])
+            edges.extend(event['edges'])
+        return cls(nodes, edges)
+
+    def _intern(self, node_id: str) -> int:
+        idx = self.index.get(node_id)
+        if idx is None:
+            idx = self.index[node_id] = len(self.ids)
+            self.ids.append(node_id)
+        return idx
+
+    def _build_csr(self, pairs: Iterable[Tuple[int, int]]) -> Tuple[array, array]:
+        """Pack (source, target) pairs into offset and target arrays"""
+        ordered = sorted(pairs)
+        offsets = array('l', [0] * (len(self.ids) + 1))
+        for src, _ in ordered:
+            offsets[src + 1] += 1
+        for i in range(len(self.ids)):
+            offsets[i + 1] += offsets[i]
+        return offsets, array('l', (dst for _, dst in ordered))
+
+    def _bfs(self, node_id: str, depth: Optional[int], offsets: array, targets: array) -> List[str]:
+        start = self.index.get(node_id)
+        if start is None:
+            return []
+
+        seen = {start}
+        frontier = [start]
+        result = []
+        level = 0
+        while frontier and (depth is None or level < depth):
+            level += 1
+            next_frontier = []
+            for idx in frontier:
+                for pos in range(offsets[idx], offsets[idx + 1]):
+                    neighbour = targets[pos]
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        next_frontier.append(neighbour)
+                        result.append(self.ids[neighbour])
+            frontier = next_frontier
+        return result
+
+    def upstream(self, node_id: str, depth: Optional[int] = None) -> List[str]:
+        """Return ids the node depends on, nearest first, up to depth hops"""
+        return self._bfs(node_id, depth, self._up_offsets, self._up_targets)
+
+    def downstream(self, node_id: str, depth: Optional[int] = None) -> List[str]:
+        """Return ids that depend on the node, nearest first, up to depth hops"""
+        return self._bfs(node_id, depth, self._down_offsets, self._down_targets)
+
+    def shortest_path(self, source_id: str, target_id: str) -> List[str]:
+        """Return the shortest directed path from source_id to target_id, or [] if none"""
+        start, goal = self.index.get(source_id), self.index.get(target_id)
+        if start is None or goal is None:
+            return []
+
+        parents = {start: -1}
+        queue = deque([start])
+        while queue:
+            idx = queue.popleft()
+            if idx == goal:
+                path = []
+                while idx != -1:
+                    path.append(self.ids[idx])
+                    idx = parents[idx]
+                return path[::-1]
+            for pos in range(self._down_offsets[idx], self._down_offsets[idx + 1]):
+                neighbour = self._down_targets[pos]
+                if neighbour not in parents:
+                    parents[neighbour] = idx
+                    queue.append(neighbour)
+        return []
+
+class LineageGraphCache:
+    """Keeps a built LineageGraph in memory until its TTL expires or the version changes"""
+
+    def __init__(self, loader: Callable[[], Iterable[Dict]], ttl_seconds: float = 300):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._graph: Optional[LineageGraph] = None
+        self._version = None
+        self._built_at = 0.0
+
+    def get(self, version=None) -> LineageGraph:
+        """Return the cached graph, rebuilding it from the loader when stale"""
+        with self._lock:
+            expired = time.monotonic() - self._built_at > self.ttl_seconds
+            if self._graph is None or expired or version != self._version:
+                self._graph = LineageGraph.from_events(self.loader())
+                self._version = version
+                self._built_at = time.monotonic()
+            return self._graph
+
+    def invalidate(self):
+        with self._lock:
+            self._graph = None
@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Tuple
+
+class LineageIndex(ABC):
+    """Adjacency index mapping node ids to the lineage events and edges that touch them"""
+
+    def add_event(self, event_key: str, lineage_data: Dict):
+        """Index a single lineage event stored under event_key"""
+        self.add_events([(event_key, lineage_data)])
+
+    @abstractmethod
+    def add_events(self, events: Iterable[Tuple[str, Dict]]):
+        """Index (event_key, lineage_data) pairs"""
+
+    @abstractmethod
+    def get_adjacency(self, node_id: str) -> Dict:
+        """Return {'events': [...], 'edges': [...]} for a node"""
+
+    def event_keys(self, node_id: str) -> List[str]:
+        """Return the keys of all lineage events that touch a node"""
+        return self.get_adjacency(node_id)['events']
+
+    @staticmethod
+    def _adjacency_updates(events: Iterable[Tuple[str, Dict]]) -> Dict[str, Dict]:
+        """Group events into per-node adjacency entries"""
+        updates: Dict[str, Dict] = {}
+        for event_key, lineage_data in events:
+            touched = {node['id'] for node in lineage_data['nodes']}
+            for edge in lineage_data['edges']:
+                touched.update((edge['source_id'], edge['target_id']))
+
+            for node_id in touched:
+                events = updates.setdefault(node_id, {'events': [], 'edges': []})['events']
+                if not events or events[-1] != event_key:
+                    events.append(event_key)
+
+            for edge in lineage_data['edges']:
+                entry = {
+                    'source_id': edge['source_id'],
+                    'target_id': edge['target_id'],
+                    'edge_type': edge['edge_type'],
+                    'event': event_key
+                }
+                updates[edge['source_id']]['edges'].append(entry)
+                if edge['target_id'] != edge['source_id']:
+                    updates[edge['target_id']]['edges'].append(entry)
+        return updates
+
+class S3LineageIndex(LineageIndex):
+    """Lineage index stored as hash-sharded JSON objects in S3.
+
+    Each shard holds the adjacency lists of every node id that hashes to it,
+    so a lookup reads exactly one object. Writes read-modify-write only the
+    shards touched by the event, which assumes a single writer per shard.
+    """
+
+    def __init__(self, s3_client, bucket: str, prefix: str = 'lineage_index/', num_shards: int = 256):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.num_shards = num_shards
+
+    def _shard_key(self, node_id: str) -> str:
+        shard = zlib.crc32(node_id.encode('utf-8')) % self.num_shards
+        return f"{self.prefix}shards/{shard:04d}.json"
+
+    def _load_shard(self, shard_key: str) -> Dict:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=shard_key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return {}
+        return json.loads(response['Body'].read())
+
+    def add_events(self, events: Iterable[Tuple[str, Dict]]):
+        """Merge events into the index, writing each touched shard once"""
+        try:
+            by_shard: Dict[str, Dict[str, Dict]] = {}
+            for node_id, update in self._adjacency_updates(events).items():
+                by_shard.setdefault(self._shard_key(node_id), {})[node_id] = update
+
+            for shard_key, updates in by_shard.items():
+                shard = self._load_shard(shard_key)
+                for node_id, update in updates.items():
+                    entry = shard.setdefault(node_id, {'events': [], 'edges': []})
+                    indexed = set(entry['events'])
+                    entry['events'].extend(k for k in update['events'] if k not in indexed)
+                    entry['edges'].extend(e for e in update['edges'] if e['event'] not in indexed)
+
+                self.s3_client.put_object(
+                    Bucket=self.bucket,
+                    Key=shard_key,
+                    Body=json.dumps(shard, separators=(',', ':'))
+                )
+
+        except Exception as e:
+            print(f"Error updating lineage index: {str(e)}")
+            raise
+
+    def get_adjacency(self, node_id: str) -> Dict:
+        shard = self._load_shard(self._shard_key(node_id))
+        return shard.get(node_id, {'events': [], 'edges': []})
+
+class SQLiteLineageIndex(LineageIndex):
+    """Lineage index backed by a local SQLite database"""
+
+    def __init__(self, db_path: str = os.path.join('.lineage', 'lineage_index.db')):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS lineage_events (
+                node_id TEXT NOT NULL,
+                event_key TEXT NOT NULL,
+                PRIMARY KEY (node_id, event_key)
+            );
+            CREATE TABLE IF NOT EXISTS lineage_edges (
+                node_id TEXT NOT NULL,
+                source_id TEXT NOT NULL,
+                target_id TEXT NOT NULL,
+                edge_type TEXT NOT NULL,
+                event_key TEXT NOT NULL,
+                UNIQUE (node_id, source_id, target_id, edge_type, event_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_lineage_edges_node ON lineage_edges (node_id);
+        """)
+
+    def add_events(self, events: Iterable[Tuple[str, Dict]]):
+        """Merge events into the index in a single transaction"""
+        updates = self._adjacency_updates(events)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO lineage_events (node_id, event_key) VALUES (?, ?)",
+                [(node_id, key) for node_id, update in updates.items() for key in update['events']]
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO lineage_edges (node_id, source_id, target_id, edge_type, event_key) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (node_id, edge['source_id'], edge['target_id'], edge['edge_type'], edge['event'])
+                    for node_id, update in updates.items() for edge in update['edges']
+                ]
+            )
+
+    def get_adjacency(self, node_id: str) -> Dict:
+        events = [
+            row[0] for row in self.conn.execute(
+                "SELECT event_key FROM lineage_events WHERE node_id = ? ORDER BY event_key", (node_id,)
+            )
+        ]
+        edges = [
+            {'source_id': row[0], 'target_id': row[1], 'edge_type': row[2], 'event': row[3]}
+            for row in self.conn.execute(
+                "SELECT source_id, target_id, edge_type, event_key FROM lineage_edges WHERE node_id = ?",
+                (node_id,)
+            )
+        ]
+        return {'events': events, 'edges': edges}
@@ -1,14 +1,21 @@
 import boto3
 import json
+import threading
+import uuid
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, is_dataclass
 from enum import Enum
+from lineage_graph import LineageGraph, LineageGraphCache
+from lineage_index import LineageIndex
 
 class LineageType(Enum):
     TABLE = "TABLE"
     JOB = "JOB"
     DATASET = "DATASET"
+    COLUMN = "COLUMN"
 
 @dataclass
 class LineageNode:
@@ -25,11 +32,65 @@ class LineageEdge:
     edge_type: str
     properties: Optional[Dict] = None
 
+SEGMENT_PREFIX = 'lineage_segments/'
+MANIFEST_KEY = f"{SEGMENT_PREFIX}manifest.json"
+
+def _as_dict(item) -> Dict:
+    """Convert a lineage node or edge into a JSON-serialisable dict"""
+    if not is_dataclass(item):
+        return item
+    data = asdict(item)
+    if isinstance(data.get('type'), Enum):
+        data['type'] = data['type'].value
+    return data
+
 class LineageTracker:
-    def __init__(self):
+    def __init__(self,
+                 index: Optional[LineageIndex] = None,
+                 graph_ttl_seconds: float = 300,
+                 buffered: bool = False,
+                 batch_size: int = 500,
+                 flush_interval_seconds: float = 5.0,
+                 fetch_workers: int = 16):
+        """
+        Args:
+            index: Optional lineage index updated on every write
+            graph_ttl_seconds: Lifetime of the cached lineage graph
+            buffered: Queue events in memory and write them in NDJSON batches
+            batch_size: Number of queued events that triggers a flush
+            flush_interval_seconds: Maximum time an event waits in the queue
+            fetch_workers: Concurrent S3 reads when retrieving lineage (1 reads sequentially)
+        """
         self.glue_client = boto3.client('glue')
-        self.s3_client = boto3.client('s3')
+        self.s3_client = boto3.client(
+            's3',
+            config=Config(max_pool_connections=max(fetch_workers, 10))
+        )
+        self.fetch_workers = fetch_workers
         self.lineage_bucket = 'data-lineage-bucket'
+        self.index = index
+        self.version = 0
+        self.graph_cache = LineageGraphCache(self._iter_lineage_events, graph_ttl_seconds)
+        
+        self.buffered = buffered
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._buffer: List[Dict] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._flusher = None
+        self._last_error: Optional[Exception] = None
+        if buffered:
+            self._flusher = threading.Thread(target=self._flush_loop, name='lineage-flusher', daemon=True)
+            self._flusher.start()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
         
     def track_table_lineage(self, 
                           source_table: str,
@@ -83,6 +144,79 @@ class LineageTracker:
             print(f"Error tracking table lineage: {str(e)}")
             raise
     
+    def track_column_lineage(self,
+                           source_table: str,
+                           target_table: str,
+                           job_name: str,
+                           column_mapping: Dict[str, List[str]],
+                           transformation_details: Dict):
+        """Track column-level lineage: source columns READ by a job, target columns it WRITEs
+        
+        Each target column also gets a DERIVES edge from every source column
+        it is derived from, so column lineage is traversable without the job node.
+        
+        Args:
+            column_mapping: Target column to the source columns it is derived from
+            transformation_details: Job properties, e.g. input files, partitions and row counts
+        """
+        try:
+            source_node = LineageNode(id=f"table_{source_table}", type=LineageType.TABLE, name=source_table)
+            target_node = LineageNode(id=f"table_{target_table}", type=LineageType.TABLE, name=target_table)
+            job_node = LineageNode(
+                id=f"job_{job_name}",
+                type=LineageType.JOB,
+                name=job_name,
+                properties=transformation_details
+            )
+            nodes = [source_node, target_node, job_node]
+            edges = [
+                LineageEdge(source_id=source_node.id, target_id=job_node.id, edge_type="READ"),
+                LineageEdge(source_id=job_node.id, target_id=target_node.id, edge_type="WRITE")
+            ]
+            
+            read_columns = sorted({column for sources in column_mapping.values() for column in sources})
+            for column in read_columns:
+                column_node = LineageNode(
+                    id=f"column_{source_table}.{column}",
+                    type=LineageType.COLUMN,
+                    name=f"{source_table}.{column}"
+                )
+                nodes.append(column_node)
+                edges.append(LineageEdge(source_id=column_node.id, target_id=job_node.id, edge_type="READ"))
+            
+            for column, sources in column_mapping.items():
+                column_node = LineageNode(
+                    id=f"column_{target_table}.{column}",
+                    type=LineageType.COLUMN,
+                    name=f"{target_table}.{column}"
+                )
+                nodes.append(column_node)
+                edges.append(LineageEdge(
+                    source_id=job_node.id,
+                    target_id=column_node.id,
+                    edge_type="WRITE",
+                    properties={'source_columns': sources}
+                ))
+                edges.extend(
+                    LineageEdge(
+                        source_id=f"column_{source_table}.{source}",
+                        target_id=column_node.id,
+                        edge_type="DERIVES",
+                        properties={'job': job_node.id}
+                    )
+                    for source in sources
+                )
+            
+            self._save_lineage({
+                'nodes': nodes,
+                'edges': edges,
+                'timestamp': datetime.utcnow().isoformat()
+            })
+            
+        except Exception as e:
+            print(f"Error tracking column lineage: {str(e)}")
+            raise
+    
     def track_dataset_lineage(self,
                             source_dataset: str,
                             target_dataset: str,
@@ -120,58 +254,214 @@ class LineageTracker:
             raise
     
     def _save_lineage(self, lineage_data: Dict):
-        """Save lineage information to S3"""
+        """Save lineage information to S3, or queue it when buffered"""
         try:
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-            key = f"lineage/{timestamp}.json"
+            record = {
+                'nodes': [_as_dict(node) for node in lineage_data['nodes']],
+                'edges': [_as_dict(edge) for edge in lineage_data['edges']],
+                'timestamp': lineage_data['timestamp']
+            }
             
-            self.s3_client.put_object(
-                Bucket=self.lineage_bucket,
-                Key=key,
-                Body=json.dumps(lineage_data, indent=2)
-            )
+            if self.buffered:
+                with self._buffer_lock:
+                    self._buffer.append(record)
+                    full = len(self._buffer) >= self.batch_size
+                if full:
+                    self._wake.set()
+                return
+            
+            self._write_events([record])
             
         except Exception as e:
             print(f"Error saving lineage data: {str(e)}")
             raise
     
-    def get_lineage(self, entity_id: str) -> Dict:
-        """Retrieve lineage information for an entity"""
+    def _write_events(self, records: List[Dict]):
+        """Write events as one object and update the index.
+        
+        Keys carry a random suffix so writes in the same second never collide;
+        batches are stored as compact NDJSON, single events as compact JSON.
+        """
+        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        suffix = uuid.uuid4().hex[:12]
+        if len(records) == 1:
+            key = f"lineage/{timestamp}_{suffix}.json"
+            body = json.dumps(records[0], separators=(',', ':'))
+        else:
+            key = f"lineage/{timestamp}_{suffix}.ndjson"
+            body = '\n'.join(json.dumps(record, separators=(',', ':')) for record in records)
+        
+        self.s3_client.put_object(
+            Bucket=self.lineage_bucket,
+            Key=key,
+            Body=body
+        )
+        
+        if self.index is not None:
+            self.index.add_events((key, record) for record in records)
+        self.version += 1
+    
+    def flush(self):
+        """Write all queued events to S3 in batches of batch_size"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                pending, self._buffer = self._buffer, []
+            
+            try:
+                while pending:
+                    self._write_events(pending[:self.batch_size])
+                    pending = pending[self.batch_size:]
+                self._last_error = None
+            except Exception as e:
+                # Put unwritten events back so a later flush can retry them
+                with self._buffer_lock:
+                    self._buffer[:0] = pending
+                self._last_error = e
+                print(f"Error flushing lineage data: {str(e)}")
+                raise
+    
+    def _flush_loop(self):
+        """Background thread flushing on size trigger or interval"""
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # The failed batch stays queued and is retried on the next flush
+                print(f"Background lineage flush failed, retrying on the next flush: {str(e)}")
+    
+    def close(self):
+        """Stop the background flusher and write any queued events.
+        
+        Raises the last flush error if queued events could not be written.
+        """
+        self._closed.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        try:
+            self.flush()
+        except Exception:
+            # Recorded in _last_error
+            pass
+        if self._last_error is not None:
+            raise self._last_error
+    
+    def _list_lineage_keys(self, start_after: str = '') -> List[str]:
+        """List the keys of lineage event files, optionally after a watermark key"""
+        keys = []
+        params = {'Bucket': self.lineage_bucket, 'Prefix': 'lineage/', 'StartAfter': start_after}
+        while True:
+            response = self.s3_client.list_objects_v2(**params)
+            keys.extend(obj['Key'] for obj in response.get('Contents', []))
+            if not response.get('IsTruncated'):
+                return keys
+            params['ContinuationToken'] = response['NextContinuationToken']
+    
+    def _load_manifest(self) -> Dict:
+        """Load the compaction manifest, or an empty one if nothing is compacted yet"""
         try:
-            # List all lineage files
-            response = self.s3_client.list_objects_v2(
+            response = self.s3_client.get_object(
                 Bucket=self.lineage_bucket,
-                Prefix='lineage/'
+                Key=MANIFEST_KEY
             )
+        except self.s3_client.exceptions.NoSuchKey:
+            return {'watermark': '', 'segments': []}
+        return json.loads(response['Body'].read())
+    
+    def _load_lineage_file(self, key: str) -> List[Dict]:
+        """Load the events stored in a single JSON or NDJSON lineage file"""
+        file_content = self.s3_client.get_object(
+            Bucket=self.lineage_bucket,
+            Key=key
+        )
+        body = file_content['Body'].read()
+        if key.endswith('.ndjson'):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        return [json.loads(body)]
+    
+    def _load_relevant(self, key: str, entity_id: str) -> List[Dict]:
+        """Stream a lineage file and return only the filtered events touching entity_id.
+        
+        Lines that do not contain the JSON-quoted id are dropped before parsing.
+        """
+        needle = json.dumps(entity_id).encode('utf-8')
+        body = self.s3_client.get_object(
+            Bucket=self.lineage_bucket,
+            Key=key
+        )['Body']
+        lines = body.iter_lines() if key.endswith('.ndjson') else [body.read()]
+        
+        relevant = []
+        for line in lines:
+            if needle not in line:
+                continue
+            filtered = self._filter_lineage(json.loads(line), entity_id)
+            if filtered:
+                relevant.append(filtered)
+        return relevant
+    
+    def _map_keys(self, func, keys: List[str]) -> List:
+        """Apply func to every key on a bounded thread pool, preserving key order"""
+        if self.fetch_workers <= 1 or len(keys) <= 1:
+            return [func(key) for key in keys]
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as executor:
+            return list(executor.map(func, keys))
+    
+    def _iter_lineage_events(self):
+        """Yield every saved lineage event from compacted segments and newer files"""
+        manifest = self._load_manifest()
+        keys = [segment['key'] for segment in manifest['segments']]
+        keys.extend(self._list_lineage_keys(start_after=manifest['watermark']))
+        for events in self._map_keys(self._load_lineage_file, keys):
+            yield from events
+    
+    @staticmethod
+    def _filter_lineage(data: Dict, entity_id: str) -> Optional[Dict]:
+        """Reduce a lineage event to the nodes and edges relevant to entity_id"""
+        relevant_edges = [
+            edge for edge in data['edges']
+            if edge['source_id'] == entity_id or edge['target_id'] == entity_id
+        ]
+        
+        relevant_nodes = [
+            node for node in data['nodes']
+            if node['id'] == entity_id or relevant_edges
+        ]
+        
+        if not (relevant_nodes or relevant_edges):
+            return None
+        
+        return {
+            'nodes': relevant_nodes,
+            'edges': relevant_edges,
+            'timestamp': data['timestamp']
+        }
+    
+    def get_lineage(self, entity_id: str) -> Dict:
+        """Retrieve lineage information for an entity.
+        
+        Compacted segments are chosen from the manifest by the node ids they
+        contain. Files newer than the manifest watermark are taken from the
+        index when one is configured, otherwise they are listed and scanned.
+        """
+        try:
+            manifest = self._load_manifest()
+            watermark = manifest['watermark']
+            keys = [
+                segment['key'] for segment in manifest['segments']
+                if entity_id in segment['nodes']
+            ]
+            if self.index is not None:
+                keys.extend(key for key in self.index.event_keys(entity_id) if key > watermark)
+            else:
+                keys.extend(self._list_lineage_keys(start_after=watermark))
             
             lineage_data = []
-            for obj in response.get('Contents', []):
-                file_content = self.s3_client.get_object(
-                    Bucket=self.lineage_bucket,
-                    Key=obj['Key']
-                )
-                
-                data = json.loads(file_content['Body'].read())
-                
-                # Filter for relevant nodes and edges
-                relevant_nodes = [
-                    node for node in data['nodes']
-                    if node['id'] == entity_id or
-                    any(edge['source_id'] == entity_id or edge['target_id'] == entity_id
-                        for edge in data['edges'])
-                ]
-                
-                relevant_edges = [
-                    edge for edge in data['edges']
-                    if edge['source_id'] == entity_id or edge['target_id'] == entity_id
-                ]
-                
-                if relevant_nodes or relevant_edges:
-                    lineage_data.append({
-                        'nodes': relevant_nodes,
-                        'edges': relevant_edges,
-                        'timestamp': data['timestamp']
-                    })
+            for relevant in self._map_keys(lambda key: self._load_relevant(key, entity_id), keys):
+                lineage_data.extend(relevant)
             
             return {
                 'entity_id': entity_id,
@@ -181,6 +471,33 @@ class LineageTracker:
         except Exception as e:
             print(f"Error retrieving lineage data: {str(e)}")
             raise
+    
+    def get_graph(self) -> LineageGraph:
+        """Return the cached lineage graph for multi-hop traversal"""
+        try:
+            return self.graph_cache.get(self.version)
+        except Exception as e:
+            print(f"Error building lineage graph: {str(e)}")
+            raise
+    
+    def rebuild_index(self, batch_size: int = 1000):
+        """Backfill the index from every existing lineage file"""
+        if self.index is None:
+            raise ValueError("No lineage index configured")
+        
+        try:
+            batch = []
+            for key in self._list_lineage_keys():
+                batch.extend((key, event) for event in self._load_lineage_file(key))
+                if len(batch) >= batch_size:
+                    self.index.add_events(batch)
+                    batch = []
+            if batch:
+                self.index.add_events(batch)
+                
+        except Exception as e:
+            print(f"Error rebuilding lineage index: {str(e)}")
+            raise
 
 def main():
     # Example usage
@@ -213,6 +530,10 @@ def main():
     # Retrieve lineage
     lineage = tracker.get_lineage('table_curated_student_records')
     print(json.dumps(lineage, indent=2))
+    
+    # Impact analysis across multiple hops
+    graph = tracker.get_graph()
+    print(graph.downstream('table_raw_student_records'))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
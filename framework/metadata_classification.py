@@ -1,6 +1,8 @@
 import boto3
 import json
 import re
+import yaml
+from collections import OrderedDict
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from enum import Enum
@@ -18,16 +20,71 @@ class FieldClassification:
     pii_type: Optional[str]
     masking_required: bool
     description: str
+    match_ratios: Optional[Dict[str, float]] = None
+
+class PIIDetector:
+    """Precompiled PII detector over sample values.
+
+    All patterns are combined into one anchored alternation with a named
+    group per PII type, tried in pattern order. Results are memoized per
+    exact value in a bounded LRU, so repeated values (codes, statuses,
+    shared domains) are matched once whatever the patterns contain.
+    """
+
+    def __init__(self, patterns: Dict[str, str], cache_size: int = 65536):
+        alternatives = []
+        for pii_type, pattern in patterns.items():
+            if pattern.startswith('^'):
+                pattern = pattern[1:]
+            if pattern.endswith('$') and not pattern.endswith('\\$'):
+                pattern = pattern[:-1]
+            alternatives.append(f"(?P<{pii_type}>{pattern})")
+        self.pii_types = list(patterns)
+        self.regex = re.compile(f"^(?:{'|'.join(alternatives)})$")
+        self.cache_size = cache_size
+        self._cache: Dict[str, Optional[str]] = OrderedDict()
+
+    def match_value(self, value: str) -> Optional[str]:
+        """Return the first PII type whose pattern matches value"""
+        match = self.regex.match(value)
+        if match is None:
+            return None
+        return next(name for name, group in match.groupdict().items() if group is not None)
+
+    def detect(self, sample_values: List[str]) -> Optional[str]:
+        """Return the PII type of the first matching sample value"""
+        for value in sample_values:
+            value = str(value)
+            if value in self._cache:
+                self._cache.move_to_end(value)
+                pii_type = self._cache[value]
+            else:
+                pii_type = self._cache[value] = self.match_value(value)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            if pii_type:
+                return pii_type
+        return None
+
+# Keys of a Glue Table that are accepted back in TableInput
+_TABLE_INPUT_KEYS = (
+    'Name', 'Description', 'Owner', 'LastAccessTime', 'LastAnalyzedTime', 'Retention',
+    'StorageDescriptor', 'PartitionKeys', 'ViewOriginalText', 'ViewExpandedText',
+    'TableType', 'Parameters', 'TargetTable'
+)
 
 class MetadataClassifier:
     def __init__(self, config_path: str):
         self.config = self._load_config(config_path)
         self.pii_patterns = self._load_pii_patterns()
+        self.detector = PIIDetector(self.pii_patterns)
         self.glue_client = boto3.client('glue')
         
     def _load_config(self, config_path: str) -> Dict:
-        """Load industry-specific configuration"""
+        """Load industry-specific configuration (YAML or JSON)"""
         with open(config_path, 'r') as f:
+            if config_path.endswith(('.yaml', '.yml')):
+                return yaml.safe_load(f)
             return json.load(f)
     
     def _load_pii_patterns(self) -> Dict[str, str]:
@@ -40,39 +97,32 @@ class MetadataClassifier:
             'gpa': r'^[0-4]\.\d{2}$'
         }
     
-    def classify_field(self, field_name: str, sample_values: List[str]) -> FieldClassification:
-        """Classify a field based on its name and sample values"""
-        # Check field name against known patterns
+    def _name_pii_type(self, field_name: str) -> Optional[str]:
+        """Return the PII type named in the field name, if any"""
         field_name_lower = field_name.lower()
-        
+        for pii_type in self.pii_patterns:
+            if pii_type in field_name_lower:
+                return pii_type
+        return None
+    
+    def _build_classification(self, field_name: str, pii_type: Optional[str],
+                              match_ratios: Optional[Dict[str, float]] = None) -> FieldClassification:
+        """Build the classification for a detected PII type and apply industry rules"""
         # Default classification
         classification = FieldClassification(
             field_name=field_name,
             privacy_level=PrivacyLevel.INTERNAL,
             pii_type=None,
             masking_required=False,
-            description="Standard field"
+            description="Standard field",
+            match_ratios=match_ratios
         )
         
-        # Check for PII patterns in field name
-        for pii_type, pattern in self.pii_patterns.items():
-            if pii_type in field_name_lower:
-                classification.pii_type = pii_type
-                classification.privacy_level = PrivacyLevel.CONFIDENTIAL
-                classification.masking_required = True
-                classification.description = f"Contains {pii_type.upper()} information"
-                break
-        
-        # Check sample values for PII patterns
-        if not classification.pii_type:
-            for value in sample_values:
-                for pii_type, pattern in self.pii_patterns.items():
-                    if re.match(pattern, str(value)):
-                        classification.pii_type = pii_type
-                        classification.privacy_level = PrivacyLevel.CONFIDENTIAL
-                        classification.masking_required = True
-                        classification.description = f"Contains {pii_type.upper()} information"
-                        break
+        if pii_type:
+            classification.pii_type = pii_type
+            classification.privacy_level = PrivacyLevel.CONFIDENTIAL
+            classification.masking_required = True
+            classification.description = f"Contains {pii_type.upper()} information"
         
         # Apply industry-specific rules
         if field_name in self.config.get('sensitive_fields', []):
@@ -82,18 +132,86 @@ class MetadataClassifier:
         
         return classification
     
+    def _classify_by_ratio(self, field_name: str, match_ratios: Dict[str, float],
+                           min_match_ratio: float) -> FieldClassification:
+        """Pick the PII type with the highest match fraction, ties going to pattern order"""
+        pii_type = self._name_pii_type(field_name)
+        if not pii_type and match_ratios:
+            best = max(match_ratios, key=match_ratios.get)
+            if match_ratios[best] >= min_match_ratio:
+                pii_type = best
+        return self._build_classification(field_name, pii_type, match_ratios)
+    
+    def classify_field(self, field_name: str, sample_values: List[str]) -> FieldClassification:
+        """Classify a field based on its name and sample values"""
+        # Field name first, then sample values, stopping at the first hit
+        pii_type = self._name_pii_type(field_name) or self.detector.detect(sample_values)
+        return self._build_classification(field_name, pii_type)
+    
+    def classify_frame(self, df, min_match_ratio: float = 0.5) -> Dict[str, FieldClassification]:
+        """Classify every column of a pandas DataFrame by vectorized pattern hit ratios.
+        
+        Args:
+            df: DataFrame of sample rows
+            min_match_ratio: Fraction of non-null values that must match a pattern
+            
+        Returns:
+            dict: Column name to FieldClassification, with match_ratios populated
+        """
+        results = {}
+        for column in df.columns:
+            values = df[column].dropna().astype(str)
+            match_ratios = {}
+            if len(values):
+                for pii_type, pattern in self.pii_patterns.items():
+                    match_ratios[pii_type] = float(values.str.match(pattern).mean())
+            results[str(column)] = self._classify_by_ratio(str(column), match_ratios, min_match_ratio)
+        return results
+    
+    def classify_arrow_table(self, table, min_match_ratio: float = 0.5) -> Dict[str, FieldClassification]:
+        """Classify every column of a pyarrow Table by vectorized pattern hit ratios.
+        
+        Patterns are evaluated with pyarrow.compute (RE2 syntax).
+        
+        Args:
+            table: pyarrow.Table of sample rows
+            min_match_ratio: Fraction of non-null values that must match a pattern
+            
+        Returns:
+            dict: Column name to FieldClassification, with match_ratios populated
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        
+        results = {}
+        for name, column in zip(table.column_names, table.columns):
+            values = pc.drop_null(pc.cast(column, pa.string()))
+            match_ratios = {}
+            if len(values):
+                for pii_type, pattern in self.pii_patterns.items():
+                    hits = pc.sum(pc.match_substring_regex(values, pattern)).as_py() or 0
+                    match_ratios[pii_type] = hits / len(values)
+            results[name] = self._classify_by_ratio(name, match_ratios, min_match_ratio)
+        return results
+    
     def apply_classification_to_glue_table(self, database: str, table: str, 
-                                         classifications: List[FieldClassification]):
-        """Apply classifications to a Glue table"""
+                                         classifications: List[FieldClassification],
+                                         table_definition: Optional[Dict] = None):
+        """Apply classifications to a Glue table.
+        
+        table_definition may carry the table as returned by get_table/get_tables
+        to skip the extra lookup; the rest of the definition is preserved.
+        """
         try:
             # Get current table
-            table_response = self.glue_client.get_table(
-                DatabaseName=database,
-                Name=table
-            )
+            if table_definition is None:
+                table_definition = self.glue_client.get_table(
+                    DatabaseName=database,
+                    Name=table
+                )['Table']
             
             # Update table parameters with classifications
-            parameters = table_response['Table'].get('Parameters', {})
+            parameters = dict(table_definition.get('Parameters', {}))
             for classification in classifications:
                 parameters[f'classification_{classification.field_name}'] = json.dumps({
                     'privacy_level': classification.privacy_level.value,
@@ -103,12 +221,11 @@ class MetadataClassifier:
                 })
             
             # Update table
+            table_input = {key: table_definition[key] for key in _TABLE_INPUT_KEYS if key in table_definition}
+            table_input.update({'Name': table, 'Parameters': parameters})
             self.glue_client.update_table(
                 DatabaseName=database,
-                TableInput={
-                    'Name': table,
-                    'Parameters': parameters
-                }
+                TableInput=table_input
             )
             
         except Exception as e:
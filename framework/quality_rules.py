@@ -1,37 +1,72 @@
-import great_expectations as ge
-from great_expectations.core.expectation_configuration import ExpectationConfiguration
-from great_expectations.data_context import DataContext
-from great_expectations.dataset import PandasDataset
-import pandas as pd
 import logging
 import os
+from dataset_validation import validate_dataset
+from rule_compiler import load_quality_plan
+from streaming_validation import STUDENT_RECORD_EXPECTATIONS, StreamingValidator
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Backends: both run the built-in student record expectations and the compiled
+# quality_rules. "native" runs them with the streaming engine; "great_expectations"
+# runs the expectations with Great Expectations and is imported only when selected
+NATIVE_BACKEND = "native"
+GREAT_EXPECTATIONS_BACKEND = "great_expectations"
+# quality_rules the native backend runs, the same ones the Glue job applies
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "configs", "higher_ed_config.yaml")
+
 class StudentRecordsValidator:
-    def __init__(self, data_path=None, context_path=None):
+    def __init__(self, data_path=None, context_path=None, backend=NATIVE_BACKEND, chunksize=100000,
+                 config_path=None, dataset="student_records"):
         """
         Initialize the validator with optional data path and context path.
         
         Args:
             data_path (str): Path to the CSV file containing student records
             context_path (str): Path to the Great Expectations context directory
+            backend (str): "native" (default) or "great_expectations"
+            chunksize (int): Rows read per chunk by the native backend
+            config_path (str): Configuration whose quality_rules the native backend runs
+            dataset (str): Key under quality_rules to apply
         """
+        if backend not in (NATIVE_BACKEND, GREAT_EXPECTATIONS_BACKEND):
+            raise ValueError(f"Unknown validation backend: {backend}")
+        
         self.data_path = data_path
         self.context_path = context_path or os.path.join(os.path.dirname(__file__), "great_expectations")
-        
-        # Initialize Great Expectations context
-        try:
-            self.context = DataContext(self.context_path)
-        except Exception as e:
-            logger.warning(f"Could not load existing context: {e}")
-            self.context = DataContext.create(self.context_path)
+        self.backend = backend
+        self.chunksize = chunksize
+        self.config_path = config_path or DEFAULT_CONFIG_PATH
+        self.dataset = dataset
+        self._quality_plan = None
+        self._context = None
+        self._ge_expectations = None
+    
+    @property
+    def context(self):
+        """Great Expectations context, loaded (or scaffolded) on first use"""
+        if self._context is None:
+            from great_expectations.data_context import DataContext
+            
+            try:
+                self._context = DataContext(self.context_path)
+            except Exception as e:
+                logger.warning(f"Could not load existing context: {e}")
+                self._context = DataContext.create(self.context_path)
+        return self._context
+    
+    @property
+    def quality_plan(self):
+        """Compiled quality_rules of the configured dataset, shared with the Glue job through the plan cache"""
+        if self._quality_plan is None:
+            self._quality_plan = load_quality_plan(self.config_path, self.dataset)
+        return self._quality_plan
     
     def validate_student_records(self, data_path=None):
         """
-        Validate student records using Great Expectations.
+        Validate student records with the configured backend.
         
         Args:
             data_path (str): Optional path to override the data file
@@ -43,111 +78,135 @@ class StudentRecordsValidator:
         if not data_path:
             raise ValueError("No data path provided")
         
+        if self.backend == NATIVE_BACKEND:
+            return StreamingValidator(STUDENT_RECORD_EXPECTATIONS, chunksize=self.chunksize,
+                                      plan=self.quality_plan).validate(data_path)
+        return self._validate_with_great_expectations(data_path)
+    
+    def _validate_with_great_expectations(self, data_path):
+        """
+        Validate student records using Great Expectations.
+        
+        The compiled quality_rules are evaluated with the same plan as the
+        native backend, so both backends check the same things.
+        
+        Args:
+            data_path (str): Path to the data file
+            
+        Returns:
+            dict: Validation results
+        """
+        import pandas as pd
+        from great_expectations.core.expectation_configuration import ExpectationConfiguration
+        from great_expectations.dataset import PandasDataset
+        
+        # Load (or scaffold) the context only once Great Expectations is actually used
+        self.context
+        
+        # Build the expectation suite once rather than on every validation
+        if self._ge_expectations is None:
+            self._ge_expectations = [
+                ExpectationConfiguration(**expectation) for expectation in STUDENT_RECORD_EXPECTATIONS
+            ]
+        
         # Read the CSV file
         df = pd.read_csv(data_path)
         dataset = PandasDataset(df)
         
-        # Define expectations
-        expectations = [
-            # GPA validation
-            ExpectationConfiguration(
-                expectation_type="expect_column_values_to_be_between",
-                kwargs={
-                    "column": "gpa",
-                    "min_value": 0.0,
-                    "max_value": 4.0,
-                    "parse_strings_as_datetimes": False
-                }
-            ),
-            
-            # Student ID format validation
-            ExpectationConfiguration(
-                expectation_type="expect_column_value_lengths_to_be_between",
-                kwargs={
-                    "column": "student_id",
-                    "min_value": 6,
-                    "max_value": 10
-                }
-            ),
-            
-            # Student ID alphanumeric validation
-            ExpectationConfiguration(
-                expectation_type="expect_column_values_to_match_regex",
-                kwargs={
-                    "column": "student_id",
-                    "regex": "^[A-Za-z0-9]+$"
-                }
-            ),
-            
-            # Required columns validation
-            ExpectationConfiguration(
-                expectation_type="expect_table_columns_to_match_ordered_list",
-                kwargs={
-                    "column_list": [
-                        "student_id", "first_name", "last_name", "email",
-                        "date_of_birth", "ssn", "gpa", "enrollment_status",
-                        "department", "major", "enrollment_date", "graduation_date"
-                    ]
-                }
-            ),
-            
-            # Email format validation
-            ExpectationConfiguration(
-                expectation_type="expect_column_values_to_match_regex",
-                kwargs={
-                    "column": "email",
-                    "regex": r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
-                }
-            ),
-            
-            # SSN format validation
-            ExpectationConfiguration(
-                expectation_type="expect_column_values_to_match_regex",
-                kwargs={
-                    "column": "ssn",
-                    "regex": r"^\d{3}-\d{2}-\d{4}$"
-                }
-            )
-        ]
-        
         # Add expectations to dataset
-        for expectation in expectations:
+        for expectation in self._ge_expectations:
             dataset.add_expectation(expectation)
         
         # Run validation
         validation_result = dataset.validate()
+        plan_result = StreamingValidator([], chunksize=self.chunksize, plan=self.quality_plan).validate(data_path)
+        results = [result.to_json_dict() for result in validation_result.results] + plan_result["results"]
         
         # Log results
-        if validation_result.success:
+        success = validation_result.success and plan_result["success"]
+        if success:
             logger.info("All validations passed successfully!")
         else:
             logger.warning("Some validations failed:")
-            for result in validation_result.results:
-                if not result.success:
-                    logger.warning(f"Failed expectation: {result.expectation_config.expectation_type}")
-                    logger.warning(f"Column: {result.expectation_config.kwargs.get('column', 'N/A')}")
-                    logger.warning(f"Details: {result.result}")
+            for result in results:
+                if not result["success"]:
+                    logger.warning(f"Failed expectation: {result['expectation_config']['expectation_type']}")
+                    logger.warning(f"Column: {result['expectation_config']['kwargs'].get('column', 'N/A')}")
+                    logger.warning(f"Details: {result['result']}")
         
+        successful = sum(1 for result in results if result["success"])
         return {
-            "success": validation_result.success,
-            "results": validation_result.results,
-            "statistics": validation_result.statistics
+            "success": success,
+            "results": results,
+            "statistics": {
+                "evaluated_expectations": len(results),
+                "successful_expectations": successful,
+                "unsuccessful_expectations": len(results) - successful,
+                "success_percent": 100.0 * successful / len(results) if results else None
+            }
         }
 
-def validate_student_data(data_path):
+def validate_student_data(data_path, backend=NATIVE_BACKEND, chunksize=100000, streaming=None):
     """
     Convenience function to validate student data.
     This function can be called from deploy_lake_formation_policies.py.
     
     Args:
         data_path (str): Path to the student records CSV file
+        backend (str): "native" (default, streaming, no Great Expectations import)
+            or "great_expectations"
+        chunksize (int): Rows read per chunk by the native backend
+        streaming (bool): Older spelling of the backend choice: True selects "native",
+            False "great_expectations"; overrides backend when given
         
     Returns:
         dict: Validation results
     """
-    validator = StudentRecordsValidator(data_path=data_path)
+    if streaming is not None:
+        backend = NATIVE_BACKEND if streaming else GREAT_EXPECTATIONS_BACKEND
+    validator = StudentRecordsValidator(data_path=data_path, backend=backend, chunksize=chunksize)
     return validator.validate_student_records()
 
+def validate_with_quality_rules(data_path, config_path, dataset='student_records', chunksize=100000):
+    """
+    Validate data against the YAML quality_rules of a configuration file.
+    
+    The rules are compiled into a cached plan (the same one the Glue job
+    runs) and evaluated in a single streaming pass.
+    
+    Args:
+        data_path (str): Path to the CSV file
+        config_path (str): Path to a configuration with a quality_rules section
+        dataset (str): Key under quality_rules to apply
+        chunksize (int): Rows read per chunk
+        
+    Returns:
+        dict: Validation results
+    """
+    validator = StudentRecordsValidator(data_path=data_path, chunksize=chunksize,
+                                        config_path=config_path, dataset=dataset)
+    return validator.validate_student_records()
+
+def validate_student_dataset(dataset_path, config_path=None, dataset='student_records',
+                             chunksize=100000, max_workers=None, cache_path=None):
+    """
+    Validate a directory, glob or partitioned layout of student record files in parallel.
+    
+    Args:
+        dataset_path (str): e.g. "curated/student_records/" or "raw/**/*.csv"
+        config_path (str): Configuration whose quality_rules are applied, defaults to DEFAULT_CONFIG_PATH
+        dataset (str): Key under quality_rules to apply
+        chunksize (int): Rows read per chunk
+        max_workers (int): Worker processes, defaults to the CPU count
+        cache_path (str): Optional result cache so unchanged files are not revalidated
+        
+    Returns:
+        dict: Per-partition and global results, including failed_partitions
+    """
+    plan = load_quality_plan(config_path or DEFAULT_CONFIG_PATH, dataset)
+    return validate_dataset(dataset_path, STUDENT_RECORD_EXPECTATIONS, plan=plan,
+                            chunksize=chunksize, max_workers=max_workers, cache_path=cache_path)
+
 if __name__ == "__main__":
     # Example usage
     sample_data_path = os.path.join(
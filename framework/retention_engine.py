@@ -0,0 +1,380 @@
+import argparse
+import calendar
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import unquote
+import boto3
+from boto3.s3.transfer import TransferConfig
+import yaml
+from curated_writer import DEFAULT_PARTITION_KEYS, DEFAULT_SORT_KEY, PartitionFiles, list_partition_files, write_sized_partitions
+from subject_deletions import ARCHIVED, write_spark_deletion_markers
+from subject_index import SUBJECT_COLUMN, index_salt_from_secret
+
+DELETE_BATCH_SIZE = 1000  # S3 DeleteObjects limit
+DEFAULT_MAX_WORKERS = 16
+# Copies above this size use multipart UploadPartCopy, required beyond 5 GB
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+
+_PERIOD = re.compile(r'^\s*(\d+)\s*(year|month|day)s?\s*$', re.IGNORECASE)
+
+def retention_cutoff(retention_period: str, as_of: Optional[date] = None) -> date:
+    """First trigger date still retained on as_of, for periods like '7 years'"""
+    match = _PERIOD.match(retention_period)
+    if not match:
+        raise ValueError(f"Unsupported retention period: {retention_period}")
+    amount, unit = int(match.group(1)), match.group(2).lower()
+    as_of = as_of or date.today()
+    if unit == 'day':
+        return date.fromordinal(as_of.toordinal() - amount)
+    months = as_of.year * 12 + as_of.month - 1 - (amount * 12 if unit == 'year' else amount)
+    year, month = divmod(months, 12)
+    month += 1
+    # Clamp the day, e.g. Feb 29 seven years back becomes Feb 28
+    return date(year, month, min(as_of.day, calendar.monthrange(year, month)[1]))
+
+def _split_s3_path(path: str):
+    bucket, _, key = path[len('s3://'):].partition('/')
+    return bucket, key
+
+def _file_key(path: str) -> str:
+    """Comparable form of a listed path and of Spark's input_file_name() (URI-encoded, s3a or file scheme)"""
+    path = unquote(path)
+    scheme, separator, rest = path.partition('://')
+    if separator and scheme.startswith('s3'):
+        return f"s3://{rest}"
+    return os.path.abspath(rest if separator else path)
+
+@dataclass
+class PartitionRetention:
+    """What a retention run does to one partition"""
+    partition: PartitionFiles
+    # Files whose every row has expired, moved to the archive as they are
+    expired_files: List[str] = field(default_factory=list)
+    # Files holding expired and retained rows, which force a partition rewrite
+    mixed_files: List[str] = field(default_factory=list)
+    rows_expired: int = 0
+    bytes_expired: int = 0
+    # Smallest trigger value among retained rows, None when none can expire
+    min_retained_trigger: Optional[str] = None
+
+    @property
+    def needs_rewrite(self) -> bool:
+        return bool(self.mixed_files)
+
+@dataclass
+class RetentionPlan:
+    """Expired data of one table as of a cutoff"""
+    table: str
+    cutoff: str
+    partitions: List[PartitionRetention] = field(default_factory=list)
+    partitions_skipped: int = 0
+
+    @property
+    def rows_expired(self) -> int:
+        return sum(partition.rows_expired for partition in self.partitions)
+
+    @property
+    def bytes_expired(self) -> int:
+        return sum(partition.bytes_expired for partition in self.partitions)
+
+    def describe(self) -> Dict:
+        affected = [partition for partition in self.partitions if partition.rows_expired]
+        return {
+            'table': self.table,
+            'cutoff': self.cutoff,
+            'rows_expired': self.rows_expired,
+            'bytes_expired': self.bytes_expired,
+            'partitions_affected': len(affected),
+            'partitions_scanned': len(self.partitions),
+            'partitions_skipped': self.partitions_skipped,
+            'files_moved': sum(len(partition.expired_files) for partition in affected),
+            'partitions_rewritten': sum(1 for partition in affected if partition.needs_rewrite)
+        }
+
+class RetentionWatermark:
+    """
+    Per-partition state of the last retention run, as JSON on S3 or local disk.
+
+    For each partition it keeps the smallest retained trigger value and the
+    latest file modification time seen. A partition whose files have not
+    changed and whose smallest trigger is still inside the retention window
+    holds nothing to expire, so it is skipped without being read.
+    """
+
+    def __init__(self, path: str, s3_client=None):
+        self.path = path
+        self.s3_client = s3_client or (boto3.client('s3') if path.startswith('s3://') else None)
+        self.partitions: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if self.path.startswith('s3://'):
+            bucket, key = _split_s3_path(self.path)
+            try:
+                return json.loads(self.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())['partitions']
+            except self.s3_client.exceptions.NoSuchKey:
+                return {}
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            return json.load(f)['partitions']
+
+    def needs_scan(self, partition: PartitionFiles, cutoff: str) -> bool:
+        state = self.partitions.get(partition.path)
+        if state is None or partition.modified > state['modified']:
+            return True
+        return state['min_trigger'] is not None and state['min_trigger'] < cutoff
+
+    def save(self):
+        body = json.dumps({
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+            'partitions': self.partitions
+        }, indent=2)
+        if self.path.startswith('s3://'):
+            bucket, key = _split_s3_path(self.path)
+            self.s3_client.put_object(Bucket=bucket, Key=key, Body=body.encode('utf-8'))
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(body)
+        os.replace(tmp_path, self.path)
+
+class RetentionEngine:
+    """
+    Enforces one retention rule on a partitioned Parquet table.
+
+    plan() reads only the trigger column of partitions the watermark cannot
+    rule out, one aggregation per run, to find expired rows per file.
+    apply() moves fully expired files to the archive with concurrent
+    server-side copies and batched deletes, and rewrites only the partitions
+    whose files mix expired and retained rows: expired rows are appended to
+    the archive, read with the cutoff pushed down to the Parquet scan, and
+    the remainder replaces the partition through a dynamic overwrite.
+    Archive writes always precede deletes, so an interrupted run can leave
+    duplicates in the archive but never loses rows. With a deletions_location
+    in the rule, the subjects of expired rows are recorded first as deletion
+    markers, which the incremental dbt models use to drop them.
+    """
+
+    def __init__(self,
+                 spark,
+                 rule: Dict,
+                 source_location: str,
+                 watermark: RetentionWatermark,
+                 partition_keys: Sequence[str] = DEFAULT_PARTITION_KEYS,
+                 sort_key: str = DEFAULT_SORT_KEY,
+                 s3_client=None,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 as_of: Optional[date] = None,
+                 salt: Optional[str] = None):
+        self.spark = spark
+        self.rule = rule
+        self.table = rule['table']
+        self.trigger = rule['retention_trigger']
+        self.source_location = source_location.rstrip('/') + '/'
+        self.archive_location = rule['archive_location'].rstrip('/') + '/'
+        self.deletions_location = rule.get('deletions_location')
+        # Subject index salt the deletion markers are hashed with (SUBJECT_INDEX_SALT when None)
+        self.salt = salt
+        self.watermark = watermark
+        self.partition_keys = list(partition_keys)
+        self.sort_key = sort_key
+        self.s3_client = s3_client or (boto3.client('s3') if self.source_location.startswith('s3://') else None)
+        self.max_workers = max_workers
+        self.cutoff = retention_cutoff(rule['retention_period'], as_of).isoformat()
+
+    def _expired(self):
+        from pyspark.sql import functions as F
+        return F.col(self.trigger) < F.lit(self.cutoff)
+
+    def plan(self) -> RetentionPlan:
+        """Find expired rows and bytes per partition without changing anything"""
+        from pyspark.sql import functions as F
+
+        retention_plan = RetentionPlan(self.table, self.cutoff)
+        partitions = list_partition_files(self.source_location, self.partition_keys, self.s3_client)
+        candidates = [partition for partition in partitions if self.watermark.needs_scan(partition, self.cutoff)]
+        retention_plan.partitions_skipped = len(partitions) - len(candidates)
+        if not candidates:
+            return retention_plan
+
+        expired = self._expired()
+        df = self.spark.read.option("basePath", self.source_location) \
+            .parquet(*[partition.path for partition in candidates]) \
+            .select(F.input_file_name().alias('file'), F.col(self.trigger))
+        file_stats = {
+            _file_key(row['file']): row for row in df.groupBy('file').agg(
+                F.count(F.lit(1)).alias('rows'),
+                F.count(F.when(expired, True)).alias('expired_rows'),
+                F.min(F.when(~expired, F.col(self.trigger))).alias('min_retained')
+            ).collect()
+        }
+
+        for partition in candidates:
+            retention = PartitionRetention(partition)
+            retained_triggers = []
+            for file_path, size in zip(partition.files, partition.sizes):
+                stats = file_stats.get(_file_key(file_path))
+                if stats is None or not stats['expired_rows']:
+                    if stats is not None and stats['min_retained'] is not None:
+                        retained_triggers.append(str(stats['min_retained']))
+                    continue
+                retention.rows_expired += stats['expired_rows']
+                retention.bytes_expired += int(size * stats['expired_rows'] / stats['rows'])
+                if stats['expired_rows'] == stats['rows']:
+                    retention.expired_files.append(file_path)
+                else:
+                    retention.mixed_files.append(file_path)
+                    retained_triggers.append(str(stats['min_retained']))
+            retention.min_retained_trigger = min(retained_triggers) if retained_triggers else None
+            retention_plan.partitions.append(retention)
+        return retention_plan
+
+    def _archive_path(self, file_path: str) -> str:
+        return self.archive_location + file_path[len(self.source_location):]
+
+    def _copy(self, file_path: str):
+        target = self._archive_path(file_path)
+        if file_path.startswith('s3://'):
+            source_bucket, source_key = _split_s3_path(file_path)
+            target_bucket, target_key = _split_s3_path(target)
+            # Managed copy switches to multipart for large objects
+            self.s3_client.copy(
+                {'Bucket': source_bucket, 'Key': source_key}, target_bucket, target_key,
+                Config=TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=MULTIPART_THRESHOLD)
+            )
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(file_path, target)
+
+    def _delete(self, file_paths: List[str]):
+        s3_paths = [path for path in file_paths if path.startswith('s3://')]
+        for path in file_paths:
+            if not path.startswith('s3://'):
+                os.remove(path)
+        by_bucket: Dict[str, List[str]] = {}
+        for path in s3_paths:
+            bucket, key = _split_s3_path(path)
+            by_bucket.setdefault(bucket, []).append(key)
+        for bucket, keys in by_bucket.items():
+            for start in range(0, len(keys), DELETE_BATCH_SIZE):
+                response = self.s3_client.delete_objects(
+                    Bucket=bucket,
+                    Delete={'Objects': [{'Key': key} for key in keys[start:start + DELETE_BATCH_SIZE]], 'Quiet': True}
+                )
+                if response.get('Errors'):
+                    raise RuntimeError(f"Failed to delete {len(response['Errors'])} expired files from {bucket}")
+
+    def _rewrite(self, partitions: List[PartitionRetention]):
+        """Archive the expired rows of mixed partitions and replace them with the retained rows"""
+        from pyspark.sql import functions as F
+
+        expired = self._expired()
+        files = []
+        for retention in partitions:
+            expired_files = set(retention.expired_files)
+            files.extend(file_path for file_path in retention.partition.files if file_path not in expired_files)
+        df = self.spark.read.option("basePath", self.source_location).parquet(*files)
+        # The cutoff is pushed down to the Parquet scan, skipping row groups with no expired rows
+        df.filter(expired).write.mode("append").partitionBy(*self.partition_keys).parquet(self.archive_location)
+        # Materialized so the overwrite does not read the files it is replacing
+        retained = df.filter(~expired | F.col(self.trigger).isNull()).localCheckpoint(eager=True)
+        self.spark.conf.set("spark.sql.sources.partitionOverwriteMode", "dynamic")
+        write_sized_partitions(retained, self.source_location, self.partition_keys, self.sort_key)
+
+    def _record_deletions(self, partitions: List[PartitionRetention]):
+        """Append deletion markers for the subjects of expired rows, before any row is moved"""
+        files = [file_path for retention in partitions
+                 for file_path in retention.expired_files + retention.mixed_files]
+        df = self.spark.read.option("basePath", self.source_location).parquet(*files)
+        if SUBJECT_COLUMN in df.columns:
+            write_spark_deletion_markers(df.filter(self._expired()), self.deletions_location, ARCHIVED,
+                                         salt=self.salt)
+
+    def apply(self, retention_plan: Optional[RetentionPlan] = None) -> Dict:
+        """Archive expired data and update the watermark; returns the plan's summary"""
+        try:
+            retention_plan = retention_plan or self.plan()
+            affected = [retention for retention in retention_plan.partitions if retention.rows_expired]
+            if self.deletions_location and affected:
+                self._record_deletions(affected)
+
+            moved = [file_path for retention in affected for file_path in retention.expired_files]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(self._copy, moved))
+
+            rewritten = [retention for retention in affected if retention.needs_rewrite]
+            if rewritten:
+                # The overwrite also drops the partitions' fully expired files
+                self._rewrite(rewritten)
+            rewritten_paths = {retention.partition.path for retention in rewritten}
+            self._delete([
+                file_path for retention in affected if retention.partition.path not in rewritten_paths
+                for file_path in retention.expired_files
+            ])
+
+            current = {
+                partition.path: partition
+                for partition in list_partition_files(self.source_location, self.partition_keys, self.s3_client)
+            }
+            for retention in retention_plan.partitions:
+                path = retention.partition.path
+                if path not in current:
+                    self.watermark.partitions.pop(path, None)
+                    continue
+                self.watermark.partitions[path] = {
+                    'min_trigger': retention.min_retained_trigger,
+                    'modified': current[path].modified
+                }
+            self.watermark.save()
+            return retention_plan.describe()
+        except Exception as e:
+            print(f"Error applying retention to {self.table}: {str(e)}")
+            raise
+
+def load_retention_rules(config_path: str) -> Dict[str, Dict]:
+    """retention_rules of a configuration file, by table"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return {rule['table']: rule for rule in config.get('retention_rules', [])}
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description='Archive rows past their retention period')
+    parser.add_argument('--config', default=os.path.join(root, 'configs', 'higher_ed_config.yaml'))
+    parser.add_argument('--table', required=True, help='Table of a retention rule')
+    parser.add_argument('--source-location', help="Table location, defaults to the rule's source_location")
+    parser.add_argument('--partition-keys', nargs='+', default=DEFAULT_PARTITION_KEYS)
+    parser.add_argument('--watermark', help='Watermark file, defaults to .retention/<table>.json')
+    parser.add_argument('--as-of', type=date.fromisoformat, help='Evaluate retention on this date (YYYY-MM-DD)')
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--salt-secret', help='Secrets Manager secret holding the subject index salt for '
+                                              'deletion markers (default: the SUBJECT_INDEX_SALT environment variable)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report rows and bytes to archive')
+    args = parser.parse_args()
+
+    rule = load_retention_rules(args.config)[args.table]
+    source_location = args.source_location or rule['source_location']
+    watermark = RetentionWatermark(args.watermark or os.path.join('.retention', f"{args.table}.json"))
+
+    from pyspark.sql import SparkSession
+    spark = SparkSession.builder.appName(f"retention_{args.table}").getOrCreate()
+    engine = RetentionEngine(
+        spark, rule, source_location, watermark,
+        partition_keys=args.partition_keys, max_workers=args.max_workers, as_of=args.as_of,
+        salt=index_salt_from_secret(args.salt_secret) if args.salt_secret else None
+    )
+    retention_plan = engine.plan()
+    summary = retention_plan.describe() if args.dry_run else engine.apply(retention_plan)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
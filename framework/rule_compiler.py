@@ -0,0 +1,130 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Pattern
+import yaml
+
+@dataclass
+class ColumnPlan:
+    """All quality rules of one column fused into a single check"""
+    field: str
+    null_allowed: bool = True
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    allowed_values: Optional[FrozenSet] = None
+    patterns: List[Pattern] = field(default_factory=list)
+    rules: List[Dict] = field(default_factory=list)
+
+    def add_rule(self, rule: Dict):
+        self.rules.append(rule)
+        # A null passes only if every rule on the column allows it
+        self.null_allowed = self.null_allowed and rule.get('null_allowed', False)
+        if rule['type'] == 'numeric':
+            if rule.get('min_value') is not None:
+                self.min_value = rule['min_value'] if self.min_value is None else max(self.min_value, rule['min_value'])
+            if rule.get('max_value') is not None:
+                self.max_value = rule['max_value'] if self.max_value is None else min(self.max_value, rule['max_value'])
+        elif rule['type'] == 'categorical':
+            allowed = frozenset(rule['allowed_values'])
+            self.allowed_values = allowed if self.allowed_values is None else self.allowed_values & allowed
+        elif rule['type'] == 'pattern':
+            self.patterns.append(re.compile(rule['pattern']))
+        else:
+            raise ValueError(f"Unsupported quality rule type: {rule['type']}")
+
+    def evaluate(self, values):
+        """Return (valid, null) boolean masks for a pandas Series in one pass"""
+        import pandas as pd
+
+        null = values.isna()
+        ok = ~null
+        if self.min_value is not None or self.max_value is not None:
+            numeric = pd.to_numeric(values, errors='coerce')
+            if self.min_value is not None:
+                ok &= numeric >= self.min_value
+            if self.max_value is not None:
+                ok &= numeric <= self.max_value
+        if self.allowed_values is not None:
+            ok &= values.isin(self.allowed_values)
+        for pattern in self.patterns:
+            ok &= values.astype(str).str.contains(pattern, na=False)
+        if self.null_allowed:
+            ok |= null
+        return ok, null
+
+    def spark_predicate(self):
+        """Return the fused rule as a single Spark Column expression"""
+        from pyspark.sql import functions as F
+
+        column = F.col(self.field)
+        ok = column.isNotNull()
+        if self.min_value is not None:
+            ok = ok & (column >= self.min_value)
+        if self.max_value is not None:
+            ok = ok & (column <= self.max_value)
+        if self.allowed_values is not None:
+            ok = ok & column.isin(sorted(self.allowed_values))
+        for pattern in self.patterns:
+            ok = ok & column.rlike(pattern.pattern)
+        return ok | (column.isNull() & F.lit(self.null_allowed))
+
+class QualityPlan:
+    """Precompiled execution plan for a list of YAML quality_rules"""
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = rules
+        self.fingerprint = rules_fingerprint(rules)
+        self.columns: Dict[str, ColumnPlan] = {}
+        for rule in rules:
+            self.columns.setdefault(rule['field'], ColumnPlan(rule['field'])).add_rule(rule)
+
+    def evaluate(self, df) -> Dict[str, tuple]:
+        """Evaluate every column plan over a DataFrame; missing columns are skipped"""
+        return {
+            name: plan.evaluate(df[name])
+            for name, plan in self.columns.items()
+            if name in df.columns
+        }
+
+    def row_mask(self, df):
+        """Boolean mask of rows passing every rule"""
+        import pandas as pd
+
+        valid = pd.Series(True, index=df.index)
+        for ok, _ in self.evaluate(df).values():
+            valid &= ok
+        return valid
+
+    def spark_predicates(self) -> Dict:
+        """Column name to fused Spark predicate"""
+        return {name: plan.spark_predicate() for name, plan in self.columns.items()}
+
+    def spark_row_predicate(self):
+        """Single Spark predicate that is true when a row passes every rule"""
+        from pyspark.sql import functions as F
+
+        predicate = F.lit(True)
+        for column_predicate in self.spark_predicates().values():
+            predicate = predicate & column_predicate
+        return predicate
+
+def rules_fingerprint(rules: List[Dict]) -> str:
+    """Stable hash of a rule list, used to key cached plans and results"""
+    return hashlib.sha256(json.dumps(rules, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+_plan_cache: Dict[str, QualityPlan] = {}
+
+def compile_quality_rules(rules: List[Dict]) -> QualityPlan:
+    """Compile rules into a QualityPlan, reusing the cached plan for identical rules"""
+    fingerprint = rules_fingerprint(rules)
+    plan = _plan_cache.get(fingerprint)
+    if plan is None:
+        plan = _plan_cache[fingerprint] = QualityPlan(rules)
+    return plan
+
+def load_quality_plan(config_path: str, dataset: str = 'student_records') -> QualityPlan:
+    """Compile the quality_rules of one dataset from a YAML configuration file"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return compile_quality_rules(config['quality_rules'][dataset])
@@ -0,0 +1,345 @@
+import json
+import logging
+from typing import Dict, List, Optional
+import pandas as pd
+from validation_cache import check_key, file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Checks applied to student records, shared with the Great Expectations validator
+STUDENT_RECORD_EXPECTATIONS = [
+    # GPA validation
+    {
+        "expectation_type": "expect_column_values_to_be_between",
+        "kwargs": {"column": "gpa", "min_value": 0.0, "max_value": 4.0}
+    },
+    # Student ID format validation
+    {
+        "expectation_type": "expect_column_value_lengths_to_be_between",
+        "kwargs": {"column": "student_id", "min_value": 6, "max_value": 10}
+    },
+    # Student ID alphanumeric validation
+    {
+        "expectation_type": "expect_column_values_to_match_regex",
+        "kwargs": {"column": "student_id", "regex": "^[A-Za-z0-9]+$"}
+    },
+    # Required columns validation
+    {
+        "expectation_type": "expect_table_columns_to_match_ordered_list",
+        "kwargs": {
+            "column_list": [
+                "student_id", "first_name", "last_name", "email",
+                "date_of_birth", "ssn", "gpa", "enrollment_status",
+                "department", "major", "enrollment_date", "graduation_date"
+            ]
+        }
+    },
+    # Email format validation
+    {
+        "expectation_type": "expect_column_values_to_match_regex",
+        "kwargs": {"column": "email", "regex": r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"}
+    },
+    # SSN format validation
+    {
+        "expectation_type": "expect_column_values_to_match_regex",
+        "kwargs": {"column": "ssn", "regex": r"^\d{3}-\d{2}-\d{4}$"}
+    }
+]
+
+def _unexpected_between(values: pd.Series, kwargs: Dict) -> pd.Series:
+    numeric = pd.to_numeric(values, errors='coerce')
+    unexpected = numeric.isna()
+    if kwargs.get('min_value') is not None:
+        unexpected |= numeric < kwargs['min_value']
+    if kwargs.get('max_value') is not None:
+        unexpected |= numeric > kwargs['max_value']
+    return unexpected
+
+def _unexpected_lengths(values: pd.Series, kwargs: Dict) -> pd.Series:
+    lengths = values.str.len()
+    unexpected = pd.Series(False, index=values.index)
+    if kwargs.get('min_value') is not None:
+        unexpected |= lengths < kwargs['min_value']
+    if kwargs.get('max_value') is not None:
+        unexpected |= lengths > kwargs['max_value']
+    return unexpected
+
+def _unexpected_regex(values: pd.Series, kwargs: Dict) -> pd.Series:
+    return ~values.str.contains(kwargs['regex'], regex=True)
+
+# Column checks: return a mask of unexpected values over the non-null values of a chunk
+COLUMN_CHECKS = {
+    "expect_column_values_to_be_between": _unexpected_between,
+    "expect_column_value_lengths_to_be_between": _unexpected_lengths,
+    "expect_column_values_to_match_regex": _unexpected_regex
+}
+
+class _ColumnCheckState:
+    """Statistics of one column check merged across chunks"""
+
+    def __init__(self, expectation: Dict, sample_size: int):
+        self.expectation = expectation
+        self.sample_size = sample_size
+        self.element_count = 0
+        self.missing_count = 0
+        self.unexpected_count = 0
+        self.unexpected_values: List = []
+        self.unexpected_rows: List[int] = []
+        self.error: Optional[str] = None
+
+    def update(self, chunk: pd.DataFrame, row_offset: int):
+        column = self.expectation['kwargs']['column']
+        if column not in chunk.columns:
+            self.error = f"Column {column} not found"
+            return
+
+        values = chunk[column]
+        present = values.notna()
+        non_null = values[present]
+        unexpected = COLUMN_CHECKS[self.expectation['expectation_type']](non_null, self.expectation['kwargs'])
+
+        self.element_count += len(values)
+        self.missing_count += len(values) - len(non_null)
+        self.unexpected_count += int(unexpected.sum())
+
+        room = self.sample_size - len(self.unexpected_values)
+        if room > 0 and unexpected.any():
+            failing = non_null[unexpected].head(room)
+            self.unexpected_values.extend(failing.tolist())
+            self.unexpected_rows.extend(int(index) + row_offset for index in failing.index)
+
+    def result(self) -> Dict:
+        if self.error:
+            return {
+                "success": False,
+                "expectation_config": self.expectation,
+                "result": {},
+                "exception_info": {"raised_exception": True, "exception_message": self.error}
+            }
+
+        non_null = self.element_count - self.missing_count
+        return {
+            "success": self.unexpected_count == 0,
+            "expectation_config": self.expectation,
+            "result": {
+                "element_count": self.element_count,
+                "missing_count": self.missing_count,
+                "missing_percent": 100.0 * self.missing_count / self.element_count if self.element_count else None,
+                "unexpected_count": self.unexpected_count,
+                "unexpected_percent": 100.0 * self.unexpected_count / non_null if non_null else None,
+                "partial_unexpected_list": self.unexpected_values,
+                "partial_unexpected_index_list": self.unexpected_rows
+            }
+        }
+
+class _PlanCheckState:
+    """Statistics of one compiled column plan merged across chunks"""
+
+    def __init__(self, column_plan, sample_size: int):
+        self.column_plan = column_plan
+        self.sample_size = sample_size
+        self.element_count = 0
+        self.missing_count = 0
+        self.unexpected_count = 0
+        self.unexpected_values: List = []
+        self.unexpected_rows: List[int] = []
+        self.found = False
+
+    def update(self, chunk: pd.DataFrame, masks: Dict[str, tuple], row_offset: int):
+        if self.column_plan.field not in masks:
+            return
+        self.found = True
+        valid, null = masks[self.column_plan.field]
+        failing = ~valid
+
+        self.element_count += len(valid)
+        self.missing_count += int(null.sum())
+        self.unexpected_count += int(failing.sum())
+
+        room = self.sample_size - len(self.unexpected_values)
+        if room > 0 and failing.any():
+            sample = chunk[self.column_plan.field][failing].head(room)
+            self.unexpected_values.extend(None if pd.isna(value) else value for value in sample)
+            self.unexpected_rows.extend(int(index) + row_offset for index in sample.index)
+
+    def result(self) -> Dict:
+        expectation = {
+            "expectation_type": "quality_rules",
+            "kwargs": {"column": self.column_plan.field, "rules": self.column_plan.rules}
+        }
+        if not self.found:
+            return {
+                "success": False,
+                "expectation_config": expectation,
+                "result": {},
+                "exception_info": {
+                    "raised_exception": True,
+                    "exception_message": f"Column {self.column_plan.field} not found"
+                }
+            }
+
+        return {
+            "success": self.unexpected_count == 0,
+            "expectation_config": expectation,
+            "result": {
+                "element_count": self.element_count,
+                "missing_count": self.missing_count,
+                "unexpected_count": self.unexpected_count,
+                "unexpected_percent": (
+                    100.0 * self.unexpected_count / self.element_count if self.element_count else None
+                ),
+                "partial_unexpected_list": self.unexpected_values,
+                "partial_unexpected_index_list": self.unexpected_rows
+            }
+        }
+
+class StreamingValidator:
+    """Chunked validation engine that evaluates expectations without Great Expectations.
+
+    The file is read in chunks of `chunksize` rows; each chunk is checked
+    with vectorized pandas operations and its counts and failing-row samples
+    are merged into one result shaped like the Great Expectations output.
+    A compiled QualityPlan (see rule_compiler) adds one fused result per
+    column of the YAML quality_rules. With a ValidationCache, checks already
+    evaluated against an unchanged file are returned without reading it.
+    """
+
+    def __init__(self, expectations: Optional[List[Dict]] = None, chunksize: int = 100000,
+                 sample_size: int = 20, plan=None, cache=None):
+        """
+        Args:
+            expectations (list): Expectation specs, defaults to STUDENT_RECORD_EXPECTATIONS
+            chunksize (int): Rows read per chunk
+            sample_size (int): Failing values kept per expectation
+            plan (QualityPlan): Optional compiled quality_rules evaluated in the same pass
+            cache (ValidationCache): Optional per-file, per-check result cache
+        """
+        self.expectations = expectations if expectations is not None else STUDENT_RECORD_EXPECTATIONS
+        self.chunksize = chunksize
+        self.sample_size = sample_size
+        self.plan = plan
+        self.cache = cache
+
+    def _iter_chunks(self, data_path: str, partition_values: Optional[Dict[str, str]]):
+        """Yield string-typed DataFrame chunks of a CSV or Parquet file"""
+        if data_path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            chunks = (
+                batch.to_pandas().astype('string')
+                for batch in pq.ParquetFile(data_path).iter_batches(batch_size=self.chunksize)
+            )
+        else:
+            chunks = pd.read_csv(data_path, dtype=str, chunksize=self.chunksize)
+
+        for chunk in chunks:
+            # Hive-style partition values live in the path, not in the file
+            for key, value in (partition_values or {}).items():
+                chunk[key] = value
+            yield chunk
+
+    def validate(self, data_path: str, partition_values: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Validate a CSV or Parquet file chunk by chunk.
+
+        Args:
+            data_path (str): Path to the CSV or Parquet file
+            partition_values (dict): Partition columns to add to every row, e.g. {"department": "Mathematics"}
+
+        Returns:
+            dict: Validation results with "success", "results" and "statistics"
+        """
+        # Every check in result order, with the key it is cached under
+        checks = [('expectation', expectation) for expectation in self.expectations]
+        checks.extend(('plan', column_plan) for column_plan in (self.plan.columns.values() if self.plan else []))
+        keys = [
+            check_key({
+                'kind': kind,
+                'spec': spec if kind == 'expectation' else {'field': spec.field, 'rules': spec.rules},
+                'sample_size': self.sample_size
+            })
+            for kind, spec in checks
+        ]
+
+        cached = {}
+        if self.cache is not None:
+            fingerprint = f"{file_fingerprint(data_path)}:{json.dumps(partition_values or {}, sort_keys=True)}"
+            cached = self.cache.get_many(fingerprint, keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+
+        column_states = {}
+        plan_states = {}
+        for i in missing:
+            kind, spec = checks[i]
+            if kind == 'plan':
+                plan_states[i] = _PlanCheckState(spec, self.sample_size)
+            elif spec['expectation_type'] in COLUMN_CHECKS:
+                column_states[i] = _ColumnCheckState(spec, self.sample_size)
+            elif spec['expectation_type'] != 'expect_table_columns_to_match_ordered_list':
+                raise ValueError(f"Unsupported expectation: {spec['expectation_type']}")
+        plan_fields = sorted({state.column_plan.field for state in plan_states.values()})
+        observed_columns = None
+
+        row_offset = 0
+        chunks = self._iter_chunks(data_path, partition_values) if missing else []
+        for chunk in chunks:
+            if observed_columns is None:
+                observed_columns = list(chunk.columns)
+            chunk.index = range(len(chunk))
+            for state in column_states.values():
+                state.update(chunk, row_offset)
+            if plan_states:
+                # The compiled plan evaluates each column once, as the Glue job's quality stage does
+                fields = [field for field in plan_fields if field in chunk.columns]
+                masks = self.plan.evaluate(chunk[fields])
+                for plan_state in plan_states.values():
+                    plan_state.update(chunk, masks, row_offset)
+            row_offset += len(chunk)
+
+        computed = {}
+        for i in missing:
+            kind, spec = checks[i]
+            if i in column_states:
+                computed[i] = column_states[i].result()
+            elif i in plan_states:
+                computed[i] = plan_states[i].result()
+            else:
+                # Partition columns are moved out of the file, so only the
+                # file's own columns can be checked for order
+                partition_keys = set(partition_values or {})
+                expected = [c for c in spec['kwargs']['column_list'] if c not in partition_keys]
+                file_columns = [c for c in (observed_columns or []) if c not in partition_keys]
+                known_partitions = partition_keys <= set(spec['kwargs']['column_list'])
+                computed[i] = {
+                    "success": file_columns == expected and known_partitions,
+                    "expectation_config": spec,
+                    "result": {"observed_value": observed_columns}
+                }
+
+        if self.cache is not None and computed:
+            self.cache.put_many(fingerprint, {keys[i]: result for i, result in computed.items()})
+        results = [computed[i] if i in computed else cached[key] for i, key in enumerate(keys)]
+
+        successful = sum(1 for result in results if result['success'])
+        statistics = {
+            "evaluated_expectations": len(results),
+            "successful_expectations": successful,
+            "unsuccessful_expectations": len(results) - successful,
+            "success_percent": 100.0 * successful / len(results) if results else None
+        }
+        success = successful == len(results)
+
+        if success:
+            logger.info("All validations passed successfully!")
+        else:
+            logger.warning("Some validations failed:")
+            for result in results:
+                if not result['success']:
+                    logger.warning(f"Failed expectation: {result['expectation_config']['expectation_type']}")
+                    logger.warning(f"Column: {result['expectation_config']['kwargs'].get('column', 'N/A')}")
+                    logger.warning(f"Details: {result['result']}")
+
+        return {
+            "success": success,
+            "results": results,
+            "statistics": statistics
+        }
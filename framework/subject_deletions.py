@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from subject_index import SUBJECT_COLUMN, spark_subject_hash, subject_hash
+
+# Reasons recorded with a deletion marker
+ERASED = 'erased'
+ARCHIVED = 'archived'
+# Subjects are stored as their salted subject_hash, as in the subject index, never as raw ids
+DELETION_COLUMNS = ['subject_hash', 'reason', 'deleted_at']
+
+def write_deletion_markers(location: str, subject_ids: Iterable, reason: str, salt: Optional[str] = None,
+                           deleted_at: Optional[datetime] = None, filesystem=None) -> int:
+    """
+    Append one marker per subject removed from the lake, as a new Parquet file under location.
+
+    The markers are the subject_deletions source of the dbt project, whose
+    incremental models delete the subjects' rows and retract them from
+    department aggregates. Each subject is recorded as its subject_hash with
+    the index salt (SUBJECT_INDEX_SALT when salt is None). Returns the
+    markers written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import fs
+
+    hashes = sorted({subject_hash(subject_id, salt) for subject_id in subject_ids})
+    if not hashes:
+        return 0
+    if filesystem is None:
+        filesystem, root = fs.FileSystem.from_uri(location)
+    else:
+        root = location
+    root = root.rstrip('/')
+    deleted_at = deleted_at or datetime.now(timezone.utc)
+    table = pa.table({
+        'subject_hash': pa.array(hashes, pa.string()),
+        'reason': pa.array([reason] * len(hashes), pa.string()),
+        'deleted_at': pa.array([deleted_at] * len(hashes), pa.timestamp('us', tz='UTC'))
+    })
+    filesystem.create_dir(root, recursive=True)
+    pq.write_table(table, f"{root}/part-{uuid.uuid4().hex}.parquet", filesystem=filesystem)
+    return len(hashes)
+
+def write_spark_deletion_markers(df, location: str, reason: str, subject_column: str = SUBJECT_COLUMN,
+                                 salt: Optional[str] = None):
+    """Append markers for the distinct subjects of a DataFrame, as write_deletion_markers does"""
+    from pyspark.sql import functions as F
+    df.where(F.col(subject_column).isNotNull()) \
+        .select(spark_subject_hash(subject_column, salt).alias('subject_hash')).distinct() \
+        .withColumn('reason', F.lit(reason)) \
+        .withColumn('deleted_at', F.current_timestamp()) \
+        .write.mode('append').parquet(location)
@@ -0,0 +1,238 @@
+import argparse
+import csv
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+from subject_deletions import ERASED, write_deletion_markers
+from subject_index import SUBJECT_COLUMN, SubjectLocation, SubjectLocationIndex, index_salt_from_secret
+
+DEFAULT_MAX_WORKERS = 16
+
+def _is_data_file(path: str) -> bool:
+    name = os.path.basename(path)
+    return not name.startswith(('_', '.')) and not name.endswith('_$folder$')
+
+def _typed_subjects(subjects: Set[str], arrow_type) -> Optional[Dict[str, object]]:
+    """Subjects cast to the subject column's physical type, or None when some cannot be"""
+    import pyarrow as pa
+    try:
+        values = pa.array(sorted(subjects), type=pa.string()).cast(arrow_type).to_pylist()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    return dict(zip(sorted(subjects), values))
+
+@dataclass
+class ErasurePlan:
+    """Files to rewrite for a batch of erasure requests, each with the subjects it may hold"""
+    subjects: Set[str]
+    locations: int = 0
+    files_listed: int = 0
+    files: Dict[str, Set[str]] = field(default_factory=dict)
+
+    def describe(self) -> Dict:
+        return {
+            'subjects': len(self.subjects),
+            'locations': self.locations,
+            'files_listed': self.files_listed,
+            'files_to_rewrite': len(self.files)
+        }
+
+class SubjectErasureJob:
+    """
+    Erase a batch of subjects (right to be forgotten) from every file the index points to.
+
+    The subject location index narrows the batch to files and partitions;
+    partition and table locations are listed and their Parquet files pruned
+    by the row-group min/max statistics of the subject column, which the
+    curated writer keeps tight by sorting on student_id. Each remaining file
+    is read once and rewritten once without the rows of any subject in the
+    batch, so cost follows the number of affected files, not the size of the
+    lake. Finally the subjects' index entries are removed, and deletion
+    markers appended to deletions_location so the dbt models drop them too.
+    """
+
+    def __init__(self, index: SubjectLocationIndex, subject_column: str = SUBJECT_COLUMN,
+                 max_workers: int = DEFAULT_MAX_WORKERS, deletions_location: Optional[str] = None):
+        self.index = index
+        self.subject_column = subject_column
+        self.max_workers = max_workers
+        self.deletions_location = deletions_location
+
+    def _filesystem(self, path: str):
+        from pyarrow import fs
+        return fs.FileSystem.from_uri(path)
+
+    def _list_files(self, location: SubjectLocation) -> List[str]:
+        from pyarrow import fs
+        if location.file:
+            return [location.file]
+        filesystem, prefix = self._filesystem(location.prefix)
+        selector = fs.FileSelector(prefix, recursive=True, allow_not_found=True)
+        scheme = location.prefix.split('://', 1)[0] + '://' if '://' in location.prefix else ''
+        return sorted(
+            scheme + info.path for info in filesystem.get_file_info(selector)
+            if info.type == fs.FileType.File and _is_data_file(info.path)
+        )
+
+    def _may_contain(self, path: str, subjects: Set[str]) -> Set[str]:
+        """Subjects within the subject column's min/max range of some row group of a Parquet file"""
+        if not path.endswith('.parquet'):
+            return subjects
+        import pyarrow.parquet as pq
+        filesystem, file_path = self._filesystem(path)
+        with filesystem.open_input_file(file_path) as f:
+            metadata = pq.ParquetFile(f).metadata
+        schema_names = metadata.schema.names
+        if self.subject_column not in schema_names:
+            return set()
+        column = schema_names.index(self.subject_column)
+        typed = _typed_subjects(subjects, metadata.schema.to_arrow_schema().field(self.subject_column).type)
+        if typed is None:
+            return subjects
+        candidates = set()
+        for row_group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(row_group).column(column).statistics
+            if statistics is None or not statistics.has_min_max:
+                return subjects
+            try:
+                candidates |= {subject for subject, value in typed.items() if statistics.min <= value <= statistics.max}
+            except TypeError:
+                # Statistics of a type the subjects do not compare with; keep the file
+                return subjects
+        return candidates
+
+    def plan(self, subject_ids: Iterable) -> ErasurePlan:
+        """Look up the batch's subjects and find the files that may hold them"""
+        try:
+            subjects = {str(subject_id) for subject_id in subject_ids}
+            erasure_plan = ErasurePlan(subjects)
+            locations = self.index.lookup(subjects)
+            erasure_plan.locations = len(locations)
+
+            by_file: Dict[str, Set[str]] = {}
+            for location, location_subjects in locations.items():
+                for path in self._list_files(location):
+                    by_file.setdefault(path, set()).update(location_subjects)
+            erasure_plan.files_listed = len(by_file)
+
+            def prune(item):
+                path, file_subjects = item
+                try:
+                    return path, self._may_contain(path, file_subjects)
+                except FileNotFoundError:
+                    # Replaced since it was indexed; its successor is indexed separately
+                    return path, set()
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for path, file_subjects in executor.map(prune, by_file.items()):
+                    if file_subjects:
+                        erasure_plan.files[path] = file_subjects
+            return erasure_plan
+        except Exception as e:
+            print(f"Error planning erasure: {str(e)}")
+            raise
+
+    def _rewrite_parquet(self, filesystem, path: str, subjects: Set[str]) -> int:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        with filesystem.open_input_file(path) as f:
+            parquet_file = pq.ParquetFile(f)
+            table = parquet_file.read()
+            compression = parquet_file.metadata.row_group(0).column(0).compression if parquet_file.metadata.num_row_groups else 'SNAPPY'
+        if self.subject_column not in table.column_names:
+            return 0
+        erased = pc.is_in(table[self.subject_column].cast(pa.string()), value_set=pa.array(sorted(subjects)))
+        kept = table.filter(pc.invert(pc.fill_null(erased, False)))
+        if kept.num_rows == table.num_rows:
+            return 0
+        sink = pa.BufferOutputStream()
+        pq.write_table(kept, sink, compression=compression.lower())
+        with filesystem.open_output_stream(path) as out:
+            out.write(sink.getvalue())
+        return table.num_rows - kept.num_rows
+
+    def _rewrite_lines(self, filesystem, path: str, subjects: Set[str]) -> int:
+        """CSV with a header, or JSON lines, keeping every other line byte for byte"""
+        with filesystem.open_input_stream(path) as f:
+            lines = io.TextIOWrapper(io.BytesIO(f.read()), encoding='utf-8', newline='').readlines()
+        if path.endswith(('.json', '.jsonl', '.ndjson')):
+            def subject_of(line):
+                return str(json.loads(line).get(self.subject_column)) if line.strip() else None
+            body = lines
+            kept = []
+        else:
+            if not lines:
+                return 0
+            header = next(csv.reader([lines[0]]))
+            if self.subject_column not in header:
+                return 0
+            column = header.index(self.subject_column)
+
+            def subject_of(line):
+                values = next(csv.reader([line]), [])
+                return values[column] if len(values) > column else None
+            body = lines[1:]
+            kept = [lines[0]]
+
+        erased = 0
+        for line in body:
+            if subject_of(line) in subjects:
+                erased += 1
+            else:
+                kept.append(line)
+        if erased:
+            with filesystem.open_output_stream(path) as out:
+                out.write(''.join(kept).encode('utf-8'))
+        return erased
+
+    def _rewrite(self, item) -> int:
+        path, subjects = item
+        filesystem, file_path = self._filesystem(path)
+        if path.endswith('.parquet'):
+            return self._rewrite_parquet(filesystem, file_path, subjects)
+        return self._rewrite_lines(filesystem, file_path, subjects)
+
+    def apply(self, erasure_plan: ErasurePlan) -> Dict:
+        """Rewrite every planned file once, drop the subjects from the index and record their deletion"""
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                erased = list(executor.map(self._rewrite, erasure_plan.files.items()))
+            summary = erasure_plan.describe()
+            summary['files_rewritten'] = sum(1 for rows in erased if rows)
+            summary['rows_erased'] = sum(erased)
+            summary['index_entries_removed'] = self.index.remove(erasure_plan.subjects)
+            if self.deletions_location:
+                summary['deletion_markers'] = write_deletion_markers(
+                    self.deletions_location, erasure_plan.subjects, ERASED, salt=self.index.salt)
+            return summary
+        except Exception as e:
+            print(f"Error erasing subjects: {str(e)}")
+            raise
+
+def main():
+    parser = argparse.ArgumentParser(description='Erase a batch of subjects from every file that holds them')
+    parser.add_argument('--index', required=True, help='Subject location index (s3:// or local)')
+    parser.add_argument('--subjects-file', required=True, help='File with one subject id per line')
+    parser.add_argument('--subject-column', default=SUBJECT_COLUMN)
+    parser.add_argument('--salt-secret', help='Secrets Manager secret holding the subject index salt '
+                                              '(default: the SUBJECT_INDEX_SALT environment variable)')
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--deletions-location', help='Where to append deletion markers for the dbt models')
+    parser.add_argument('--dry-run', action='store_true', help='Only report the files to rewrite')
+    args = parser.parse_args()
+
+    with open(args.subjects_file, 'r') as f:
+        subjects = [line.strip() for line in f if line.strip()]
+    salt = index_salt_from_secret(args.salt_secret) if args.salt_secret else None
+    job = SubjectErasureJob(SubjectLocationIndex(args.index, salt=salt), args.subject_column, args.max_workers,
+                            deletions_location=args.deletions_location)
+    erasure_plan = job.plan(subjects)
+    summary = erasure_plan.describe() if args.dry_run else job.apply(erasure_plan)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import hashlib
+import os
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+SUBJECT_COLUMN = 'student_id'
+# Hex characters kept of the SHA-256 digest (64 bits) and used to pick the shard (256 shards)
+HASH_LENGTH = 16
+SHARD_LENGTH = 2
+SALT_ENV = 'SUBJECT_INDEX_SALT'
+# Kept beside the shards so an index is never appended to or queried with another salt
+SALT_FINGERPRINT_FILE = '_salt_fingerprint'
+HIVE_DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+INDEX_COLUMNS = ['subject_hash', 'table_location', 'partition_spec', 'file']
+
+# Characters Spark percent-encodes in partition directory names
+_ESCAPED_CHARACTERS = set('"#%\'*/:=?\\\x7f{[]^') | {chr(code) for code in range(1, 0x20)}
+
+def index_salt() -> str:
+    """Salt mixed into subject hashes, from the SUBJECT_INDEX_SALT environment variable"""
+    salt = os.environ.get(SALT_ENV)
+    if not salt:
+        raise ValueError(f"{SALT_ENV} is not set; subject hashes without a salt can be reversed by enumeration")
+    return salt
+
+def index_salt_from_secret(secret_id: str, secretsmanager_client=None) -> str:
+    """Salt stored as the SecretString of a Secrets Manager secret, as passed to the Glue job"""
+    import boto3
+    client = secretsmanager_client or boto3.client('secretsmanager')
+    salt = client.get_secret_value(SecretId=secret_id)['SecretString'].strip()
+    if not salt:
+        raise ValueError(f"Secret {secret_id} holds an empty subject index salt")
+    return salt
+
+def salt_fingerprint(salt: str) -> str:
+    """Identifies a salt without revealing it"""
+    return hashlib.sha256(f"subject-index-salt:{salt}".encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+def subject_hash(subject_id, salt: Optional[str] = None) -> str:
+    """Truncated SHA-256 of a salted subject id, as stored in the index"""
+    salt = index_salt() if salt is None else salt
+    return hashlib.sha256(f"{salt}{subject_id}".encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+def spark_subject_hash(column: str, salt: Optional[str] = None):
+    """Spark expression equal to subject_hash() of a column"""
+    from pyspark.sql import functions as F
+    salt = index_salt() if salt is None else salt
+    return F.substring(F.sha2(F.concat(F.lit(salt), F.col(column).cast('string')), 256), 1, HASH_LENGTH)
+
+def escape_partition_value(value) -> str:
+    """A partition value as Spark names its directory"""
+    if value is None or value == '':
+        return HIVE_DEFAULT_PARTITION
+    return ''.join(f"%{ord(character):02X}" if character in _ESCAPED_CHARACTERS else character
+                   for character in str(value))
+
+def partition_spec(partition_keys: Sequence[str], values: Sequence) -> str:
+    """Relative directory of a partition, e.g. 'department=Math/enrollment_status=ACTIVE'"""
+    return '/'.join(f"{key}={escape_partition_value(value)}" for key, value in zip(partition_keys, values))
+
+@dataclass(frozen=True)
+class SubjectLocation:
+    """
+    Where a subject's rows may be.
+
+    A file when file is set; otherwise every file under table_location
+    joined with partition_spec, which is the whole table when the spec is empty.
+    """
+    table_location: str
+    partition_spec: str = ''
+    file: str = ''
+
+    @property
+    def prefix(self) -> str:
+        if self.file:
+            return self.file
+        root = self.table_location.rstrip('/') + '/'
+        return root + self.partition_spec + '/' if self.partition_spec else root
+
+def spark_subject_locations(df,
+                            table_location: str,
+                            subject_column: str = SUBJECT_COLUMN,
+                            partition_keys: Sequence[str] = (),
+                            partitions: Iterable[Tuple] = (),
+                            file_column: Optional[str] = None,
+                            salt: Optional[str] = None):
+    """
+    Index rows for the subjects of a DataFrame, one per distinct subject and location.
+
+    Locations are the files named by file_column (e.g. input_file_name()
+    captured at read time), or the partitions of partition_keys written to
+    table_location, whose directory names come from the partitions already
+    known on the driver. With neither, subjects point at the whole table.
+    """
+    from pyspark.sql import functions as F
+
+    hashed = spark_subject_hash(subject_column, salt).alias('subject_hash')
+    if file_column:
+        return df.select(hashed, F.lit(table_location).alias('table_location'),
+                         F.lit('').alias('partition_spec'), F.col(file_column).alias('file')).distinct()
+    if not partition_keys:
+        return df.select(hashed).distinct().select(
+            'subject_hash', F.lit(table_location).alias('table_location'),
+            F.lit('').alias('partition_spec'), F.lit('').alias('file'))
+
+    partition_keys = list(partition_keys)
+    specs = [tuple(values) + (partition_spec(partition_keys, values),) for values in partitions]
+    if not specs:
+        return df.sparkSession.createDataFrame([], 'subject_hash string, table_location string, partition_spec string, file string')
+    specs_df = df.sparkSession.createDataFrame(specs, [f"{key}__p" for key in partition_keys] + ['partition_spec'])
+    subjects = df.select(hashed, *partition_keys).distinct()
+    condition = [subjects[key].eqNullSafe(specs_df[f"{key}__p"]) for key in partition_keys]
+    return subjects.join(F.broadcast(specs_df), condition) \
+        .select('subject_hash', F.lit(table_location).alias('table_location'), 'partition_spec', F.lit('').alias('file'))
+
+def write_spark_subject_locations(locations_df, index_path: str, salt: Optional[str] = None):
+    """
+    Append index rows produced by spark_subject_locations to the index, sharded by hash prefix.
+
+    salt must be the one the rows were hashed with; it is checked against the
+    index's salt fingerprint before anything is written.
+    """
+    from pyspark.sql import functions as F
+    SubjectLocationIndex(index_path, salt).check_salt()
+    locations_df.withColumn('shard', F.substring('subject_hash', 1, SHARD_LENGTH)) \
+        .write.mode('append').partitionBy('shard').parquet(index_path)
+
+class SubjectLocationIndex:
+    """
+    Hashed subject id to the files or partitions holding the subject's rows.
+
+    The index is a Parquet dataset (local or S3) partitioned into 256 shards
+    by hash prefix, appended to by the Glue job (Spark) and the
+    classification crawler (add() then flush()). A lookup for a batch of
+    subjects reads only the shards of their hashes, with the hashes pushed
+    down as a filter. Subject ids themselves are never stored; the salt's
+    fingerprint is, and check_salt() refuses a different salt.
+    """
+
+    def __init__(self, index_path: str, salt: Optional[str] = None, filesystem=None):
+        from pyarrow import fs
+        self.index_path = index_path
+        self.salt = index_salt() if salt is None else salt
+        if filesystem is None:
+            filesystem, self._root = fs.FileSystem.from_uri(index_path)
+        else:
+            self._root = index_path
+        self.filesystem = filesystem
+        self._root = self._root.rstrip('/')
+        self._pending: Dict[str, List[Tuple[str, str, str, str]]] = defaultdict(list)
+        self._salt_checked = False
+
+    def check_salt(self):
+        """Record the salt's fingerprint in a new index, or raise if the index was built with another salt"""
+        from pyarrow import fs
+        if self._salt_checked:
+            return
+        path = f"{self._root}/{SALT_FINGERPRINT_FILE}"
+        fingerprint = salt_fingerprint(self.salt)
+        if self.filesystem.get_file_info(path).type == fs.FileType.NotFound:
+            self.filesystem.create_dir(self._root, recursive=True)
+            with self.filesystem.open_output_stream(path) as out:
+                out.write(fingerprint.encode('utf-8'))
+        else:
+            with self.filesystem.open_input_stream(path) as f:
+                stored = f.read().decode('utf-8').strip()
+            if stored != fingerprint:
+                raise ValueError(f"Subject index {self.index_path} was built with a different salt")
+        self._salt_checked = True
+
+    def hash(self, subject_id) -> str:
+        return subject_hash(subject_id, self.salt)
+
+    def _shard_path(self, shard: str) -> str:
+        return f"{self._root}/shard={shard}"
+
+    def _shard_files(self, shard: str) -> List[str]:
+        from pyarrow import fs
+        selector = fs.FileSelector(self._shard_path(shard), allow_not_found=True)
+        return sorted(
+            info.path for info in self.filesystem.get_file_info(selector)
+            if info.type == fs.FileType.File and not os.path.basename(info.path).startswith(('_', '.'))
+        )
+
+    def _read_shard(self, shard: str, hashes: Optional[Set[str]] = None):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        tables = []
+        for path in self._shard_files(shard):
+            table = pq.read_table(path, columns=INDEX_COLUMNS, filesystem=self.filesystem,
+                                  filters=[('subject_hash', 'in', sorted(hashes))] if hashes else None)
+            tables.append(table.select(INDEX_COLUMNS).cast(pa.schema([(name, pa.string()) for name in INDEX_COLUMNS])))
+        if not tables:
+            return pa.table({name: pa.array([], pa.string()) for name in INDEX_COLUMNS})
+        table = pa.concat_tables(tables)
+        if hashes:
+            table = table.filter(pc.is_in(table['subject_hash'], value_set=pa.array(sorted(hashes))))
+        return table
+
+    def _write_shard(self, shard: str, table) -> str:
+        import pyarrow.parquet as pq
+        self.filesystem.create_dir(self._shard_path(shard), recursive=True)
+        path = f"{self._shard_path(shard)}/part-{uuid.uuid4().hex}.parquet"
+        pq.write_table(table.sort_by('subject_hash'), path, filesystem=self.filesystem)
+        return path
+
+    def add(self, subject_id, location: SubjectLocation):
+        """Queue one entry, written by flush()"""
+        hashed = self.hash(subject_id)
+        self._pending[hashed[:SHARD_LENGTH]].append(
+            (hashed, location.table_location, location.partition_spec, location.file))
+
+    def flush(self) -> int:
+        """Write queued entries as one new file per shard; returns the entries written"""
+        import pyarrow as pa
+        if self._pending:
+            self.check_salt()
+        written = 0
+        for shard, entries in self._pending.items():
+            unique = sorted(set(entries))
+            self._write_shard(shard, pa.table({
+                name: pa.array([entry[position] for entry in unique], pa.string())
+                for position, name in enumerate(INDEX_COLUMNS)
+            }))
+            written += len(unique)
+        self._pending.clear()
+        return written
+
+    def lookup(self, subject_ids: Iterable) -> Dict[SubjectLocation, Set[str]]:
+        """Locations of each subject of a batch, as location to subject ids"""
+        self.check_salt()
+        by_hash: Dict[str, Set[str]] = defaultdict(set)
+        for subject_id in subject_ids:
+            by_hash[self.hash(subject_id)].add(str(subject_id))
+        by_shard: Dict[str, Set[str]] = defaultdict(set)
+        for hashed in by_hash:
+            by_shard[hashed[:SHARD_LENGTH]].add(hashed)
+
+        locations: Dict[SubjectLocation, Set[str]] = defaultdict(set)
+        for shard, hashes in by_shard.items():
+            for row in self._read_shard(shard, hashes).to_pylist():
+                location = SubjectLocation(row['table_location'], row['partition_spec'] or '', row['file'] or '')
+                locations[location] |= by_hash[row['subject_hash']]
+        return dict(locations)
+
+    def _rewrite_shard(self, shard: str, table):
+        old_files = self._shard_files(shard)
+        if table.num_rows:
+            self._write_shard(shard, table)
+        for path in old_files:
+            self.filesystem.delete_file(path)
+
+    def remove(self, subject_ids: Iterable) -> int:
+        """Drop every entry of the given subjects, rewriting only their shards; returns entries removed"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        self.check_salt()
+        by_shard: Dict[str, Set[str]] = defaultdict(set)
+        for subject_id in subject_ids:
+            hashed = self.hash(subject_id)
+            by_shard[hashed[:SHARD_LENGTH]].add(hashed)
+
+        removed = 0
+        for shard, hashes in by_shard.items():
+            table = self._read_shard(shard)
+            kept = table.filter(pc.invert(pc.is_in(table['subject_hash'], value_set=pa.array(sorted(hashes)))))
+            if kept.num_rows != table.num_rows:
+                removed += table.num_rows - kept.num_rows
+                self._rewrite_shard(shard, kept)
+        return removed
+
+    def compact(self) -> int:
+        """Merge each shard's files into one, dropping duplicate entries; returns shards compacted"""
+        from pyarrow import fs
+        compacted = 0
+        selector = fs.FileSelector(self._root, allow_not_found=True)
+        for info in self.filesystem.get_file_info(selector):
+            name = os.path.basename(info.path)
+            if info.type != fs.FileType.Directory or not name.startswith('shard='):
+                continue
+            shard = name[len('shard='):]
+            if len(self._shard_files(shard)) > 1:
+                table = self._read_shard(shard).group_by(INDEX_COLUMNS).aggregate([])
+                self._rewrite_shard(shard, table)
+                compacted += 1
+        return compacted
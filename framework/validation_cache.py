@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List
+
+_SAMPLE_BYTES = 65536
+_EVICT_EVERY = 256
+
+def file_fingerprint(path: str) -> str:
+    """
+    Fast content fingerprint of a local file.
+
+    Combines size and mtime with a BLAKE2 hash of the first and last 64 KiB,
+    so unchanged files are recognised without reading them in full.
+    """
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(_SAMPLE_BYTES))
+        if stat.st_size > _SAMPLE_BYTES:
+            f.seek(max(stat.st_size - _SAMPLE_BYTES, _SAMPLE_BYTES))
+            digest.update(f.read(_SAMPLE_BYTES))
+    return f"file:{digest.hexdigest()}"
+
+def s3_fingerprint(s3_client, bucket: str, key: str) -> str:
+    """Fingerprint of an S3 object from its ETag and size"""
+    head = s3_client.head_object(Bucket=bucket, Key=key)
+    etag = head['ETag'].strip('"')
+    return f"s3:{etag}:{head['ContentLength']}"
+
+def check_key(spec: Dict) -> str:
+    """Stable hash of a single check definition"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class ValidationCache:
+    """
+    SQLite store of validation results keyed by (file fingerprint, check hash).
+
+    Each check is cached on its own, so editing one rule only invalidates
+    that rule's entries; the least recently used entries are evicted once
+    the store holds more than max_entries.
+    """
+
+    def __init__(self, db_path: str = os.path.join('.validation_cache', 'results.db'),
+                 max_entries: int = 500000):
+        """
+        Args:
+            db_path (str): SQLite database file
+            max_entries (int): Entries kept before least recently used ones are evicted
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._writes = 0
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS validation_results (
+                fingerprint TEXT NOT NULL,
+                check_key TEXT NOT NULL,
+                result TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (fingerprint, check_key)
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_validation_results_last_used ON validation_results (last_used)"
+        )
+
+    def get_many(self, fingerprint: str, keys: List[str]) -> Dict[str, Dict]:
+        """Return cached results for the given check keys and mark them as used"""
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        rows = self.conn.execute(
+            f"SELECT check_key, result FROM validation_results "
+            f"WHERE fingerprint = ? AND check_key IN ({placeholders})",
+            [fingerprint, *keys]
+        ).fetchall()
+        if rows:
+            with self.conn:
+                self.conn.execute(
+                    f"UPDATE validation_results SET last_used = ? "
+                    f"WHERE fingerprint = ? AND check_key IN ({placeholders})",
+                    [time.time(), fingerprint, *keys]
+                )
+        return {key: json.loads(result) for key, result in rows}
+
+    def put_many(self, fingerprint: str, results: Dict[str, Dict]):
+        """Store results for a file, periodically evicting entries beyond max_entries"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO validation_results (fingerprint, check_key, result, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [(fingerprint, key, json.dumps(result, default=str), now) for key, result in results.items()]
+            )
+        self._writes += 1
+        if self._writes % _EVICT_EVERY == 1:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries beyond max_entries"""
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM validation_results WHERE rowid IN ("
+                "SELECT rowid FROM validation_results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM validation_results")
@@ -0,0 +1,62 @@
+import argparse
+import glob
+import os
+import subprocess
+import sys
+from typing import Dict, Optional
+
+FRAMEWORK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'framework')
+
+# Packages whose presence after import marks a slow cold start
+HEAVY_MODULES = ('great_expectations', 'pyspark', 'pyarrow')
+
+def framework_modules():
+    return sorted(
+        os.path.splitext(os.path.basename(path))[0]
+        for path in glob.glob(os.path.join(FRAMEWORK_DIR, '*.py'))
+        if not os.path.basename(path).startswith('_')
+    )
+
+def measure(module: str) -> Dict:
+    """Import a module in a fresh interpreter under -X importtime"""
+    probe = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        cwd=FRAMEWORK_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return {'module': module, 'error': completed.stderr.strip().splitlines()[-1]}
+
+    cumulative_us: Optional[int] = None
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:'):
+            continue
+        fields = [part.strip() for part in line[len('import time:'):].split('|')]
+        if len(fields) == 3 and fields[2] == module and fields[1].isdigit():
+            cumulative_us = int(fields[1])
+    return {
+        'module': module,
+        'cumulative_ms': cumulative_us / 1000 if cumulative_us is not None else None,
+        'heavy': completed.stdout.strip()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold import time of each framework module')
+    parser.add_argument('modules', nargs='*', help='Modules to measure, defaults to all of framework/')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per module; the fastest is reported')
+    args = parser.parse_args()
+
+    for module in args.modules or framework_modules():
+        runs = [measure(module) for _ in range(args.runs)]
+        if 'error' in runs[0]:
+            print(f"{module:<32} failed: {runs[0]['error']}")
+            continue
+        best = min(runs, key=lambda run: run['cumulative_ms'] or 0)
+        print(f"{module:<32} {best['cumulative_ms']:9.1f} ms  heavy imports: {best['heavy'] or '-'}")
+
+if __name__ == "__main__":
+    main()
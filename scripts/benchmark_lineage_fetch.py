@@ -0,0 +1,89 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'framework'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from lineage_tracking_stub import LineageTracker
+
+class _Body(io.BytesIO):
+    def iter_lines(self):
+        return iter(self.read().splitlines())
+
+class LocalS3:
+    """In-memory S3 stand-in with a fixed per-request latency and 1000-key list pages"""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.objects: Dict[str, bytes] = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body.encode('utf-8') if isinstance(Body, str) else Body
+
+    def get_object(self, Bucket, Key):
+        time.sleep(self.latency_seconds)
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        return {'Body': _Body(self.objects[Key])}
+
+    def list_objects_v2(self, Bucket, Prefix, StartAfter='', ContinuationToken=None):
+        time.sleep(self.latency_seconds)
+        start = ContinuationToken or StartAfter
+        keys = sorted(k for k in self.objects if k.startswith(Prefix) and k > start)
+        page = keys[:1000]
+        response = {'Contents': [{'Key': k} for k in page], 'IsTruncated': len(keys) > 1000}
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+def populate(s3: LocalS3, count: int):
+    for i in range(count):
+        event = {
+            'nodes': [
+                {'id': f"table_raw_{i % 50}", 'type': 'TABLE', 'name': f"raw_{i % 50}"},
+                {'id': f"table_curated_{i % 7}", 'type': 'TABLE', 'name': f"curated_{i % 7}"}
+            ],
+            'edges': [{'source_id': f"table_raw_{i % 50}", 'target_id': f"table_curated_{i % 7}",
+                       'edge_type': 'ETL', 'properties': None}],
+            'timestamp': f"2024-01-01T00:00:00.{i:06d}"
+        }
+        s3.put_object(Bucket='bench', Key=f"lineage/20240101_000000_{i:012d}.json",
+                      Body=json.dumps(event, separators=(',', ':')))
+
+def run(count: int, workers: int, latency_seconds: float) -> float:
+    s3 = LocalS3(latency_seconds)
+    populate(s3, count)
+    tracker = LineageTracker(fetch_workers=workers)
+    tracker.s3_client = s3
+
+    start = time.perf_counter()
+    result = tracker.get_lineage('table_raw_3')
+    elapsed = time.perf_counter() - start
+    assert len(result['lineage']) == len(range(3, count, 50))
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sequential vs concurrent lineage retrieval')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Object counts')
+    parser.add_argument('--workers', type=int, default=32, help='Concurrent fetch workers')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='Simulated S3 request latency')
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    for size in args.sizes:
+        sequential = run(size, 1, latency)
+        concurrent = run(size, args.workers, latency)
+        print(f"{size:>7} objects: sequential {sequential:8.2f}s  "
+              f"concurrent({args.workers}) {concurrent:8.2f}s  speedup {sequential / concurrent:5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,292 @@ import boto3
 import yaml
 import json
 import argparse
-from typing import Dict, List
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from botocore.exceptions import ClientError
 import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'framework'))
+
+from access_policy_index import role_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# BatchGrantPermissions accepts at most 20 entries per request
+BATCH_GRANT_MAX_ENTRIES = 20
+MAX_GRANT_RETRIES = 8
+RETRYABLE_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ConcurrentModificationException',
+    'InternalServiceException'
+}
+
+LIST_PAGE_SIZE = 1000
+# Principal Lake Formation uses for the default IAM-only access; never revoked by a sync
+IAM_ALLOWED_PRINCIPALS = 'IAM_ALLOWED_PRINCIPALS'
+
+# Database access levels used in access_policies.yaml, as Lake Formation database permissions
+DATABASE_ACCESS_PERMISSIONS = {
+    'ALL': ['ALL'],
+    'READ': ['DESCRIBE'],
+    'WRITE': ['DESCRIBE', 'ALTER', 'CREATE_TABLE']
+}
+
+class AdaptiveThrottle:
+    """Request delay shared by all workers: doubles on throttling, halves on success"""
+
+    def __init__(self, base_delay: float = 0.05, max_delay: float = 10.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.delay
+        if delay:
+            # Full jitter keeps workers from retrying in lockstep
+            time.sleep(random.uniform(delay / 2, delay))
+
+    def on_throttle(self):
+        with self._lock:
+            self.delay = min(self.max_delay, max(self.base_delay, self.delay * 2))
+
+    def on_success(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.base_delay else 0.0
+
+# Table name of a resource key for a TableWildcard (all tables of a database)
+TABLE_WILDCARD = '*'
+
+# A single permission as a hashable (principal, resource key, permission) tuple
+PermissionKey = Tuple[str, Tuple, str]
+
+def resource_key(resource: Dict) -> Optional[Tuple]:
+    """
+    Normalize a Lake Formation resource into a hashable key.
+    
+    Catalog ids are dropped and column lists sorted, so a resource from
+    list_permissions compares equal to the one built from the configuration.
+    A table wildcard is keyed as table '*'. Resource types the deployer does
+    not manage (Catalog, DataLocation, LFTag, ...) return None. permission_keys
+    splits ColumnNames keys further into one key per column.
+    """
+    if 'Database' in resource:
+        return ('Database', resource['Database']['Name'])
+    if 'Table' in resource:
+        table = resource['Table']
+        if 'TableWildcard' in table:
+            return ('Table', table['DatabaseName'], TABLE_WILDCARD)
+        return ('Table', table['DatabaseName'], table['Name'])
+    if 'TableWithColumns' in resource:
+        table = resource['TableWithColumns']
+        if 'ColumnNames' in table:
+            columns = ('ColumnNames', tuple(sorted(table['ColumnNames'])))
+        else:
+            columns = ('ExcludedColumnNames', tuple(sorted(table['ColumnWildcard'].get('ExcludedColumnNames', []))))
+        return ('TableWithColumns', table['DatabaseName'], table['Name']) + columns
+    if 'DataCellsFilter' in resource:
+        cells_filter = resource['DataCellsFilter']
+        return ('DataCellsFilter', cells_filter['DatabaseName'], cells_filter['TableName'], cells_filter['Name'])
+    return None
+
+def resource_from_key(key: Tuple) -> Dict:
+    """Inverse of resource_key"""
+    if key[0] == 'Database':
+        return {'Database': {'Name': key[1]}}
+    if key[0] == 'Table':
+        if key[2] == TABLE_WILDCARD:
+            return {'Table': {'DatabaseName': key[1], 'TableWildcard': {}}}
+        return {'Table': {'DatabaseName': key[1], 'Name': key[2]}}
+    if key[0] == 'TableWithColumns':
+        table = {'DatabaseName': key[1], 'Name': key[2]}
+        if key[3] == 'ColumnNames':
+            table['ColumnNames'] = list(key[4])
+        else:
+            table['ColumnWildcard'] = {'ExcludedColumnNames': list(key[4])}
+        return {'TableWithColumns': table}
+    return {'DataCellsFilter': {'DatabaseName': key[1], 'TableName': key[2], 'Name': key[3]}}
+
+def describe_resource(key: Tuple) -> str:
+    """Short form of a resource key, e.g. higher_ed_data.student_records[gpa, student_id]"""
+    if key[0] == 'TableWithColumns':
+        columns = ', '.join(key[4])
+        return f"{key[1]}.{key[2]}[{columns}]" if key[3] == 'ColumnNames' else f"{key[1]}.{key[2]}[* except {columns}]"
+    if key[0] == 'DataCellsFilter':
+        return f"{key[1]}.{key[2]} filter {key[3]}"
+    return '.'.join(key[1:])
+
+def _split_columns(key: Tuple) -> List[Tuple]:
+    """
+    One key per column of a ColumnNames resource.
+    
+    Lake Formation merges the column grants of a principal on a table, and a
+    revoke removes just the columns it names. Diffing per column keeps a sync
+    that adds column c to [a, b] from revoking [a, b] after granting [a, b, c].
+    """
+    if key[0] == 'TableWithColumns' and key[3] == 'ColumnNames':
+        return [key[:4] + ((column,),) for column in key[4]]
+    return [key]
+
+def permission_keys(entries: List[Dict]) -> set:
+    """Expand grant entries or list_permissions results into PermissionKeys"""
+    keys = set()
+    skipped = Counter()
+    for entry in entries:
+        key = resource_key(entry['Resource'])
+        if key is None:
+            skipped.update(list(entry['Resource']))
+            continue
+        principal = entry['Principal']['DataLakePrincipalIdentifier']
+        keys.update((principal, column_key, permission)
+                    for column_key in _split_columns(key) for permission in entry['Permissions'])
+    for resource_type, count in sorted(skipped.items()):
+        logger.warning(f"Skipping {count} permission(s) on unmanaged {resource_type} resources")
+    return keys
+
+def group_permission_keys(keys: set) -> Dict[Tuple[str, str], List[Dict]]:
+    """Merge PermissionKeys back into batch entries grouped by (database, table)"""
+    permissions_by_key: Dict[Tuple[str, Tuple], List[str]] = defaultdict(list)
+    for principal, key, permission in keys:
+        permissions_by_key[(principal, key)].append(permission)
+    
+    # Columns of a table with the same permissions go back into one ColumnNames resource
+    merged: Dict[Tuple[str, Tuple], List[str]] = {}
+    columns: Dict[Tuple[str, Tuple, Tuple], List[str]] = defaultdict(list)
+    for (principal, key), permissions in permissions_by_key.items():
+        if key[0] == 'TableWithColumns' and key[3] == 'ColumnNames':
+            columns[(principal, key[:4], tuple(sorted(permissions)))].extend(key[4])
+        else:
+            merged[(principal, key)] = permissions
+    for (principal, table_key, permissions), names in columns.items():
+        merged[(principal, table_key + (tuple(sorted(names)),))] = list(permissions)
+    
+    plan: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+    for (principal, key), permissions in sorted(merged.items()):
+        table = '' if key[0] == 'Database' else key[2]
+        plan[(key[1], table)].append({
+            'Principal': {'DataLakePrincipalIdentifier': principal},
+            'Resource': resource_from_key(key),
+            'Permissions': sorted(permissions),
+            'PermissionsWithGrantOption': []
+        })
+    return dict(plan)
+
+@dataclass
+class SyncPlan:
+    """Changes that bring Lake Formation in line with the configuration"""
+    create_databases: List[Dict] = field(default_factory=list)
+    create_filters: List[Dict] = field(default_factory=list)
+    update_filters: List[Dict] = field(default_factory=list)
+    delete_filters: List[Tuple[str, str, str]] = field(default_factory=list)
+    grants: set = field(default_factory=set)
+    revokes: set = field(default_factory=set)
+    
+    def is_empty(self) -> bool:
+        return not (self.create_databases or self.create_filters or self.update_filters
+                    or self.delete_filters or self.grants or self.revokes)
+    
+    def describe(self) -> List[str]:
+        """Human-readable list of changes, one per line"""
+        lines = [f"+ database {database['Name']}" for database in self.create_databases]
+        lines += [f"+ filter {f['DatabaseName']}.{f['TableName']}.{f['Name']}" for f in self.create_filters]
+        lines += [f"~ filter {f['DatabaseName']}.{f['TableName']}.{f['Name']}" for f in self.update_filters]
+        lines += [f"- filter {'.'.join(key)}" for key in self.delete_filters]
+        lines += [f"+ grant {permission} on {describe_resource(key)} to {principal}"
+                  for principal, key, permission in sorted(self.grants)]
+        lines += [f"- revoke {permission} on {describe_resource(key)} from {principal}"
+                  for principal, key, permission in sorted(self.revokes)]
+        return lines
+
+class PrincipalResolver:
+    """
+    Resolves configuration role names to IAM role ARNs for a whole deployment.
+    
+    The account id is looked up once (STS get_caller_identity, which also
+    works for role-based credentials) unless given explicitly. Roles mapped
+    from a role matrix may resolve to several ARNs, e.g. one per faculty
+    department; other roles resolve to arn:aws:iam::<account>:role/<name>.
+    """
+    
+    def __init__(self, sts_client=None, account_id: Optional[str] = None):
+        self._sts = sts_client
+        self._account_id = account_id
+        self._cache: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def account_id(self) -> str:
+        if self._account_id is None:
+            with self._lock:
+                if self._account_id is None:
+                    sts = self._sts or boto3.client('sts')
+                    self._account_id = sts.get_caller_identity()['Account']
+        return self._account_id
+    
+    def resolve(self, role: str) -> List[str]:
+        """ARNs of the IAM roles a configuration role maps to"""
+        if role.startswith('arn:'):
+            return [role]
+        key = role_key(role)
+        arns = self._cache.get(key)
+        if arns is None:
+            arns = [f"arn:aws:iam::{self.account_id}:role/{role}"]
+            with self._lock:
+                arns = self._cache.setdefault(key, arns)
+        return arns
+    
+    def register(self, role: str, arns: List[str]):
+        with self._lock:
+            self._cache[role_key(role)] = list(arns)
+    
+    def resolve_role_matrix(self, role_matrix: Dict) -> Dict[str, List[str]]:
+        """
+        Register every role of a role_matrix.json document and return its ARNs.
+        
+        A role with "iam_roles" (such as faculty) maps to all of its
+        department roles, which are also registered under their own names.
+        """
+        resolved = {}
+        for role, definition in role_matrix.get('roles', {}).items():
+            if 'iam_roles' in definition:
+                arns = []
+                for department_role, department in definition['iam_roles'].items():
+                    self.register(department_role, [department['role_arn']])
+                    resolved[department_role] = [department['role_arn']]
+                    arns.append(department['role_arn'])
+            else:
+                arns = [definition['iam_role']]
+            self.register(role, arns)
+            resolved[role] = arns
+        return resolved
+    
+    def load_role_matrix(self, path: str) -> Dict[str, List[str]]:
+        with open(path, 'r') as f:
+            return self.resolve_role_matrix(json.load(f))
+
 class LakeFormationPolicyDeployer:
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, lake_formation_client=None, sts_client=None,
+                 account_id: Optional[str] = None, role_matrix_path: Optional[str] = None,
+                 glue_client=None):
         self.config_path = config_path
         self.config = self._load_config()
-        self.lake_formation = boto3.client('lakeformation')
-        self.iam = boto3.client('iam')
+        self.lake_formation = lake_formation_client or boto3.client('lakeformation')
+        self.glue = glue_client or boto3.client('glue')
+        self.principals = PrincipalResolver(
+            sts_client, account_id or self.config.get('settings', {}).get('account_id')
+        )
+        if role_matrix_path:
+            self.principals.load_role_matrix(role_matrix_path)
         
     def _load_config(self) -> Dict:
         """Load configuration from YAML file"""
@@ -22,9 +295,9 @@ class LakeFormationPolicyDeployer:
             return yaml.safe_load(f)
     
     def create_database(self, database_config: Dict):
-        """Create a database in Lake Formation"""
+        """Create a database in the Glue Data Catalog, which Lake Formation governs; existing databases are kept"""
         try:
-            self.lake_formation.create_database(
+            self.glue.create_database(
                 DatabaseInput={
                     'Name': database_config['name'],
                     'Description': database_config.get('description', ''),
@@ -32,6 +305,11 @@ class LakeFormationPolicyDeployer:
                 }
             )
             logger.info(f"Created database: {database_config['name']}")
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'AlreadyExistsException':
+                logger.error(f"Error creating database {database_config['name']}: {str(e)}")
+                raise
+            logger.info(f"Database {database_config['name']} already exists")
         except Exception as e:
             logger.error(f"Error creating database {database_config['name']}: {str(e)}")
             raise
@@ -40,18 +318,19 @@ class LakeFormationPolicyDeployer:
         """Grant database-level permissions"""
         try:
             for permission in database_config.get('permissions', []):
-                self.lake_formation.grant_permissions(
-                    Principal={
-                        'DataLakePrincipalIdentifier': f"arn:aws:iam::{self.iam.get_user()['User']['Arn'].split(':')[4]}:role/{permission['role']}"
-                    },
-                    Resource={
-                        'Database': {
-                            'Name': database_config['name']
-                        }
-                    },
-                    Permissions=permission['access'].split(','),
-                    PermissionsWithGrantOption=[]
-                )
+                for principal in self.principals.resolve(permission['role']):
+                    self.lake_formation.grant_permissions(
+                        Principal={
+                            'DataLakePrincipalIdentifier': principal
+                        },
+                        Resource={
+                            'Database': {
+                                'Name': database_config['name']
+                            }
+                        },
+                        Permissions=permission['access'].split(','),
+                        PermissionsWithGrantOption=[]
+                    )
                 logger.info(f"Granted {permission['access']} permissions on database {database_config['name']} to role {permission['role']}")
         except Exception as e:
             logger.error(f"Error granting database permissions: {str(e)}")
@@ -62,23 +341,24 @@ class LakeFormationPolicyDeployer:
         try:
             for column in table_config.get('columns', []):
                 for access in column.get('access', []):
-                    self.lake_formation.grant_permissions(
-                        Principal={
-                            'DataLakePrincipalIdentifier': f"arn:aws:iam::{self.iam.get_user()['User']['Arn'].split(':')[4]}:role/{access['role']}"
-                        },
-                        Resource={
-                            'Table': {
-                                'DatabaseName': table_config['database'],
-                                'Name': table_config['name'],
-                                'TableWildcard': {}
+                    for principal in self.principals.resolve(access['role']):
+                        self.lake_formation.grant_permissions(
+                            Principal={
+                                'DataLakePrincipalIdentifier': principal
+                            },
+                            Resource={
+                                'Table': {
+                                    'DatabaseName': table_config['database'],
+                                    'Name': table_config['name'],
+                                    'TableWildcard': {}
+                                }
+                            },
+                            Permissions=['SELECT'],
+                            PermissionsWithGrantOption=[],
+                            ColumnWildcard={
+                                'ExcludedColumnNames': [col['name'] for col in table_config['columns'] if col['name'] != column['name']]
                             }
-                        },
-                        Permissions=['SELECT'],
-                        PermissionsWithGrantOption=[],
-                        ColumnWildcard={
-                            'ExcludedColumnNames': [col['name'] for col in table_config['columns'] if col['name'] != column['name']]
-                        }
-                    )
+                        )
                     logger.info(f"Granted {access['level']} access on column {column['name']} to role {access['role']}")
         except Exception as e:
             logger.error(f"Error creating table permissions: {str(e)}")
@@ -100,25 +380,26 @@ class LakeFormationPolicyDeployer:
                 )
                 
                 for role in filter_def['roles']:
-                    self.lake_formation.grant_permissions(
-                        Principal={
-                            'DataLakePrincipalIdentifier': f"arn:aws:iam::{self.iam.get_user()['User']['Arn'].split(':')[4]}:role/{role}"
-                        },
-                        Resource={
-                            'Table': {
+                    for principal in self.principals.resolve(role):
+                        self.lake_formation.grant_permissions(
+                            Principal={
+                                'DataLakePrincipalIdentifier': principal
+                            },
+                            Resource={
+                                'Table': {
+                                    'DatabaseName': filter_def['tables'][0],
+                                    'Name': filter_def['tables'][0],
+                                    'TableWildcard': {}
+                                }
+                            },
+                            Permissions=['SELECT'],
+                            PermissionsWithGrantOption=[],
+                            DataCellsFilter={
                                 'DatabaseName': filter_def['tables'][0],
-                                'Name': filter_def['tables'][0],
-                                'TableWildcard': {}
+                                'TableName': filter_def['tables'][0],
+                                'Name': filter_def['name']
                             }
-                        },
-                        Permissions=['SELECT'],
-                        PermissionsWithGrantOption=[],
-                        DataCellsFilter={
-                            'DatabaseName': filter_def['tables'][0],
-                            'TableName': filter_def['tables'][0],
-                            'Name': filter_def['name']
-                        }
-                    )
+                        )
                 logger.info(f"Created row filter {filter_def['name']} for roles {filter_def['roles']}")
         except Exception as e:
             logger.error(f"Error creating row filters: {str(e)}")
@@ -130,28 +411,391 @@ class LakeFormationPolicyDeployer:
             for filter_def in filter_config:
                 for column in filter_def['columns']:
                     for role in filter_def['roles']:
-                        self.lake_formation.grant_permissions(
-                            Principal={
-                                'DataLakePrincipalIdentifier': f"arn:aws:iam::{self.iam.get_user()['User']['Arn'].split(':')[4]}:role/{role}"
-                            },
-                            Resource={
-                                'Table': {
-                                    'DatabaseName': self.config['settings']['default_database'],
-                                    'Name': self.config['settings']['default_database'],
-                                    'TableWildcard': {}
+                        for principal in self.principals.resolve(role):
+                            self.lake_formation.grant_permissions(
+                                Principal={
+                                    'DataLakePrincipalIdentifier': principal
+                                },
+                                Resource={
+                                    'Table': {
+                                        'DatabaseName': self.config['settings']['default_database'],
+                                        'Name': self.config['settings']['default_database'],
+                                        'TableWildcard': {}
+                                    }
+                                },
+                                Permissions=['SELECT'],
+                                PermissionsWithGrantOption=[],
+                                ColumnWildcard={
+                                    'ExcludedColumnNames': [column]
                                 }
-                            },
-                            Permissions=['SELECT'],
-                            PermissionsWithGrantOption=[],
-                            ColumnWildcard={
-                                'ExcludedColumnNames': [column]
-                            }
-                        )
+                            )
                 logger.info(f"Created column filter for columns {filter_def['columns']} for roles {filter_def['roles']}")
         except Exception as e:
             logger.error(f"Error creating column filters: {str(e)}")
             raise
     
+    def _create_data_cells_filter(self, filter_def: Dict, table: str):
+        """Create one row filter on a table of the default database, updating it if it already exists"""
+        table_data = self._filter_table_data(filter_def, table)
+        try:
+            self.lake_formation.create_data_cells_filter(TableData=table_data)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'AlreadyExistsException':
+                raise
+            self.lake_formation.update_data_cells_filter(TableData=table_data)
+    
+    def _filter_table_data(self, filter_def: Dict, table: str) -> Dict:
+        return {
+            'TableCatalogId': self.principals.account_id,
+            'DatabaseName': self.config['settings']['default_database'],
+            'TableName': table,
+            'Name': filter_def['name'],
+            'RowFilter': {
+                'FilterExpression': filter_def['filter_expression']
+            },
+            'ColumnWildcard': {}
+        }
+    
+    def build_grant_plan(self) -> Dict[Tuple[str, str], List[Dict]]:
+        """
+        Collect every grant of the configuration as batch_grant_permissions entries.
+        
+        Grants of one role on one table are merged into a single entry, and
+        entries are grouped by (database, table) so independent resources can
+        be granted concurrently.
+        
+        Returns:
+            dict: (database, table) to entries; database-level grants use table ""
+        """
+        default_database = self.config['settings']['default_database']
+        plan: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        
+        def entries(role: str, resource: Dict, permissions: List[str]) -> List[Dict]:
+            return [
+                {
+                    'Principal': {'DataLakePrincipalIdentifier': principal},
+                    'Resource': resource,
+                    'Permissions': permissions,
+                    'PermissionsWithGrantOption': []
+                }
+                for principal in self.principals.resolve(role)
+            ]
+        
+        for database in self.config.get('databases', []):
+            for permission in database.get('permissions', []):
+                access = permission['access']
+                permissions = DATABASE_ACCESS_PERMISSIONS.get(access, access.split(','))
+                plan[(database['name'], '')].extend(
+                    entries(permission['role'], {'Database': {'Name': database['name']}}, permissions)
+                )
+        
+        for table in self.config.get('tables', []):
+            role_columns: Dict[str, List[str]] = defaultdict(list)
+            for column in table.get('columns', []):
+                for access in column.get('access', []):
+                    role_columns[access['role']].append(column['name'])
+            for role, columns in role_columns.items():
+                resource = {'TableWithColumns': {
+                    'DatabaseName': table['database'],
+                    'Name': table['name'],
+                    'ColumnNames': columns
+                }}
+                plan[(table['database'], table['name'])].extend(entries(role, resource, ['SELECT']))
+        
+        for filter_def in self.config.get('row_filters', []):
+            for table in filter_def['tables']:
+                resource = {'DataCellsFilter': {
+                    'DatabaseName': default_database,
+                    'TableName': table,
+                    'Name': filter_def['name']
+                }}
+                for role in filter_def['roles']:
+                    plan[(default_database, table)].extend(entries(role, resource, ['SELECT']))
+        
+        configured_tables = [table['name'] for table in self.config.get('tables', [])]
+        for filter_def in self.config.get('column_filters', []):
+            for table in filter_def.get('tables', configured_tables):
+                resource = {'TableWithColumns': {
+                    'DatabaseName': default_database,
+                    'Name': table,
+                    'ColumnWildcard': {'ExcludedColumnNames': list(filter_def['columns'])}
+                }}
+                for role in filter_def['roles']:
+                    plan[(default_database, table)].extend(entries(role, resource, ['SELECT']))
+        
+        return dict(plan)
+    
+    def _send_batch(self, operation: str, entries: List[Dict], throttle: AdaptiveThrottle,
+                    stats: Counter) -> List[Dict]:
+        """
+        Send one batch grant/revoke request, retrying only throttled entries.
+
+        Permanent failures are kept across attempts; entries still throttled
+        when the retries run out are reported as failures too.
+
+        Returns:
+            list: {'entry', 'error'} for every entry that was not applied
+        """
+        pending = [dict(entry, Id=str(i)) for i, entry in enumerate(entries)]
+        failures = []
+        for _ in range(MAX_GRANT_RETRIES + 1):
+            throttle.wait()
+            stats['api_calls'] += 1
+            try:
+                response = getattr(self.lake_formation, operation)(Entries=pending)
+            except ClientError as e:
+                if e.response['Error']['Code'] not in RETRYABLE_ERROR_CODES:
+                    raise
+                stats['throttled'] += 1
+                throttle.on_throttle()
+                continue
+
+            by_id = {entry['Id']: entry for entry in pending}
+            retry, attempt_failures = [], []
+            for failure in response.get('Failures', []):
+                request_entry = by_id[failure['RequestEntry']['Id']]
+                if failure['Error'].get('ErrorCode') in RETRYABLE_ERROR_CODES:
+                    retry.append(request_entry)
+                else:
+                    attempt_failures.append({'entry': request_entry, 'error': failure['Error']})
+            stats['succeeded'] += len(pending) - len(retry) - len(attempt_failures)
+            failures.extend(attempt_failures)
+            if not retry:
+                throttle.on_success()
+                return failures
+            stats['throttled'] += 1
+            throttle.on_throttle()
+            pending = retry
+
+        return failures + [{'entry': entry, 'error': {'ErrorCode': 'RetriesExhausted'}} for entry in pending]
+    
+    def _send_group(self, operation: str, entries: List[Dict],
+                    throttle: AdaptiveThrottle) -> Tuple[List[Dict], Counter]:
+        """Send all entries of one database/table sequentially, in chunks of the API maximum"""
+        failures, stats = [], Counter()
+        for start in range(0, len(entries), BATCH_GRANT_MAX_ENTRIES):
+            chunk = entries[start:start + BATCH_GRANT_MAX_ENTRIES]
+            failures.extend(self._send_batch(operation, chunk, throttle, stats))
+        return failures, stats
+    
+    def _run_batches(self, operation: str, plan: Dict[Tuple[str, str], List[Dict]], max_workers: int) -> Dict:
+        """Send a plan of batch entries, one worker per database/table"""
+        throttle = AdaptiveThrottle()
+        stats: Counter = Counter()
+        failures = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._send_group, operation, entries, throttle): resource
+                for resource, entries in plan.items()
+            }
+            for future, (database, table) in futures.items():
+                group_failures, group_stats = future.result()
+                stats.update(group_stats)
+                for failure in group_failures:
+                    failures.append(failure)
+                    logger.error(f"Failed {operation} on {database}.{table or '*'}: {failure['error']}")
+        
+        summary = {
+            'resources': len(plan),
+            'entries': sum(len(entries) for entries in plan.values()),
+            'succeeded': stats['succeeded'],
+            'api_calls': stats['api_calls'],
+            'throttled': stats['throttled'],
+            'failed': len(failures)
+        }
+        if failures:
+            raise RuntimeError(f"{len(failures)} of {summary['entries']} {operation} entries failed")
+        return summary
+    
+    def apply_grant_plan(self, plan: Dict[Tuple[str, str], List[Dict]], max_workers: int = 8) -> Dict:
+        """
+        Grant a plan with batch_grant_permissions, one worker per database/table.
+        
+        Args:
+            plan (dict): Output of build_grant_plan
+            max_workers (int): Resources granted concurrently
+            
+        Returns:
+            dict: Counts of entries, granted entries, API calls and throttled requests
+        """
+        summary = self._run_batches('batch_grant_permissions', plan, max_workers)
+        summary['granted'] = summary.pop('succeeded')
+        return summary
+    
+    def deploy_batched(self, max_workers: int = 8) -> Dict:
+        """Deploy all Lake Formation policies through batched, concurrent grants"""
+        try:
+            for database in self.config.get('databases', []):
+                self.create_database(database)
+            
+            # Filters must exist before they can be granted
+            for filter_def in self.config.get('row_filters', []):
+                for table in filter_def['tables']:
+                    self._create_data_cells_filter(filter_def, table)
+            
+            summary = self.apply_grant_plan(self.build_grant_plan(), max_workers)
+            logger.info(
+                f"Granted {summary['granted']} permissions on {summary['resources']} resources "
+                f"in {summary['api_calls']} API calls ({summary['throttled']} throttled)"
+            )
+            return summary
+            
+        except Exception as e:
+            logger.error(f"Error deploying Lake Formation policies: {str(e)}")
+            raise
+    
+    def _managed_databases(self) -> set:
+        databases = {database['name'] for database in self.config.get('databases', [])}
+        databases.add(self.config['settings']['default_database'])
+        return databases
+    
+    def fetch_current_permissions(self) -> set:
+        """All permissions on managed databases, as PermissionKeys (paginated list_permissions)"""
+        managed = self._managed_databases()
+        keys = set()
+        kwargs = {'MaxResults': LIST_PAGE_SIZE}
+        while True:
+            response = self.lake_formation.list_permissions(**kwargs)
+            for key in permission_keys(response.get('PrincipalResourcePermissions', [])):
+                principal, resource, _ = key
+                if resource[1] in managed and principal != IAM_ALLOWED_PRINCIPALS:
+                    keys.add(key)
+            if not response.get('NextToken'):
+                return keys
+            kwargs['NextToken'] = response['NextToken']
+    
+    def fetch_current_filters(self) -> Dict[Tuple[str, str, str], Dict]:
+        """All data cells filters on managed databases (paginated list_data_cells_filter)"""
+        managed = self._managed_databases()
+        filters = {}
+        kwargs = {'MaxResults': LIST_PAGE_SIZE}
+        while True:
+            response = self.lake_formation.list_data_cells_filter(**kwargs)
+            for cells_filter in response.get('DataCellsFilters', []):
+                if cells_filter['DatabaseName'] in managed:
+                    filters[(cells_filter['DatabaseName'], cells_filter['TableName'], cells_filter['Name'])] = cells_filter
+            if not response.get('NextToken'):
+                return filters
+            kwargs['NextToken'] = response['NextToken']
+    
+    def fetch_current_databases(self) -> set:
+        names = set()
+        for page in self.glue.get_paginator('get_databases').paginate():
+            names.update(database['Name'] for database in page['DatabaseList'])
+        return names
+    
+    def plan(self) -> SyncPlan:
+        """
+        Diff the configuration against the current Lake Formation state.
+        
+        Only read calls are made. Desired and current permissions are
+        normalized into PermissionKeys, so the grants and revokes are plain
+        set differences.
+        
+        Returns:
+            SyncPlan: Databases and filters to create, update or delete, and permissions to grant or revoke
+        """
+        try:
+            sync_plan = SyncPlan()
+            
+            existing_databases = self.fetch_current_databases()
+            for database in self.config.get('databases', []):
+                if database['name'] not in existing_databases:
+                    sync_plan.create_databases.append({
+                        'Name': database['name'],
+                        'Description': database.get('description', ''),
+                        'LocationUri': database.get('location', '')
+                    })
+            
+            current_filters = self.fetch_current_filters()
+            desired_filters = {}
+            for filter_def in self.config.get('row_filters', []):
+                for table in filter_def['tables']:
+                    table_data = self._filter_table_data(filter_def, table)
+                    desired_filters[(table_data['DatabaseName'], table, filter_def['name'])] = table_data
+            for key, table_data in desired_filters.items():
+                current = current_filters.get(key)
+                if current is None:
+                    sync_plan.create_filters.append(table_data)
+                elif (current.get('RowFilter', {}).get('FilterExpression', '').strip()
+                      != table_data['RowFilter']['FilterExpression'].strip()):
+                    sync_plan.update_filters.append(table_data)
+            sync_plan.delete_filters = sorted(set(current_filters) - set(desired_filters))
+            
+            desired = set()
+            for entries in self.build_grant_plan().values():
+                desired |= permission_keys(entries)
+            current = self.fetch_current_permissions()
+            sync_plan.grants = desired - current
+            sync_plan.revokes = current - desired
+            
+            logger.info(
+                f"Plan: {len(sync_plan.grants)} grants, {len(sync_plan.revokes)} revokes, "
+                f"{len(sync_plan.create_filters)}/{len(sync_plan.update_filters)}/{len(sync_plan.delete_filters)} "
+                f"filters to create/update/delete, {len(sync_plan.create_databases)} databases to create"
+            )
+            return sync_plan
+            
+        except Exception as e:
+            logger.error(f"Error planning Lake Formation policy sync: {str(e)}")
+            raise
+    
+    def apply(self, sync_plan: Optional[SyncPlan] = None, max_workers: int = 8) -> Dict:
+        """
+        Apply a SyncPlan, computing one first if none is given.
+        
+        Filters are created before grants reference them, and deleted only
+        after the permissions on them have been revoked.
+        
+        Returns:
+            dict: Counts of applied changes and API calls
+        """
+        try:
+            sync_plan = sync_plan or self.plan()
+            summary = {'databases_created': 0, 'filters_created': 0, 'filters_updated': 0,
+                       'filters_deleted': 0, 'granted': 0, 'revoked': 0, 'api_calls': 0}
+            if sync_plan.is_empty():
+                logger.info("Lake Formation policies are up to date")
+                return summary
+            
+            for database_input in sync_plan.create_databases:
+                self.glue.create_database(DatabaseInput=database_input)
+                summary['databases_created'] += 1
+                summary['api_calls'] += 1
+            for table_data in sync_plan.create_filters:
+                self.lake_formation.create_data_cells_filter(TableData=table_data)
+                summary['filters_created'] += 1
+                summary['api_calls'] += 1
+            for table_data in sync_plan.update_filters:
+                self.lake_formation.update_data_cells_filter(TableData=table_data)
+                summary['filters_updated'] += 1
+                summary['api_calls'] += 1
+            
+            if sync_plan.grants:
+                granted = self._run_batches('batch_grant_permissions', group_permission_keys(sync_plan.grants),
+                                            max_workers)
+                summary['granted'] = granted['succeeded']
+                summary['api_calls'] += granted['api_calls']
+            if sync_plan.revokes:
+                revoked = self._run_batches('batch_revoke_permissions', group_permission_keys(sync_plan.revokes),
+                                            max_workers)
+                summary['revoked'] = revoked['succeeded']
+                summary['api_calls'] += revoked['api_calls']
+            
+            for database, table, name in sync_plan.delete_filters:
+                self.lake_formation.delete_data_cells_filter(
+                    TableCatalogId=self.principals.account_id, DatabaseName=database, TableName=table, Name=name
+                )
+                summary['filters_deleted'] += 1
+                summary['api_calls'] += 1
+            
+            logger.info(f"Applied Lake Formation policy changes: {summary}")
+            return summary
+            
+        except Exception as e:
+            logger.error(f"Error applying Lake Formation policy sync: {str(e)}")
+            raise
+    
     def deploy(self):
         """Deploy all Lake Formation policies"""
         try:
@@ -181,10 +825,30 @@ class LakeFormationPolicyDeployer:
 def main():
     parser = argparse.ArgumentParser(description='Deploy Lake Formation policies')
     parser.add_argument('--config', required=True, help='Path to the policy configuration file')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batched', action='store_true',
+                      help='Grant through batch_grant_permissions on concurrent workers')
+    mode.add_argument('--plan', action='store_true',
+                      help='Show the changes needed to match the configuration, without applying them')
+    mode.add_argument('--apply', action='store_true',
+                      help='Grant and revoke only the difference to the current Lake Formation state')
+    parser.add_argument('--max-workers', type=int, default=8, help='Resources granted concurrently')
+    parser.add_argument('--account-id', help='AWS account id of the roles, instead of looking it up through STS')
+    parser.add_argument('--role-matrix', help='role_matrix.json mapping roles to IAM role ARNs')
     args = parser.parse_args()
     
-    deployer = LakeFormationPolicyDeployer(args.config)
-    deployer.deploy()
+    deployer = LakeFormationPolicyDeployer(args.config, account_id=args.account_id,
+                                           role_matrix_path=args.role_matrix)
+    
+    if args.plan:
+        changes = deployer.plan().describe()
+        print('\n'.join(changes) if changes else 'No changes')
+    elif args.apply:
+        print(json.dumps(deployer.apply(max_workers=args.max_workers), indent=2))
+    elif args.batched:
+        print(json.dumps(deployer.deploy_batched(args.max_workers), indent=2))
+    else:
+        deployer.deploy()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -7,17 +7,47 @@ from awsglue.job import Job
 from awsglue.dynamicframe import DynamicFrame
 from pyspark.sql.functions import *
 from pyspark.sql.types import *
+from pyspark import StorageLevel
 import boto3
 import json
 import yaml
+# Shipped with the job via --extra-py-files framework/rule_compiler.py,framework/data_masking.py,
+# framework/access_policy_index.py,framework/incremental_manifest.py,framework/glue_lineage.py,
+# framework/lineage_tracking_stub.py,framework/lineage_graph.py,framework/lineage_index.py,
+# framework/curated_writer.py,framework/subject_index.py
+from rule_compiler import compile_quality_rules
+from data_masking import DataMasker, spark_mask_frame
+from incremental_manifest import IncrementalManifest
+from glue_lineage import GlueLineageEmitter
+from curated_writer import DEFAULT_TARGET_FILE_SIZE_MB, delete_partitions, existing_partitions, write_sized_partitions
+from subject_index import (SubjectLocationIndex, index_salt_from_secret, partition_spec, spark_subject_locations,
+                           write_spark_subject_locations)
 
 # Initialize Glue context
-args = getResolvedOptions(sys.argv, ['JOB_NAME', 'config_path'])
+# Optional: --incremental_mode bookmark (default; requires --job-bookmark-option job-bookmark-enable),
+# manifest (watermark file at --manifest_path) or full; --target_file_size_mb sizes curated files
+# Required: --subject_index_salt_secret, the Secrets Manager secret holding the subject index salt
+OPTIONAL_ARGS = [name for name in ('incremental_mode', 'manifest_path', 'target_file_size_mb') if f"--{name}" in sys.argv]
+args = getResolvedOptions(sys.argv, ['JOB_NAME', 'config_path', 'subject_index_salt_secret'] + OPTIONAL_ARGS)
+incremental_mode = args.get('incremental_mode', 'bookmark')
+target_file_size_mb = int(args.get('target_file_size_mb', DEFAULT_TARGET_FILE_SIZE_MB))
 sc = SparkContext()
 glueContext = GlueContext(sc)
 spark = glueContext.spark_session
 job = Job(glueContext)
 job.init(args['JOB_NAME'], args)
+# Lineage is queued during the run and written once at commit
+lineage = GlueLineageEmitter(args['JOB_NAME'], run_id=args.get('JOB_RUN_ID'))
+# Overwrites replace only the partitions present in the written data
+spark.conf.set("spark.sql.sources.partitionOverwriteMode", "dynamic")
+
+RAW_PATH = "s3://data-lake/raw/student_records/"
+CURATED_PATH = "s3://data-lake/curated/student_records/"
+QUARANTINE_PATH = "s3://data-lake/quarantine/student_records/"
+# Hashed student_id to the files and partitions holding it, for erasure requests
+SUBJECT_INDEX_PATH = "s3://data-lake/governance/subject_index/"
+PARTITION_KEYS = ["department", "enrollment_status"]
+SUBJECT_INDEX_SALT = index_salt_from_secret(args['subject_index_salt_secret'])
 
 # Load configuration
 def load_config(config_path):
@@ -46,57 +76,51 @@ student_schema = StructType([
 ])
 
 # Read raw data
-raw_data = spark.read.format("csv") \
-    .option("header", "true") \
-    .schema(student_schema) \
-    .load("s3://data-lake/raw/student_records/")
+def read_raw_data():
+    if incremental_mode == 'bookmark':
+        # The transformation_ctx lets the job bookmark skip files read by earlier runs
+        raw_frame = glueContext.create_dynamic_frame.from_options(
+            connection_type="s3",
+            connection_options={"paths": [RAW_PATH], "recurse": True},
+            format="csv",
+            format_options={"withHeader": True},
+            transformation_ctx="raw_student_records"
+        ).toDF()
+        if not raw_frame.columns:
+            return None
+        return raw_frame.select([col(field.name).cast(field.dataType) for field in student_schema.fields])
+    
+    paths = [RAW_PATH]
+    if incremental_mode == 'manifest':
+        paths = manifest.new_files(RAW_PATH)
+        if not paths:
+            return None
+    return spark.read.format("csv") \
+        .option("header", "true") \
+        .schema(student_schema) \
+        .load(paths)
 
-# Apply data quality rules
-def apply_quality_rules(df, rules):
-    for rule in rules:
-        if rule['type'] == 'numeric':
-            df = df.filter(
-                (col(rule['field']).isNull() & lit(rule['null_allowed'])) |
-                (col(rule['field']).isNotNull() & 
-                 (col(rule['field']) >= rule['min_value']) & 
-                 (col(rule['field']) <= rule['max_value']))
-            )
-        elif rule['type'] == 'categorical':
-            df = df.filter(
-                (col(rule['field']).isNull() & lit(rule['null_allowed'])) |
-                (col(rule['field']).isNotNull() & 
-                 col(rule['field']).isin(rule['allowed_values']))
-            )
-        elif rule['type'] == 'pattern':
-            df = df.filter(
-                (col(rule['field']).isNull() & lit(rule['null_allowed'])) |
-                (col(rule['field']).isNotNull() & 
-                 col(rule['field']).rlike(rule['pattern']))
-            )
-    return df
+manifest = IncrementalManifest(args['manifest_path']) if incremental_mode == 'manifest' else None
+raw_data = read_raw_data()
 
 # Apply data quality rules
-quality_rules = config['quality_rules']['student_records']
-cleaned_data = apply_quality_rules(raw_data, quality_rules)
+def apply_quality_stage(df, rules):
+    # Each column's rules are fused into one predicate by the shared (cached)
+    # rule compiler and evaluated once into its quality tag; the row verdict
+    # only reads the tags, so no predicate is computed twice
+    plan = compile_quality_rules(rules)
+    passed = lit(True)
+    for field, predicate in plan.spark_predicates().items():
+        tag = f"{field}_quality_tag"
+        df = df.withColumn(tag, when(predicate, "PASS").otherwise("FAIL"))
+        passed = passed & (col(tag) == "PASS")
+    return df.withColumn("quality_passed", passed)
 
 # Apply data masking
 def mask_sensitive_data(df, masking_rules):
-    for rule in masking_rules:
-        if rule['masking_type'] == 'HASH':
-            df = df.withColumn(
-                rule['field'],
-                sha2(col(rule['field']), 256)
-            )
-        elif rule['masking_type'] == 'MASK_ALL':
-            df = df.withColumn(
-                rule['field'],
-                lit('********')
-            )
-    return df
-
-# Apply data masking
-masking_rules = config['masking_rules']
-masked_data = mask_sensitive_data(cleaned_data, masking_rules)
+    # The masking module also produces vendor extracts outside Spark, so
+    # both share one definition of every masking type
+    return spark_mask_frame(df, DataMasker(masking_rules).specs_for_role())
 
 # Add governance tags
 def add_governance_tags(df, classification_rules):
@@ -108,62 +132,149 @@ def add_governance_tags(df, classification_rules):
                 lit("PII")
             )
     
-    # Add data quality tags
-    for rule in quality_rules:
-        df = df.withColumn(
-            f"{rule['field']}_quality_tag",
-            when(
-                (col(rule['field']).isNull() & lit(rule['null_allowed'])) |
-                (col(rule['field']).isNotNull() & 
-                 (col(rule['field']) >= rule.get('min_value', 0)) & 
-                 (col(rule['field']) <= rule.get('max_value', 999999))),
-                "PASS"
-            ).otherwise("FAIL")
-        )
-    
     return df
 
-# Add governance tags
-tagged_data = add_governance_tags(masked_data, config['classification_rules'])
-
-# Convert to DynamicFrame
-dynamic_frame = DynamicFrame.fromDF(tagged_data, glueContext, "tagged_data")
-
-# Write to curated zone with partitioning
-glueContext.write_dynamic_frame.from_options(
-    frame=dynamic_frame,
-    connection_type="s3",
-    connection_options={
-        "path": "s3://data-lake/curated/student_records/",
-        "partitionKeys": ["department", "enrollment_status"]
-    },
-    format="parquet"
-)
-
-# Track lineage
-def track_lineage(source_table, target_table, transformation_details):
-    lineage_tracker = boto3.client('lakeformation')
-    lineage_tracker.create_data_cells_filter(
-        TableData={
-            'DatabaseName': config['settings']['default_database'],
-            'TableName': target_table,
-            'Name': f"{source_table}_to_{target_table}",
-            'RowFilter': {
-                'FilterExpression': transformation_details
-            }
-        }
+# Write partitions in files of about the target size, sorted by student_id
+def write_partitions(df, partition_counts=None):
+    write_sized_partitions(
+        df, CURATED_PATH, PARTITION_KEYS,
+        sort_key="student_id",
+        target_file_size_mb=target_file_size_mb,
+        partition_row_counts=partition_counts
     )
 
-# Track lineage
-track_lineage(
-    'raw_student_records',
-    'curated_student_records',
-    json.dumps({
+# Curated partitions (relative directory specs) that may hold an older row of a student
+def curated_partitions_of(student_ids):
+    index = SubjectLocationIndex(SUBJECT_INDEX_PATH, salt=SUBJECT_INDEX_SALT)
+    return {
+        location.partition_spec for location in index.lookup(student_ids)
+        if location.table_location == CURATED_PATH and location.partition_spec
+    }
+
+# Merge an increment into the curated zone, replacing only the partitions it touches
+def write_curated(df, partition_counts):
+    if incremental_mode == 'full':
+        write_partitions(df, partition_counts)
+        return
+    
+    # Touched partitions are those receiving new rows plus those holding an older
+    # version of an updated student (e.g. after an enrollment status change), found
+    # through the subject index so only they are read
+    updated_ids = df.select("student_id").distinct()
+    touched = {partition_spec(PARTITION_KEYS, partition) for partition in partition_counts}
+    touched |= curated_partitions_of(row["student_id"] for row in updated_ids.collect())
+    touched = existing_partitions(CURATED_PATH, touched)
+    if not touched:
+        # Nothing to merge with
+        write_partitions(df, partition_counts)
+        return
+    
+    existing = spark.read.option("basePath", CURATED_PATH).parquet(*[CURATED_PATH + spec for spec in touched])
+    kept = existing.join(broadcast(updated_ids), "student_id", "left_anti")
+    # Materialized so the overwrite does not read the files it is replacing
+    # Records written before updated_at existed have none
+    merged = kept.unionByName(df, allowMissingColumns=True).localCheckpoint(eager=True)
+    merged_counts = {
+        tuple(row[key] for key in PARTITION_KEYS): row["count"]
+        for row in merged.groupBy(*PARTITION_KEYS).count().collect()
+    }
+    write_partitions(merged, merged_counts)
+    # The dynamic overwrite leaves partitions without merged rows as they were,
+    # so a partition every student moved out of is deleted explicitly
+    emptied = set(touched) - {partition_spec(PARTITION_KEYS, partition) for partition in merged_counts}
+    if emptied:
+        delete_partitions(CURATED_PATH, emptied)
+
+# Rows per output partition (tuple of key values), from one aggregation over the persisted frame
+def partition_row_counts(tagged_data):
+    counts = {True: {}, False: {}}
+    for row in tagged_data.groupBy("quality_passed", *PARTITION_KEYS).count().collect():
+        counts[row["quality_passed"]][tuple(row[key] for key in PARTITION_KEYS)] = row["count"]
+    return counts[True], counts[False]
+
+def partition_names(counts):
+    return {'/'.join(f"{key}={value}" for key, value in zip(PARTITION_KEYS, partition)): rows
+            for partition, rows in counts.items()}
+
+# Record column-level lineage of both outputs
+def track_lineage(raw_data, valid_data, quarantined_data, counts):
+    # New columns are derived from the field they tag
+    derived = {}
+    for field in compile_quality_rules(quality_rules).spark_predicates():
+        derived[f"{field}_quality_tag"] = [field]
+    for field in config['classification_rules']['sensitive_fields']:
+        derived[f"{field}_tag"] = [field]
+    properties = {
         'transformation_type': 'ETL',
+        'incremental_mode': incremental_mode,
         'quality_checks_applied': True,
-        'masking_applied': True,
+        'masked_columns': sorted(DataMasker(masking_rules).specs_for_role()),
         'governance_tags_added': True
-    })
-)
+    }
+    input_files = sorted(raw_data.inputFiles())
+    valid_counts, quarantined_counts = counts
+    lineage.record(
+        'raw_student_records', 'curated_student_records', raw_data, valid_data,
+        derived=derived, input_files=input_files, output_path=CURATED_PATH,
+        partition_row_counts=partition_names(valid_counts), properties=properties
+    )
+    lineage.record(
+        'raw_student_records', 'quarantine_student_records', raw_data, quarantined_data,
+        derived=derived, input_files=input_files, output_path=QUARANTINE_PATH,
+        partition_row_counts=partition_names(quarantined_counts), properties=properties
+    )
+
+# Side output: where each student of the increment now has rows
+def index_subjects(tagged_data, curated_partitions):
+    raw_locations = spark_subject_locations(tagged_data, RAW_PATH, file_column="source_file", salt=SUBJECT_INDEX_SALT)
+    curated_locations = spark_subject_locations(
+        tagged_data.filter(col("quality_passed")), CURATED_PATH,
+        partition_keys=PARTITION_KEYS, partitions=curated_partitions, salt=SUBJECT_INDEX_SALT
+    )
+    quarantine_locations = spark_subject_locations(
+        tagged_data.filter(~col("quality_passed")), QUARANTINE_PATH, salt=SUBJECT_INDEX_SALT
+    )
+    write_spark_subject_locations(
+        raw_locations.unionByName(curated_locations).unionByName(quarantine_locations),
+        SUBJECT_INDEX_PATH, salt=SUBJECT_INDEX_SALT
+    )
+
+def process_increment(raw_data):
+    # Kept through the pipeline for the subject index, dropped before every write
+    sourced_data = raw_data.withColumn("source_file", input_file_name())
+    quality_checked_data = apply_quality_stage(sourced_data, quality_rules)
+    masked_data = mask_sensitive_data(quality_checked_data, masking_rules)
+    tagged_data = add_governance_tags(masked_data, config['classification_rules']) \
+        .withColumn("updated_at", current_timestamp())
+    
+    # Both outputs come from one scan of the raw data
+    tagged_data = tagged_data.persist(StorageLevel.MEMORY_AND_DISK)
+    valid_data = tagged_data.filter(col("quality_passed")).drop("quality_passed", "source_file")
+    quarantined_data = tagged_data.filter(~col("quality_passed")).drop("quality_passed", "source_file")
+    counts = partition_row_counts(tagged_data)
+    
+    # Write to curated zone with partitioning
+    write_curated(valid_data, counts[0])
+    
+    # Write rows failing quality rules, with their quality tags, to quarantine
+    glueContext.write_dynamic_frame.from_options(
+        frame=DynamicFrame.fromDF(quarantined_data, glueContext, "quarantined_data"),
+        connection_type="s3",
+        connection_options={
+            "path": QUARANTINE_PATH
+        },
+        format="parquet"
+    )
+    track_lineage(raw_data, valid_data, quarantined_data, counts)
+    index_subjects(tagged_data, counts[0].keys())
+    tagged_data.unpersist()
+
+quality_rules = config['quality_rules']['student_records']
+masking_rules = config['masking_rules']
+if raw_data is not None:
+    process_increment(raw_data)
 
+if manifest is not None:
+    manifest.commit()
+lineage.commit()
 job.commit() 
\ No newline at end of file
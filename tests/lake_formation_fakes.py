@@ -0,0 +1,206 @@
+"""Offline stand-ins for the AWS clients used by the Lake Formation policy deployer"""
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from botocore.exceptions import ClientError
+from deploy_lake_formation_policies import BATCH_GRANT_MAX_ENTRIES
+
+class FakeSTSClient:
+    """Offline STS stand-in for the deployer"""
+    
+    def __init__(self, account_id: str = '123456789012'):
+        self.account_id = account_id
+        self.calls = Counter()
+    
+    def get_caller_identity(self):
+        self.calls['GetCallerIdentity'] += 1
+        return {'Account': self.account_id, 'Arn': f"arn:aws:sts::{self.account_id}:assumed-role/deployer/session"}
+
+class FakeGlueClient:
+    """Offline Glue Data Catalog stand-in holding databases"""
+    
+    class _Paginator:
+        def __init__(self, client):
+            self.client = client
+        
+        def paginate(self):
+            yield self.client.get_databases()
+    
+    def __init__(self):
+        self.databases = {}
+        self.calls = Counter()
+    
+    def get_paginator(self, operation: str):
+        return self._Paginator(self)
+    
+    def get_databases(self):
+        self.calls['GetDatabases'] += 1
+        return {'DatabaseList': list(self.databases.values())}
+    
+    def create_database(self, DatabaseInput):
+        self.calls['CreateDatabase'] += 1
+        if DatabaseInput['Name'] in self.databases:
+            raise ClientError(
+                {'Error': {'Code': 'AlreadyExistsException', 'Message': 'Database already exists'}},
+                'CreateDatabase'
+            )
+        self.databases[DatabaseInput['Name']] = DatabaseInput
+
+class FakeLakeFormationClient:
+    """
+    Offline Lake Formation stand-in that records granted permissions.
+    
+    Like Lake Formation, column grants of a principal on a table are merged:
+    a grant adds its columns, a revoke removes only the columns it names, and
+    list_permissions reports the remaining columns as one ColumnNames resource.
+    Requests beyond max_requests_per_second, and a random throttle_rate
+    fraction of all requests, fail with ThrottlingException. entry_errors
+    scripts per-entry batch failures: each batch request pops the next error
+    code queued for an entry's principal and reports that entry as failed.
+    """
+    
+    def __init__(self, latency_seconds: float = 0.0, max_requests_per_second: Optional[int] = None,
+                 throttle_rate: float = 0.0, catalog_id: str = '123456789012',
+                 entry_errors: Optional[Dict[str, List[str]]] = None):
+        self.catalog_id = catalog_id
+        self.entry_errors = {principal: list(codes) for principal, codes in (entry_errors or {}).items()}
+        self.latency_seconds = latency_seconds
+        self.max_requests_per_second = max_requests_per_second
+        self.throttle_rate = throttle_rate
+        self.permissions = set()
+        self.data_cells_filters = {}
+        self.calls = Counter()
+        self._recent: List[float] = []
+        self._lock = threading.Lock()
+    
+    def _request(self, operation: str):
+        time.sleep(self.latency_seconds)
+        with self._lock:
+            self.calls[operation] += 1
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            throttled = random.random() < self.throttle_rate or (
+                self.max_requests_per_second is not None and len(self._recent) >= self.max_requests_per_second
+            )
+            if throttled:
+                self.calls['throttled'] += 1
+                raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, operation)
+            self._recent.append(now)
+    
+    def _record(self, principal: Dict, resource: Dict, permissions: List[str], revoke: bool = False):
+        table = resource.get('TableWithColumns', {})
+        if 'ColumnNames' in table:
+            # Stored per column, as Lake Formation merges and subtracts column grants
+            resources = [{'TableWithColumns': dict(table, ColumnNames=[column])} for column in table['ColumnNames']]
+        else:
+            resources = [resource]
+        with self._lock:
+            for resource in resources:
+                resource_key = json.dumps(resource, sort_keys=True)
+                for permission in permissions:
+                    permission_key = (principal['DataLakePrincipalIdentifier'], resource_key, permission)
+                    if revoke:
+                        self.permissions.discard(permission_key)
+                    else:
+                        self.permissions.add(permission_key)
+    
+    def _apply_batch(self, Entries: List[Dict], revoke: bool) -> Dict:
+        failures = []
+        for entry in Entries:
+            codes = self.entry_errors.get(entry['Principal']['DataLakePrincipalIdentifier'])
+            if codes:
+                failures.append({
+                    'RequestEntry': {'Id': entry['Id']},
+                    'Error': {'ErrorCode': codes.pop(0), 'ErrorMessage': 'Scripted failure'}
+                })
+                continue
+            self._record(entry['Principal'], entry['Resource'], entry['Permissions'], revoke=revoke)
+        return {'Failures': failures}
+    
+    def _page(self, items: List, NextToken: Optional[str], MaxResults: int) -> Tuple[List, Dict]:
+        start = int(NextToken or 0)
+        page = items[start:start + MaxResults]
+        return page, ({'NextToken': str(start + MaxResults)} if start + MaxResults < len(items) else {})
+    
+    def create_data_cells_filter(self, TableData):
+        self._request('CreateDataCellsFilter')
+        key = (TableData['DatabaseName'], TableData['TableName'], TableData['Name'])
+        if key in self.data_cells_filters:
+            raise ClientError(
+                {'Error': {'Code': 'AlreadyExistsException', 'Message': 'Filter already exists'}},
+                'CreateDataCellsFilter'
+            )
+        self.data_cells_filters[key] = TableData
+    
+    def update_data_cells_filter(self, TableData):
+        self._request('UpdateDataCellsFilter')
+        self.data_cells_filters[(TableData['DatabaseName'], TableData['TableName'], TableData['Name'])] = TableData
+    
+    def delete_data_cells_filter(self, TableCatalogId, DatabaseName, TableName, Name):
+        self._request('DeleteDataCellsFilter')
+        del self.data_cells_filters[(DatabaseName, TableName, Name)]
+    
+    def list_data_cells_filter(self, NextToken=None, MaxResults=100, Table=None):
+        self._request('ListDataCellsFilter')
+        filters = [self.data_cells_filters[key] for key in sorted(self.data_cells_filters)]
+        page, token = self._page(filters, NextToken, MaxResults)
+        return dict(DataCellsFilters=page, **token)
+    
+    def list_permissions(self, NextToken=None, MaxResults=100, **kwargs):
+        self._request('ListPermissions')
+        grouped: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        with self._lock:
+            for principal, resource_json, permission in self.permissions:
+                grouped[(principal, resource_json)].append(permission)
+        
+        # Report the columns a principal holds on a table with the same permissions as one resource
+        columns: Dict[Tuple[str, str, str, Tuple], List[str]] = defaultdict(list)
+        for (principal, resource_json), permissions in list(grouped.items()):
+            table = json.loads(resource_json).get('TableWithColumns', {})
+            if 'ColumnNames' in table:
+                del grouped[(principal, resource_json)]
+                columns[(principal, table['DatabaseName'], table['Name'], tuple(sorted(permissions)))].extend(
+                    table['ColumnNames'])
+        for (principal, database, name, permissions), names in columns.items():
+            resource = {'TableWithColumns': {'DatabaseName': database, 'Name': name, 'ColumnNames': sorted(names)}}
+            grouped[(principal, json.dumps(resource, sort_keys=True))] = list(permissions)
+        
+        listed = []
+        for (principal, resource_json), permissions in sorted(grouped.items()):
+            # Lake Formation reports resources with their catalog id
+            resource = json.loads(resource_json)
+            for resource_type, value in resource.items():
+                value['TableCatalogId' if resource_type == 'DataCellsFilter' else 'CatalogId'] = self.catalog_id
+            listed.append({
+                'Principal': {'DataLakePrincipalIdentifier': principal},
+                'Resource': resource,
+                'Permissions': sorted(permissions),
+                'PermissionsWithGrantOption': []
+            })
+        page, token = self._page(listed, NextToken, MaxResults)
+        return dict(PrincipalResourcePermissions=page, **token)
+    
+    def grant_permissions(self, Principal, Resource, Permissions, PermissionsWithGrantOption=None, **kwargs):
+        self._request('GrantPermissions')
+        self._record(Principal, Resource, Permissions)
+    
+    def batch_grant_permissions(self, Entries, CatalogId=None):
+        if len(Entries) > BATCH_GRANT_MAX_ENTRIES:
+            raise ClientError(
+                {'Error': {'Code': 'InvalidInputException', 'Message': 'Too many entries'}},
+                'BatchGrantPermissions'
+            )
+        self._request('BatchGrantPermissions')
+        return self._apply_batch(Entries, revoke=False)
+    
+    def batch_revoke_permissions(self, Entries, CatalogId=None):
+        if len(Entries) > BATCH_GRANT_MAX_ENTRIES:
+            raise ClientError(
+                {'Error': {'Code': 'InvalidInputException', 'Message': 'Too many entries'}},
+                'BatchRevokePermissions'
+            )
+        self._request('BatchRevokePermissions')
+        return self._apply_batch(Entries, revoke=True)
@@ -0,0 +1,44 @@
+import os
+from access_policy_index import AccessPolicyIndex, load_access_index
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCES = (
+    os.path.join(ROOT, 'framework', 'access_policies.yaml'),
+    os.path.join(ROOT, 'configs', 'higher_ed_config.yaml'),
+    [os.path.join(ROOT, 'examples', 'higher_ed', 'gpa_masking_policy.yaml')],
+    os.path.join(ROOT, 'examples', 'higher_ed', 'role_matrix.json')
+)
+
+def test_columns_without_rules_get_the_table_access():
+    index = AccessPolicyIndex.compile(*SOURCES)
+
+    steward = index.lookup('DataSteward', 'higher_ed_data', 'student_records', 'first_name')
+    analyst = index.lookup('DataAnalyst', 'higher_ed_data', 'student_records', 'first_name')
+
+    assert steward.access_level == 'FULL'
+    assert analyst.access_level == 'FULL'
+    # Row filters of the table still apply
+    assert analyst.row_filters == index.lookup('DataAnalyst', 'higher_ed_data', 'student_records', 'gpa').row_filters
+
+def test_rules_on_a_column_name_apply_to_unlisted_tables():
+    index = AccessPolicyIndex.compile(*SOURCES)
+
+    access = index.lookup('Student', 'higher_ed_data', 'course_enrollments', 'ssn')
+
+    assert access.access_level == 'MASKED'
+    assert access.masking_type == 'MASK_ALL'
+
+def test_unknown_roles_are_denied():
+    index = AccessPolicyIndex.compile(*SOURCES)
+
+    assert not index.can_see('Visitor', 'higher_ed_data', 'student_records', 'first_name')
+    assert not index.can_see('Visitor', 'other_data', 'courses', 'title')
+
+def test_cached_index_keeps_the_fallbacks(tmp_path):
+    cache_path = str(tmp_path / 'access_index.json')
+    compiled = load_access_index(*SOURCES, cache_path=cache_path)
+
+    cached = load_access_index(*SOURCES, cache_path=cache_path)
+
+    assert cached.entries == compiled.entries
+    assert cached.lookup('DataSteward', 'higher_ed_data', 'student_records', 'first_name').visible
@@ -0,0 +1,153 @@
+import io
+import json
+import os
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from moto import mock_aws
+from classification_crawler import ClassificationCrawler, ColumnReservoir
+from subject_index import SubjectLocation, SubjectLocationIndex
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'configs', 'higher_ed_config.yaml')
+BUCKET = 'data-lake'
+LOCATION = f"s3://{BUCKET}/curated/student_records/"
+COLUMNS = ['student_id', 'email', 'gpa']
+
+@pytest.fixture
+def aws():
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        glue = boto3.client('glue')
+        glue.create_database(DatabaseInput={'Name': 'higher_ed_data'})
+        glue.create_table(DatabaseName='higher_ed_data', TableInput={
+            'Name': 'student_records',
+            'StorageDescriptor': {
+                'Columns': [{'Name': name, 'Type': 'string'} for name in COLUMNS],
+                'Location': LOCATION
+            }
+        })
+        yield s3, glue
+
+def put_students(s3, name, student_ids):
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({
+        'student_id': student_ids,
+        'email': [f"{student_id.lower()}@example.edu" for student_id in student_ids],
+        'gpa': ['3.50'] * len(student_ids)
+    }), buffer)
+    s3.put_object(Bucket=BUCKET, Key=f"curated/student_records/{name}", Body=buffer.getvalue())
+
+def make_crawler(tmp_path, **kwargs):
+    index = SubjectLocationIndex(str(tmp_path / 'index'), salt='test-salt')
+    crawler = ClassificationCrawler(CONFIG_PATH, state_path=str(tmp_path / 'state.json'),
+                                    max_workers=2, subject_index=index, **kwargs)
+    return crawler, index
+
+def test_crawl_indexes_only_new_files(aws, tmp_path):
+    s3, _ = aws
+    put_students(s3, 'part-0.parquet', ['S1', 'S2'])
+
+    crawler, index = make_crawler(tmp_path)
+    first = crawler.crawl()
+    put_students(s3, 'part-1.parquet', ['S3'])
+    crawler, index = make_crawler(tmp_path)
+    second = crawler.crawl()
+    crawler, index = make_crawler(tmp_path)
+    third = crawler.crawl()
+
+    assert (first['subject_files'], second['subject_files'], third['subject_files']) == (1, 1, 0)
+    # The table itself is unchanged after the first crawl
+    assert (second['classified'], second['skipped']) == (0, 1)
+    assert index.lookup(['S1', 'S3']) == {
+        SubjectLocation(LOCATION, file=f"{LOCATION}part-0.parquet"): {'S1'},
+        SubjectLocation(LOCATION, file=f"{LOCATION}part-1.parquet"): {'S3'}
+    }
+    with open(tmp_path / 'state.json') as f:
+        state = json.load(f)['higher_ed_data.student_records']
+    assert {path for path, _ in state['subjects_boundary_files']} == {
+        f"{LOCATION}part-0.parquet", f"{LOCATION}part-1.parquet"
+    }
+
+def test_watermark_passes_settled_files(aws, tmp_path):
+    s3, _ = aws
+    put_students(s3, 'part-0.parquet', ['S1'])
+
+    crawler, _ = make_crawler(tmp_path, settle_minutes=0)
+    crawler.crawl()
+    crawler, _ = make_crawler(tmp_path, settle_minutes=0)
+    stats = crawler.crawl()
+
+    assert stats['subject_files'] == 0
+    with open(tmp_path / 'state.json') as f:
+        state = json.load(f)['higher_ed_data.student_records']
+    assert state['subjects_watermark'] == state['subjects_boundary_files'][0][1]
+
+def test_reservoir_keeps_a_bounded_uniform_sample():
+    reservoir = ColumnReservoir(['gpa'], size=100, seed=7)
+    for value in range(10000):
+        reservoir.add('gpa', value)
+    reservoir.add('gpa', None)
+    reservoir.add('gpa', '')
+
+    sample = [int(value) for value in reservoir.samples['gpa']]
+    assert reservoir.seen['gpa'] == 10000
+    assert len(sample) == 100 and len(set(sample)) == 100
+    # Not just the first values read
+    assert sum(value >= 5000 for value in sample) > 25
+
+def test_sampling_stops_at_max_rows_scanned(aws, tmp_path):
+    s3, glue = aws
+    for part in range(3):
+        put_students(s3, f"part-{part}.parquet", [f"S{part}{i:02d}" for i in range(40)])
+    table = glue.get_table(DatabaseName='higher_ed_data', Name='student_records')['Table']
+
+    crawler = ClassificationCrawler(CONFIG_PATH, state_path=str(tmp_path / 'state.json'),
+                                    sample_size=10, max_rows_scanned=50)
+    samples = crawler.sample_table(table)
+
+    assert all(len(values) == 10 for values in samples.values())
+    assert {value[:2] for value in samples['student_id']} <= {'S0', 'S1'}
+
+def test_crawl_writes_classifications_and_skips_unchanged_tables(aws, tmp_path):
+    s3, glue = aws
+    put_students(s3, 'part-0.parquet', [f"S{i:03d}" for i in range(20)])
+
+    crawler = ClassificationCrawler(CONFIG_PATH, state_path=str(tmp_path / 'state.json'), max_workers=2)
+    first = crawler.crawl()
+    parameters = glue.get_table(DatabaseName='higher_ed_data', Name='student_records')['Table']['Parameters']
+    # A new crawler reads the state file written by the first one
+    second = ClassificationCrawler(CONFIG_PATH, state_path=str(tmp_path / 'state.json'), max_workers=2).crawl()
+    glue.update_table(DatabaseName='higher_ed_data', TableInput={
+        'Name': 'student_records',
+        'StorageDescriptor': {
+            'Columns': [{'Name': name, 'Type': 'string'} for name in COLUMNS + ['major']],
+            'Location': LOCATION
+        }
+    })
+    third = ClassificationCrawler(CONFIG_PATH, state_path=str(tmp_path / 'state.json'), max_workers=2).crawl()
+
+    assert (first['classified'], first['skipped']) == (1, 0)
+    assert {f"classification_{name}" for name in COLUMNS} <= set(parameters)
+    assert json.loads(parameters['classification_email'])['pii_type'] == 'email'
+    assert json.loads(parameters['classification_email'])['masking_required'] is True
+    assert (second['classified'], second['skipped']) == (0, 1)
+    assert (third['classified'], third['skipped']) == (1, 0)
+    with open(tmp_path / 'state.json') as f:
+        assert set(json.load(f)['higher_ed_data.student_records']) >= {'schema_hash', 'update_time'}
+
+def test_tables_are_sampled_in_the_worker_pool(aws, tmp_path, monkeypatch):
+    s3, glue = aws
+    put_students(s3, 'part-0.parquet', [f"S{i:03d}" for i in range(20)])
+
+    def sample_table(self, table):
+        raise AssertionError("sampled in the parent process")
+
+    monkeypatch.setattr(ClassificationCrawler, 'sample_table', sample_table)
+    stats = ClassificationCrawler(CONFIG_PATH, state_path=str(tmp_path / 'state.json'), max_workers=2).crawl()
+
+    parameters = glue.get_table(DatabaseName='higher_ed_data', Name='student_records')['Table']['Parameters']
+    assert stats['classified'] == 1
+    assert json.loads(parameters['classification_email'])['pii_type'] == 'email'
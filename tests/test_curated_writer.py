@@ -0,0 +1,58 @@
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+from moto import mock_aws
+from curated_writer import delete_partitions, existing_partitions, list_partition_files
+from subject_index import SubjectLocation, SubjectLocationIndex, partition_spec
+
+PARTITION_KEYS = ['department', 'enrollment_status']
+ACTIVE = ('Computer Science', 'ACTIVE')
+GRADUATED = ('Computer Science', 'GRADUATED')
+
+def write_partition(root, values, student_ids):
+    directory = root / partition_spec(PARTITION_KEYS, values)
+    directory.mkdir(parents=True)
+    pq.write_table(pa.table({'student_id': student_ids}), str(directory / 'part-0.parquet'))
+
+def test_partition_a_student_moved_out_of_is_deleted(tmp_path):
+    table = tmp_path / 'curated'
+    write_partition(table, ACTIVE, ['S1'])
+    index = SubjectLocationIndex(str(tmp_path / 'index'), salt='test-salt')
+    index.add('S1', SubjectLocation(f"{table}/", partition_spec(PARTITION_KEYS, ACTIVE)))
+    index.flush()
+
+    # S1 graduates: the increment only has rows for the GRADUATED partition
+    touched = {partition_spec(PARTITION_KEYS, GRADUATED)}
+    touched |= {location.partition_spec for location in index.lookup(['S1'])}
+    touched = existing_partitions(str(table), touched)
+    write_partition(table, GRADUATED, ['S1'])
+    emptied = set(touched) - {partition_spec(PARTITION_KEYS, GRADUATED)}
+
+    assert touched == [partition_spec(PARTITION_KEYS, ACTIVE)]
+    assert delete_partitions(str(table), emptied) == 1
+    assert [partition.values for partition in list_partition_files(str(table), PARTITION_KEYS)] == [GRADUATED]
+
+def test_existing_partitions_ignores_empty_and_missing_directories(tmp_path):
+    write_partition(tmp_path, ACTIVE, ['S1'])
+    (tmp_path / partition_spec(PARTITION_KEYS, GRADUATED)).mkdir(parents=True)
+
+    specs = [partition_spec(PARTITION_KEYS, values) for values in (ACTIVE, GRADUATED, ('Mathematics', 'ACTIVE'))]
+
+    assert existing_partitions(str(tmp_path), specs) == [partition_spec(PARTITION_KEYS, ACTIVE)]
+
+def test_delete_partitions_on_s3():
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='data-lake')
+        for values in (ACTIVE, GRADUATED):
+            for part in range(3):
+                s3.put_object(Bucket='data-lake', Body=b'',
+                              Key=f"curated/student_records/{partition_spec(PARTITION_KEYS, values)}/part-{part}.parquet")
+        table = 's3://data-lake/curated/student_records/'
+        spec = partition_spec(PARTITION_KEYS, ACTIVE)
+
+        assert existing_partitions(table, [spec], s3) == [spec]
+        assert delete_partitions(table, [spec], s3) == 3
+        assert existing_partitions(table, [spec], s3) == []
+        remaining = s3.list_objects_v2(Bucket='data-lake')['Contents']
+        assert {obj['Key'].split('/')[3] for obj in remaining} == {'enrollment_status=GRADUATED'}
@@ -0,0 +1,54 @@
+import glob
+import os
+import re
+import yaml
+from subject_index import HASH_LENGTH
+
+DBT_PROJECT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'framework', 'dbt_project')
+SOURCE_CALL = re.compile(r"source\(\s*'(\w+)'\s*,\s*'(\w+)'\s*\)")
+REF_CALL = re.compile(r"ref\(\s*'(\w+)'\s*\)")
+
+def project_files(pattern):
+    return sorted(glob.glob(os.path.join(DBT_PROJECT, '**', pattern), recursive=True))
+
+def declared_sources():
+    declared = {}
+    for path in project_files('*.yml'):
+        with open(path) as f:
+            document = yaml.safe_load(f)
+        for source in (document or {}).get('sources', []):
+            for table in source['tables']:
+                declared[(source['name'], table['name'])] = table
+    return declared
+
+def test_project_yaml_parses():
+    for path in project_files('*.yml'):
+        with open(path) as f:
+            yaml.safe_load(f)
+
+def test_every_source_and_ref_is_declared():
+    declared = declared_sources()
+    models = {os.path.splitext(os.path.basename(path))[0] for path in project_files('*.sql')}
+    for path in project_files('*.sql'):
+        with open(path) as f:
+            sql = f.read()
+        for source in SOURCE_CALL.findall(sql):
+            assert source in declared, f"{os.path.basename(path)} reads undeclared source {source}"
+        for model in REF_CALL.findall(sql):
+            assert model in models, f"{os.path.basename(path)} refs unknown model {model}"
+
+def test_source_tables_keep_their_own_columns():
+    for (_, name), table in declared_sources().items():
+        columns = [column['name'] for column in table.get('columns', [])]
+        assert len(columns) == len(set(columns)), f"{name} declares a column twice"
+    student_columns = {column['name'] for column in declared_sources()[('higher_ed_data', 'student_records')]['columns']}
+    assert {'student_id', 'gpa', 'updated_at'} <= student_columns
+
+def test_subject_hash_macro_matches_the_subject_index():
+    with open(os.path.join(DBT_PROJECT, 'macros', 'subject_hash.sql')) as f:
+        macro = f.read()
+
+    # sha256 of the salt followed by the id, as lowercase hex truncated to the index's hash length
+    assert 'sha256(to_utf8(concat(' in macro
+    assert f"), 1, {HASH_LENGTH}))" in macro
+    assert 'env_var("SUBJECT_INDEX_SALT")' in macro
@@ -0,0 +1,263 @@
+import os
+import random
+from collections import Counter
+import pytest
+import access_policy_index
+import deploy_lake_formation_policies as deploy
+from deploy_lake_formation_policies import (
+    MAX_GRANT_RETRIES,
+    AdaptiveThrottle,
+    LakeFormationPolicyDeployer
+)
+from lake_formation_fakes import FakeGlueClient, FakeLakeFormationClient, FakeSTSClient
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'framework', 'access_policies.yaml')
+ACCOUNT = '123456789012'
+ANALYST = f"arn:aws:iam::{ACCOUNT}:role/DataAnalyst"
+STEWARD = f"arn:aws:iam::{ACCOUNT}:role/DataSteward"
+ENGINEER = f"arn:aws:iam::{ACCOUNT}:role/DataEngineer"
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(deploy.time, 'sleep', lambda seconds: None)
+
+def make_deployer(client):
+    return LakeFormationPolicyDeployer(CONFIG_PATH, client, FakeSTSClient(ACCOUNT), glue_client=FakeGlueClient())
+
+def database_entries():
+    return [
+        {
+            'Principal': {'DataLakePrincipalIdentifier': principal},
+            'Resource': {'Database': {'Name': 'higher_ed_data'}},
+            'Permissions': ['DESCRIBE'],
+            'PermissionsWithGrantOption': []
+        }
+        for principal in (ANALYST, STEWARD, ENGINEER)
+    ]
+
+def spy_batches(client):
+    """Record the principals of every batch_grant_permissions request"""
+    requests = []
+    original = client.batch_grant_permissions
+
+    def batch_grant_permissions(Entries, CatalogId=None):
+        requests.append([entry['Principal']['DataLakePrincipalIdentifier'] for entry in Entries])
+        return original(Entries, CatalogId)
+
+    client.batch_grant_permissions = batch_grant_permissions
+    return requests
+
+def test_partial_batch_failure_is_reported():
+    client = FakeLakeFormationClient(entry_errors={ANALYST: ['AccessDeniedException']})
+    deployer = make_deployer(client)
+
+    failures = deployer._send_batch('batch_grant_permissions', database_entries(), AdaptiveThrottle(), Counter())
+
+    assert [failure['entry']['Principal']['DataLakePrincipalIdentifier'] for failure in failures] == [ANALYST]
+    assert failures[0]['error']['ErrorCode'] == 'AccessDeniedException'
+    assert {permission[0] for permission in client.permissions} == {STEWARD, ENGINEER}
+
+def test_apply_grant_plan_raises_on_partial_failure():
+    client = FakeLakeFormationClient(entry_errors={ANALYST: ['AccessDeniedException']})
+    deployer = make_deployer(client)
+
+    with pytest.raises(RuntimeError, match='1 of'):
+        deployer.apply_grant_plan(deployer.build_grant_plan())
+
+def test_only_throttled_entries_are_retried():
+    client = FakeLakeFormationClient(entry_errors={ENGINEER: ['ThrottlingException', 'ThrottlingException']})
+    requests = spy_batches(client)
+    stats = Counter()
+
+    failures = make_deployer(client)._send_batch(
+        'batch_grant_permissions', database_entries(), AdaptiveThrottle(), stats
+    )
+
+    assert failures == []
+    assert requests == [[ANALYST, STEWARD, ENGINEER], [ENGINEER], [ENGINEER]]
+    assert stats['succeeded'] == 3
+    assert stats['throttled'] == 2
+
+def test_denied_entry_survives_retry_of_throttled_entry():
+    client = FakeLakeFormationClient(entry_errors={
+        ANALYST: ['AccessDeniedException'],
+        ENGINEER: ['ThrottlingException']
+    })
+
+    failures = make_deployer(client)._send_batch(
+        'batch_grant_permissions', database_entries(), AdaptiveThrottle(), Counter()
+    )
+
+    assert [failure['entry']['Principal']['DataLakePrincipalIdentifier'] for failure in failures] == [ANALYST]
+    assert {permission[0] for permission in client.permissions} == {STEWARD, ENGINEER}
+
+def test_entries_throttled_past_the_retries_are_failures():
+    client = FakeLakeFormationClient(entry_errors={ENGINEER: ['ThrottlingException'] * (MAX_GRANT_RETRIES + 1)})
+
+    failures = make_deployer(client)._send_batch(
+        'batch_grant_permissions', database_entries(), AdaptiveThrottle(), Counter()
+    )
+
+    assert len(failures) == 1
+    assert failures[0]['entry']['Principal']['DataLakePrincipalIdentifier'] == ENGINEER
+    assert failures[0]['error']['ErrorCode'] == 'RetriesExhausted'
+
+def test_requests_throttled_on_every_attempt_are_failures():
+    client = FakeLakeFormationClient(max_requests_per_second=0)
+    stats = Counter()
+
+    failures = make_deployer(client)._send_batch(
+        'batch_grant_permissions', database_entries(), AdaptiveThrottle(), stats
+    )
+
+    assert len(failures) == 3
+    assert {failure['error']['ErrorCode'] for failure in failures} == {'RetriesExhausted'}
+    assert stats['api_calls'] == MAX_GRANT_RETRIES + 1
+    assert client.permissions == set()
+
+def test_non_retryable_request_error_is_raised():
+    client = FakeLakeFormationClient()
+    entries = database_entries() * 7  # above the batch limit
+
+    with pytest.raises(deploy.ClientError):
+        make_deployer(client)._send_batch('batch_grant_permissions', entries, AdaptiveThrottle(), Counter())
+
+def test_throttle_backs_off_and_recovers():
+    throttle = AdaptiveThrottle(base_delay=0.05, max_delay=0.4)
+
+    for expected in (0.05, 0.1, 0.2, 0.4, 0.4):
+        throttle.on_throttle()
+        assert throttle.delay == pytest.approx(expected)
+    for expected in (0.2, 0.1, 0.05, 0.0):
+        throttle.on_success()
+        assert throttle.delay == pytest.approx(expected)
+
+def test_send_batch_recovers_throttle_after_success():
+    client = FakeLakeFormationClient(entry_errors={ENGINEER: ['ThrottlingException']})
+    throttle = AdaptiveThrottle(base_delay=0.05)
+
+    make_deployer(client)._send_batch('batch_grant_permissions', database_entries(), throttle, Counter())
+
+    # One throttled attempt raised the delay to the base; the successful retry cleared it
+    assert throttle.delay == 0.0
+
+def test_grant_plan_completes_under_random_throttling():
+    random.seed(7)
+    client = FakeLakeFormationClient(throttle_rate=0.3)
+    deployer = make_deployer(client)
+
+    summary = deployer.apply_grant_plan(deployer.build_grant_plan(), max_workers=4)
+
+    assert summary['granted'] == summary['entries']
+    assert summary['throttled'] == client.calls['throttled'] > 0
+
+def seed_unmanaged_grants(client):
+    """Existing grants on resource shapes the configuration never produces"""
+    client._record({'DataLakePrincipalIdentifier': ANALYST},
+                   {'Table': {'DatabaseName': 'higher_ed_data', 'TableWildcard': {}}}, ['SELECT'])
+    client._record({'DataLakePrincipalIdentifier': ENGINEER}, {'Catalog': {}}, ['CREATE_DATABASE'])
+    client._record({'DataLakePrincipalIdentifier': ENGINEER},
+                   {'DataLocation': {'ResourceArn': 'arn:aws:s3:::higher-ed-curated'}}, ['DATA_LOCATION_ACCESS'])
+    client._record({'DataLakePrincipalIdentifier': STEWARD},
+                   {'LFTag': {'TagKey': 'classification', 'TagValues': ['PII']}}, ['ASSOCIATE'])
+
+def test_resource_key_round_trips_table_wildcard():
+    resource = {'Table': {'CatalogId': ACCOUNT, 'DatabaseName': 'higher_ed_data', 'TableWildcard': {}}}
+
+    key = deploy.resource_key(resource)
+
+    assert key == ('Table', 'higher_ed_data', '*')
+    assert deploy.resource_from_key(key) == {'Table': {'DatabaseName': 'higher_ed_data', 'TableWildcard': {}}}
+    assert deploy.describe_resource(key) == 'higher_ed_data.*'
+
+def test_plan_revokes_table_wildcard_and_skips_unmanaged_resources(caplog):
+    client = FakeLakeFormationClient()
+    seed_unmanaged_grants(client)
+    deployer = make_deployer(client)
+
+    with caplog.at_level('WARNING'):
+        sync_plan = deployer.plan()
+
+    assert sync_plan.revokes == {(ANALYST, ('Table', 'higher_ed_data', '*'), 'SELECT')}
+    assert all(key[0] != 'Catalog' for _, key, _ in sync_plan.grants)
+    warnings = ' '.join(record.getMessage() for record in caplog.records if record.levelname == 'WARNING')
+    for resource_type in ('Catalog', 'DataLocation', 'LFTag'):
+        assert f"unmanaged {resource_type}" in warnings
+
+def test_apply_revokes_table_wildcard_and_keeps_unmanaged_grants():
+    client = FakeLakeFormationClient()
+    seed_unmanaged_grants(client)
+    deployer = make_deployer(client)
+
+    summary = deployer.apply()
+
+    assert summary['revoked'] == 1
+    resources = {resource for _, resource, _ in client.permissions}
+    assert not any('TableWildcard' in resource for resource in resources)
+    assert sum(1 for resource in resources if '"Catalog"' in resource or 'DataLocation' in resource
+               or 'LFTag' in resource) == 3
+    assert deployer.plan().is_empty()
+
+def test_resolver_normalizes_role_names_like_the_access_index():
+    resolver = deploy.PrincipalResolver(account_id=ACCOUNT)
+    resolver.register('data_steward', [STEWARD])
+
+    assert deploy.role_key is access_policy_index.role_key
+    assert resolver.resolve('DataSteward') == [STEWARD]
+    assert resolver.resolve('data-steward') == [STEWARD]
+
+def student_columns(client, principal):
+    """Columns of student_records a principal can SELECT, as list_permissions reports them"""
+    columns = set()
+    for entry in client.list_permissions(MaxResults=1000)['PrincipalResourcePermissions']:
+        table = entry['Resource'].get('TableWithColumns', {})
+        if entry['Principal']['DataLakePrincipalIdentifier'] == principal and table.get('Name') == 'student_records':
+            columns.update(table.get('ColumnNames', []))
+    return columns
+
+def test_adding_a_column_keeps_the_columns_already_granted():
+    client = FakeLakeFormationClient()
+    client._record({'DataLakePrincipalIdentifier': ANALYST},
+                   {'TableWithColumns': {'DatabaseName': 'higher_ed_data', 'Name': 'student_records',
+                                         'ColumnNames': ['gpa', 'student_id']}}, ['SELECT'])
+    deployer = make_deployer(client)
+
+    sync_plan = deployer.plan()
+    deployer.apply(sync_plan)
+
+    column_key = ('TableWithColumns', 'higher_ed_data', 'student_records', 'ColumnNames', ('enrollment_status',))
+    assert (ANALYST, column_key, 'SELECT') in sync_plan.grants
+    assert not any(principal == ANALYST and key[0] == 'TableWithColumns' for principal, key, _ in sync_plan.revokes)
+    assert student_columns(client, ANALYST) == {'enrollment_status', 'gpa', 'student_id'}
+    assert deployer.plan().is_empty()
+
+def test_removed_column_is_revoked_alone():
+    client = FakeLakeFormationClient()
+    client._record({'DataLakePrincipalIdentifier': ANALYST},
+                   {'TableWithColumns': {'DatabaseName': 'higher_ed_data', 'Name': 'student_records',
+                                         'ColumnNames': ['email', 'enrollment_status', 'gpa', 'student_id']}},
+                   ['SELECT'])
+    deployer = make_deployer(client)
+
+    summary = deployer.apply()
+
+    assert summary['revoked'] == 1
+    assert student_columns(client, ANALYST) == {'enrollment_status', 'gpa', 'student_id'}
+    assert deployer.plan().is_empty()
+
+def test_deploy_batched_creates_databases_in_glue_and_can_run_again():
+    client = FakeLakeFormationClient()
+    glue = FakeGlueClient()
+    deployer = LakeFormationPolicyDeployer(CONFIG_PATH, client, FakeSTSClient(ACCOUNT), glue_client=glue)
+
+    deployer.deploy_batched()
+    permissions, filters = set(client.permissions), dict(client.data_cells_filters)
+    deployer.deploy_batched()
+
+    assert set(glue.databases) == {database['name'] for database in deployer.config['databases']}
+    assert glue.calls['CreateDatabase'] == 2 * len(deployer.config['databases'])
+    assert client.data_cells_filters == filters and filters
+    assert client.calls['UpdateDataCellsFilter'] == len(filters)
+    assert client.permissions == permissions
+    assert deployer.plan().is_empty()
@@ -0,0 +1,69 @@
+import json
+import os
+from incremental_manifest import IncrementalManifest
+
+NOW = 1_700_000_000
+
+def touch(directory, name, modified):
+    path = directory / name
+    path.write_text('student_id\nS1\n')
+    os.utime(path, (modified, modified))
+    return str(path)
+
+def run(manifest_path, input_path, settle_minutes=60):
+    manifest = IncrementalManifest(manifest_path, settle_minutes=settle_minutes)
+    files = manifest.new_files(input_path)
+    manifest.commit()
+    return files
+
+def test_late_file_within_the_settle_window_is_picked_up(tmp_path):
+    data = tmp_path / 'raw'
+    data.mkdir()
+    manifest_path = str(tmp_path / 'manifest.json')
+    first = touch(data, 'part-0.csv', NOW)
+
+    assert run(manifest_path, str(data)) == [first]
+    # A slow upload that started before part-0 finished only becomes visible now
+    late = touch(data, 'part-late.csv', NOW - 600)
+    newer = touch(data, 'part-1.csv', NOW + 60)
+
+    assert run(manifest_path, str(data)) == [late, newer]
+    assert run(manifest_path, str(data)) == []
+
+def test_watermark_trails_the_newest_file(tmp_path):
+    data = tmp_path / 'raw'
+    data.mkdir()
+    manifest_path = str(tmp_path / 'manifest.json')
+    touch(data, 'old.csv', NOW - 7200)
+    recent = touch(data, 'recent.csv', NOW)
+
+    run(manifest_path, str(data), settle_minutes=30)
+
+    with open(manifest_path) as f:
+        state = json.load(f)
+    assert state['watermark'] == NOW - 1800
+    assert state['boundary_files'] == [[recent, NOW]]
+    # Older than the window: passed by the watermark for good
+    touch(data, 'too-late.csv', NOW - 3600)
+    assert run(manifest_path, str(data), settle_minutes=30) == []
+
+def test_rewritten_file_is_processed_again(tmp_path):
+    data = tmp_path / 'raw'
+    data.mkdir()
+    manifest_path = str(tmp_path / 'manifest.json')
+    path = touch(data, 'part-0.csv', NOW)
+    run(manifest_path, str(data))
+
+    touch(data, 'part-0.csv', NOW + 5)
+
+    assert run(manifest_path, str(data)) == [path]
+
+def test_manifest_without_settle_window_is_read(tmp_path):
+    data = tmp_path / 'raw'
+    data.mkdir()
+    manifest_path = tmp_path / 'manifest.json'
+    processed = touch(data, 'part-0.csv', NOW)
+    manifest_path.write_text(json.dumps({'watermark': NOW, 'boundary_files': [processed]}))
+    new = touch(data, 'part-1.csv', NOW)
+
+    assert run(str(manifest_path), str(data)) == [new]
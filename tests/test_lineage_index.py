@@ -0,0 +1,40 @@
+import boto3
+import pytest
+from moto import mock_aws
+from lineage_index import LineageIndex, S3LineageIndex, SQLiteLineageIndex
+
+EVENT = {
+    'nodes': [{'id': 'table_raw', 'type': 'TABLE', 'name': 'raw'},
+              {'id': 'table_curated', 'type': 'TABLE', 'name': 'curated'}],
+    'edges': [{'source_id': 'table_raw', 'target_id': 'table_curated', 'edge_type': 'ETL', 'properties': None}],
+    'timestamp': '2024-01-01T00:00:00'
+}
+
+def test_incomplete_index_cannot_be_instantiated():
+    class EventsOnly(LineageIndex):
+        def add_events(self, events):
+            pass
+
+    with pytest.raises(TypeError):
+        LineageIndex()
+    with pytest.raises(TypeError):
+        EventsOnly()
+
+def check_index(index):
+    index.add_event('lineage/1.json', EVENT)
+    index.add_events([('lineage/2.json', EVENT)])
+
+    assert index.event_keys('table_curated') == ['lineage/1.json', 'lineage/2.json']
+    assert [edge['event'] for edge in index.get_adjacency('table_raw')['edges']] == [
+        'lineage/1.json', 'lineage/2.json'
+    ]
+    assert index.get_adjacency('table_unknown') == {'events': [], 'edges': []}
+
+def test_sqlite_index(tmp_path):
+    check_index(SQLiteLineageIndex(str(tmp_path / 'index.db')))
+
+def test_s3_index():
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='data-lineage-bucket')
+        check_index(S3LineageIndex(s3, 'data-lineage-bucket', num_shards=4))
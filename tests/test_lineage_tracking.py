@@ -0,0 +1,110 @@
+import json
+import time
+import boto3
+import pytest
+from moto import mock_aws
+from lineage_graph import LineageGraph
+from lineage_index import SQLiteLineageIndex
+from lineage_tracking_stub import LineageTracker
+
+@pytest.fixture
+def tracker(tmp_path):
+    with mock_aws():
+        boto3.client('s3').create_bucket(Bucket='data-lineage-bucket')
+        tracker = LineageTracker(index=SQLiteLineageIndex(str(tmp_path / 'index.db')), buffered=True)
+        yield tracker
+        tracker.close()
+
+def track_students(tracker):
+    tracker.track_column_lineage(
+        'raw_student_records', 'curated_student_records', 'student_etl',
+        {'student_id': ['student_id'], 'gpa_quality_tag': ['gpa'], 'load_batch': []},
+        {'row_count': 3}
+    )
+    tracker.track_column_lineage(
+        'curated_student_records', 'mart_student_analytics', 'student_mart',
+        {'gpa_performance': ['gpa_quality_tag']},
+        {}
+    )
+
+def test_column_edges_connect_source_and_target_columns(tracker):
+    track_students(tracker)
+    tracker.close()
+
+    graph = LineageGraph.from_events(tracker._iter_lineage_events())
+
+    assert 'column_curated_student_records.gpa_quality_tag' in graph.upstream(
+        'column_mart_student_analytics.gpa_performance', depth=1)
+    assert 'column_raw_student_records.gpa' in graph.upstream('column_mart_student_analytics.gpa_performance')
+    assert graph.shortest_path('column_raw_student_records.gpa', 'column_mart_student_analytics.gpa_performance') == [
+        'column_raw_student_records.gpa',
+        'column_curated_student_records.gpa_quality_tag',
+        'column_mart_student_analytics.gpa_performance'
+    ]
+    assert 'column_curated_student_records.student_id' in graph.downstream('column_raw_student_records.student_id', depth=1)
+
+def test_column_edges_are_indexed(tracker):
+    track_students(tracker)
+    tracker.close()
+
+    edges = tracker.index.get_adjacency('column_curated_student_records.gpa_quality_tag')['edges']
+
+    derives = {(edge['source_id'], edge['target_id']) for edge in edges if edge['edge_type'] == 'DERIVES'}
+    assert derives == {
+        ('column_raw_student_records.gpa', 'column_curated_student_records.gpa_quality_tag'),
+        ('column_curated_student_records.gpa_quality_tag', 'column_mart_student_analytics.gpa_performance')
+    }
+    lineage = tracker.get_lineage('column_raw_student_records.gpa')['lineage']
+    assert any(edge['edge_type'] == 'DERIVES' for event in lineage for edge in event['edges'])
+
+def put_events(s3, count):
+    for i in range(count):
+        event = {
+            'nodes': [{'id': f"table_raw_{i % 5}", 'type': 'TABLE', 'name': f"raw_{i % 5}"},
+                      {'id': 'table_curated', 'type': 'TABLE', 'name': 'curated'}],
+            'edges': [{'source_id': f"table_raw_{i % 5}", 'target_id': 'table_curated',
+                       'edge_type': 'ETL', 'properties': None}],
+            'timestamp': f"2024-01-01T00:00:00.{i:06d}"
+        }
+        s3.put_object(Bucket='data-lineage-bucket', Key=f"lineage/20240101_000000_{i:012d}.json",
+                      Body=json.dumps(event))
+
+def test_concurrent_fetch_reads_every_listed_page():
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='data-lineage-bucket')
+        # More files than one 1000-key list page
+        put_events(s3, 1050)
+        sequential = LineageTracker(fetch_workers=1)
+        concurrent = LineageTracker(fetch_workers=8)
+
+        keys = concurrent._list_lineage_keys()
+        lineage = concurrent.get_lineage('table_raw_3')['lineage']
+
+        assert len(keys) == 1050 and keys == sorted(keys)
+        assert concurrent._list_lineage_keys(start_after=keys[999]) == keys[1000:]
+        assert lineage == sequential.get_lineage('table_raw_3')['lineage']
+        assert [event['timestamp'] for event in lineage] == [
+            f"2024-01-01T00:00:00.{i:06d}" for i in range(3, 1050, 5)
+        ]
+        assert len(list(concurrent._iter_lineage_events())) == 1050
+
+def test_failed_background_flush_is_retried_and_raised_on_close(tmp_path):
+    with mock_aws():
+        boto3.client('s3').create_bucket(Bucket='data-lineage-bucket')
+        tracker = LineageTracker(buffered=True, batch_size=1, flush_interval_seconds=0.05)
+        tracker.lineage_bucket = 'missing-bucket'
+        tracker.track_table_lineage('raw_student_records', 'curated_student_records', 'student_etl', {})
+        tracker._wake.set()
+        time.sleep(0.3)
+
+        # The background thread kept the batch queued instead of dropping it
+        assert len(tracker._buffer) == 1
+        assert tracker._last_error is not None
+        with pytest.raises(Exception):
+            tracker.close()
+
+        tracker.lineage_bucket = 'data-lineage-bucket'
+        tracker.close()
+        assert tracker._buffer == []
+        assert len(tracker._list_lineage_keys()) == 1
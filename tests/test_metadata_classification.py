@@ -0,0 +1,40 @@
+import re
+import pytest
+from metadata_classification import MetadataClassifier, PIIDetector
+
+PII_PATTERNS = MetadataClassifier._load_pii_patterns(None)
+
+def reference_type(value):
+    """First PII type whose own pattern matches, as classify_field used to compute it"""
+    return next((pii_type for pii_type, pattern in PII_PATTERNS.items() if re.match(pattern, value)), None)
+
+@pytest.mark.parametrize('values', [
+    # Same character classes, but only the leading literal 1 fits \+?1?\d{9,15}
+    ['+2234012340123401', '+1234012340123401'],
+    ['+1234012340123401', '+2234012340123401'],
+])
+def test_memo_distinguishes_values_of_the_same_shape(values):
+    detector = PIIDetector(PII_PATTERNS)
+
+    for value in values:
+        assert detector.detect([value]) == reference_type(value)
+    assert detector.detect(['+2234012340123401']) is None
+    assert detector.detect(['+1234012340123401']) == 'phone'
+
+def test_memo_matches_reference_for_mixed_values():
+    detector = PIIDetector(PII_PATTERNS)
+    values = ['123-45-6789', 'jane@example.edu', '3.75', '4111 1111 1111 1111', 'ACTIVE', '5.75', '+15551234567']
+
+    for _ in range(2):
+        for value in values:
+            assert detector.detect([value]) == reference_type(value)
+
+def test_memo_is_bounded_and_keeps_recent_values():
+    detector = PIIDetector(PII_PATTERNS, cache_size=2)
+
+    detector.detect(['1.00'])
+    detector.detect(['2.00'])
+    detector.detect(['1.00'])
+    detector.detect(['3.00'])
+
+    assert list(detector._cache) == ['1.00', '3.00']
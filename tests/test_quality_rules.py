@@ -0,0 +1,99 @@
+import os
+import pandas as pd
+import pytest
+from quality_rules import (
+    DEFAULT_CONFIG_PATH,
+    GREAT_EXPECTATIONS_BACKEND,
+    NATIVE_BACKEND,
+    StudentRecordsValidator,
+    validate_student_data
+)
+from streaming_validation import STUDENT_RECORD_EXPECTATIONS
+from rule_compiler import load_quality_plan
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'examples', 'higher_ed', 'student_records_sample.csv')
+VALID = pd.read_csv(SAMPLE_PATH, dtype=str).iloc[[0]]
+
+# One valid row followed by rows failing the quality_rules or the built-in expectations
+ROWS = pd.concat([VALID] * 5, ignore_index=True)
+ROWS.loc[1, 'gpa'] = '4.50'
+ROWS.loc[2, 'student_id'] = 'short1'
+ROWS.loc[3, ['email', 'enrollment_status']] = ['not-an-email', 'ON_LEAVE']
+ROWS.loc[4, 'ssn'] = '123456789'
+
+def write_rows(tmp_path, rows=ROWS):
+    path = tmp_path / 'student_records.csv'
+    rows.to_csv(path, index=False)
+    return str(path)
+
+def failing_rows(results):
+    rows = set()
+    for result in results['results']:
+        rows.update(result['result'].get('partial_unexpected_index_list', []))
+    return rows
+
+def test_native_backend_runs_the_built_in_checks_and_the_compiled_quality_rules(tmp_path):
+    results = validate_student_data(write_rows(tmp_path))
+
+    plan = load_quality_plan(DEFAULT_CONFIG_PATH)
+    configs = [result['expectation_config'] for result in results['results']]
+    assert configs[:len(STUDENT_RECORD_EXPECTATIONS)] == STUDENT_RECORD_EXPECTATIONS
+    assert {config['kwargs']['column'] for config in configs[len(STUDENT_RECORD_EXPECTATIONS):]} == set(plan.columns)
+    assert not results['success']
+
+def test_native_backend_reports_every_failing_row(tmp_path):
+    plan = load_quality_plan(DEFAULT_CONFIG_PATH)
+    plan_failures = {index for index, passed in plan.row_mask(ROWS.astype('string')).items() if not passed}
+
+    results = StudentRecordsValidator(write_rows(tmp_path), chunksize=2).validate_student_records()
+
+    assert plan_failures == {1, 2, 3}
+    # The SSN format is only checked by the built-in expectations
+    assert failing_rows(results) == {1, 2, 3, 4}
+
+def test_valid_rows_pass(tmp_path):
+    assert validate_student_data(write_rows(tmp_path, VALID))['success']
+
+def test_missing_required_columns_fail(tmp_path):
+    rows = VALID[['student_id', 'email', 'gpa', 'enrollment_status']]
+
+    results = validate_student_data(write_rows(tmp_path, rows))
+
+    assert not results['success']
+    failed = {result['expectation_config']['expectation_type'] for result in results['results'] if not result['success']}
+    assert 'expect_table_columns_to_match_ordered_list' in failed
+
+def test_streaming_and_chunksize_keywords_select_the_native_backend(tmp_path, monkeypatch):
+    seen = {}
+    original = StudentRecordsValidator.validate_student_records
+
+    def validate_student_records(self, data_path=None):
+        seen.update(backend=self.backend, chunksize=self.chunksize)
+        return original(self, data_path)
+
+    monkeypatch.setattr(StudentRecordsValidator, 'validate_student_records', validate_student_records)
+
+    assert validate_student_data(write_rows(tmp_path, VALID), streaming=True, chunksize=1)['success']
+    assert seen == {'backend': 'native', 'chunksize': 1}
+
+@pytest.mark.parametrize('rows', [VALID, ROWS, ROWS.iloc[[0, 4]], VALID[['student_id', 'email', 'gpa']]],
+                         ids=['valid', 'invalid', 'ssn_only', 'missing_columns'])
+def test_backends_agree(tmp_path, rows):
+    pytest.importorskip('great_expectations')
+    data_path = write_rows(tmp_path, rows)
+
+    native = validate_student_data(data_path, backend=NATIVE_BACKEND)
+    great_expectations = validate_student_data(data_path, backend=GREAT_EXPECTATIONS_BACKEND, chunksize=2)
+
+    def outcomes(results):
+        return [
+            (result['expectation_config']['expectation_type'],
+             result['expectation_config']['kwargs'].get('column'),
+             result['success'],
+             result['result'].get('unexpected_count'))
+            for result in results['results']
+        ]
+
+    assert native['success'] == great_expectations['success']
+    assert outcomes(native) == outcomes(great_expectations)
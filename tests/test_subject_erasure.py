@@ -0,0 +1,52 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from subject_erasure import SubjectErasureJob
+from subject_index import SubjectLocation, SubjectLocationIndex
+
+SALT = 'test-salt'
+
+def write_students(path, student_ids):
+    pq.write_table(pa.table({'student_id': student_ids, 'gpa': [3.0] * len(student_ids)}), str(path))
+
+def test_erasure_rewrites_files_and_records_deletion_markers(tmp_path):
+    table = tmp_path / 'student_records'
+    table.mkdir()
+    write_students(table / 'part-0.parquet', ['S1', 'S2', 'S3'])
+    write_students(table / 'part-1.parquet', ['S4', 'S5'])
+    index = SubjectLocationIndex(str(tmp_path / 'index'), salt=SALT)
+    for student_id, part in (('S1', 0), ('S2', 0), ('S3', 0), ('S4', 1), ('S5', 1)):
+        index.add(student_id, SubjectLocation(str(table), file=str(table / f'part-{part}.parquet')))
+    index.flush()
+    deletions = tmp_path / 'subject_deletions'
+
+    job = SubjectErasureJob(index, deletions_location=str(deletions))
+    summary = job.apply(job.plan(['S2', 'S5']))
+
+    assert summary['rows_erased'] == 2
+    assert summary['deletion_markers'] == 2
+    assert pq.read_table(str(table / 'part-0.parquet'))['student_id'].to_pylist() == ['S1', 'S3']
+    assert pq.read_table(str(table / 'part-1.parquet'))['student_id'].to_pylist() == ['S4']
+    markers = pq.read_table(str(deletions)).to_pydict()
+    assert sorted(markers['subject_hash']) == sorted(index.hash(subject) for subject in ('S2', 'S5'))
+    assert 'student_id' not in markers
+    assert set(markers['reason']) == {'erased'}
+    assert index.lookup(['S2', 'S5']) == {}
+
+def test_plan_prunes_integer_subject_columns_by_typed_statistics(tmp_path):
+    table = tmp_path / 'student_records'
+    table.mkdir()
+    write_students(table / 'part-0.parquet', [1, 2, 3])
+    write_students(table / 'part-1.parquet', [10, 11])
+    index = SubjectLocationIndex(str(tmp_path / 'index'), salt=SALT)
+    for student_id in (2, 11):
+        index.add(student_id, SubjectLocation(str(table)))
+    index.flush()
+
+    job = SubjectErasureJob(index)
+    erasure_plan = job.plan([2, 11])
+
+    assert erasure_plan.files_listed == 2
+    assert erasure_plan.files == {str(table / 'part-0.parquet'): {'2'}, str(table / 'part-1.parquet'): {'11'}}
+    summary = job.apply(erasure_plan)
+    assert summary['rows_erased'] == 2
+    assert pq.read_table(str(table / 'part-0.parquet'))['student_id'].to_pylist() == [1, 3]
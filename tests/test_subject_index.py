@@ -0,0 +1,49 @@
+import boto3
+import pytest
+from moto import mock_aws
+from subject_index import (
+    SALT_ENV,
+    SubjectLocation,
+    SubjectLocationIndex,
+    index_salt,
+    index_salt_from_secret,
+    subject_hash
+)
+
+def test_unset_salt_is_an_error(monkeypatch):
+    monkeypatch.delenv(SALT_ENV, raising=False)
+
+    with pytest.raises(ValueError, match=SALT_ENV):
+        index_salt()
+    with pytest.raises(ValueError, match=SALT_ENV):
+        subject_hash('S1')
+
+def test_salt_from_environment(monkeypatch):
+    monkeypatch.setenv(SALT_ENV, 'env-salt')
+
+    assert subject_hash('S1') == subject_hash('S1', 'env-salt') != subject_hash('S1', 'other-salt')
+
+@mock_aws
+def test_salt_from_secret():
+    client = boto3.client('secretsmanager')
+    client.create_secret(Name='subject-index-salt', SecretString='secret-salt\n')
+
+    assert index_salt_from_secret('subject-index-salt', client) == 'secret-salt'
+
+def test_index_refuses_a_different_salt(tmp_path):
+    path = str(tmp_path / 'index')
+    index = SubjectLocationIndex(path, salt='first')
+    index.add('S1', SubjectLocation('s3://lake/student_records'))
+    index.flush()
+
+    assert SubjectLocationIndex(path, salt='first').lookup(['S1']) == {
+        SubjectLocation('s3://lake/student_records'): {'S1'}
+    }
+    other = SubjectLocationIndex(path, salt='second')
+    with pytest.raises(ValueError, match='different salt'):
+        other.lookup(['S1'])
+    other.add('S2', SubjectLocation('s3://lake/student_records'))
+    with pytest.raises(ValueError, match='different salt'):
+        other.flush()
+    with pytest.raises(ValueError, match='different salt'):
+        other.remove(['S1'])